@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Patient, Doctor, Specialty, TimeSlot, Appointment
+from .models import User, Patient, Doctor, Specialty, TimeSlot, Appointment, ScheduleTemplate, DailyAvailability, OutboxEmail, ReminderCursor, \
+    AppointmentDailyStats, NewPatientsDailyStats
 
 # --- 1. Inline-конфігурації ---
 # Це дозволяє редагувати профілі Patient/Doctor прямо на сторінці User
@@ -65,10 +66,43 @@ class SpecialtyAdmin(admin.ModelAdmin):
 
 @admin.register(TimeSlot)
 class TimeSlotAdmin(admin.ModelAdmin):
-    list_display = ('doctor', 'start_time', 'end_time', 'is_available')
+    list_display = ('doctor', 'start_time', 'end_time', 'is_available', 'held_until')
     list_filter = ('doctor', 'is_available', 'start_time')
     search_fields = ('doctor__user__first_name', 'doctor__user__last_name')
 
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekdays', 'start_time', 'end_time', 'interval_min',
+                    'valid_from', 'valid_until', 'is_active', 'materialized_until')
+    list_filter = ('is_active', 'doctor')
+
+@admin.register(DailyAvailability)
+class DailyAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', '__str__')
+    list_filter = ('doctor',)
+    readonly_fields = ('doctor', 'date', 'bits')
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject')
+
+@admin.register(ReminderCursor)
+class ReminderCursorAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'processed_until', 'scheduled_until')
+
+@admin.register(AppointmentDailyStats)
+class AppointmentDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'doctor', 'status', 'count')
+    list_filter = ('status', 'doctor')
+    date_hierarchy = 'date'
+
+@admin.register(NewPatientsDailyStats)
+class NewPatientsDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'count')
+    date_hierarchy = 'date'
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('patient', 'doctor', 'time_slot_display', 'status')
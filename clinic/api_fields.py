@@ -0,0 +1,152 @@
+from rest_framework import serializers
+
+# --- Розріджені набори полів (?fields= / ?expand=) ---
+# ?fields=id,time_slot.start_time,doctor.user.last_name - лише ці поля у JSON
+#   (крапка - вкладений об'єкт; назва об'єкта без крапки - увесь об'єкт).
+# ?expand=doctor,doctor.user - лише ці вкладені об'єкти розгортаються,
+#   решта стає своїм ID. Без ?expand= розгортається все (як і раніше).
+# Невідомі назви полів ігноруються.
+#
+# ViewSet з SparseQuerysetMixin так само "обрізає" запит: select_related
+# лише потрібних зв'язків і only() лише потрібних колонок.
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _parse_paths(value):
+    if value is None:
+        return None
+    return {tuple(part for part in item.strip().split('.') if part) for item in value.split(',') if item.strip()}
+
+
+class SparseFieldset:
+    """Розібрані параметри ?fields= / ?expand= одного запиту."""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        """Повертає SparseFieldset або None, якщо параметрів немає. Кешується на запиті."""
+        if request is None:
+            return None
+        if not hasattr(request, '_sparse_fieldset'):
+            params = request.query_params
+            fields, expand = _parse_paths(params.get(FIELDS_PARAM)), _parse_paths(params.get(EXPAND_PARAM))
+            request._sparse_fieldset = cls(fields, expand) if (fields or expand is not None) else None
+        return request._sparse_fieldset
+
+    def fields_at(self, path: tuple):
+        """Назви полів, дозволені на рівні path, або None - усі поля."""
+        if not self.fields:
+            return None
+        depth = len(path)
+        below = [p for p in self.fields if p[:depth] == path]
+        if not below or any(len(p) == depth for p in below):
+            return None # Об'єкт запитано цілком
+        return {p[depth] for p in below}
+
+    def is_expanded(self, path: tuple) -> bool:
+        if self.expand is None:
+            return True
+        depth = len(path)
+        # Вкладене поле у ?fields= (doctor.user.last_name) неявно розгортає doctor та doctor.user
+        implied = any(len(p) > depth and p[:depth] == path for p in self.fields or ())
+        return implied or any(p[:depth] == path for p in self.expand)
+
+
+class SparseFieldsMixin:
+    """
+    Домішка для ModelSerializer: прибирає поля, не запитані в ?fields=,
+    і замінює нерозгорнуті (?expand=) вкладені серіалізатори на їхні ID.
+    Працює на будь-якій глибині вкладеності.
+    """
+
+    def _sparse_path(self) -> tuple:
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name: # Дочірній серіалізатор ListSerializer має порожнє ім'я
+                path.append(node.field_name)
+            node = node.parent
+        return tuple(reversed(path))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = SparseFieldset.from_request(self.context.get('request'))
+        if sparse is None:
+            return fields
+
+        path = self._sparse_path()
+        allowed = sparse.fields_at(path)
+        for name in list(fields):
+            if allowed is not None and name not in allowed:
+                del fields[name]
+                continue
+            field = fields[name]
+            if isinstance(field, serializers.BaseSerializer) and not sparse.is_expanded(path + (name,)):
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True,
+                    many=isinstance(field, serializers.ListSerializer),
+                    **({'source': field.source} if field.source and field.source != name else {})
+                )
+        return fields
+
+
+def query_plan(serializer, prefix: str = ''):
+    """
+    Обчислює (select_related, only) для (вже обрізаного) серіалізатора.
+    Повертає None, якщо поля не зводяться до колонок моделі
+    (SerializerMethodField, source через крапку, many=True) - тоді запит не обрізаємо.
+    """
+    model = serializer.Meta.model
+    related, only = [], []
+    for field in serializer.fields.values():
+        source = field.source
+        if source == '*' or '.' in source or isinstance(field, serializers.SerializerMethodField):
+            return None
+        if source == 'pk':
+            source = model._meta.pk.name
+
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+            return None
+        if isinstance(field, serializers.BaseSerializer):
+            nested = query_plan(field, f'{prefix}{source}__')
+            if nested is None:
+                return None
+            related += [prefix + source] + nested[0]
+            only += [prefix + source] + nested[1]
+        elif isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Напр. StringRelatedField: потрібен увесь пов'язаний об'єкт (для __str__)
+            related_model = model._meta.get_field(source).related_model
+            related.append(prefix + source)
+            only += [prefix + source] + [f'{prefix}{source}__{f.name}' for f in related_model._meta.concrete_fields]
+        else:
+            only.append(prefix + source)
+    return related, only
+
+
+class SparseQuerysetMixin:
+    """
+    Домішка для ViewSet: для дій читання з ?fields= / ?expand= запит
+    містить лише потрібні JOIN'и та колонки.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+    def sparse_queryset(self, queryset):
+        if self.action not in self.sparse_actions or SparseFieldset.from_request(self.request) is None:
+            return queryset
+        plan = query_plan(self.get_serializer())
+        if plan is None:
+            return queryset
+        related, only = plan
+        # Поля курсорної пагінації читаються з останнього рядка сторінки
+        only += [field.lstrip('-') for field in getattr(self.paginator, 'ordering', None) or () if field.lstrip('-') != 'pk']
+        queryset = queryset.select_related(None) # select_related() без аргументів - це "усі зв'язки"
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
@@ -0,0 +1,43 @@
+from rest_framework.pagination import CursorPagination
+
+# --- Курсорна (keyset) пагінація ---
+# Замість OFFSET наступна сторінка обирається умовою "ключ > останній ключ
+# попередньої сторінки" по індексованих колонках, тож сотенна сторінка
+# коштує стільки ж, скільки перша, а вставки між запитами не зсувають
+# і не дублюють рядки. Клієнт просто йде за посиланням 'next'.
+#
+# DRF позиціонує курсор за першим полем ordering, а рядки з однаковим
+# значенням (напр. кілька прийомів о 09:00) розрізняє зсувом у межах
+# цієї групи - тому друге поле (id) робить порядок однозначним.
+
+
+class AppointmentCursorPagination(CursorPagination):
+    """Записи на прийом: за (start_time, id), індекси appt_*_start_idx."""
+    ordering = ('start_time', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class DoctorCursorPagination(CursorPagination):
+    """Лікарі: за первинним ключем (user_id)."""
+    ordering = ('pk',)
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class SpecialtyCursorPagination(CursorPagination):
+    """Спеціалізації: за унікальною назвою."""
+    ordering = ('name',)
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class SlotCursorPagination(CursorPagination):
+    """Вільні слоти лікарів: за (start_time, id), індекс timeslot_doctor_free_idx."""
+    ordering = ('start_time', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -1,15 +1,19 @@
 from rest_framework import serializers
 from .models import User, Doctor, Patient, Specialty, Appointment, TimeSlot
+from .api_fields import SparseFieldsMixin
+from .services import ScheduleService
+
+# Серіалізатори для читання підтримують ?fields= та ?expand= (див. api_fields.py)
 
 # --- Serializers for User Profiles ---
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Серіалізатор для базової моделі User (для відображення в профілях)"""
     class Meta:
         model = User
         fields = ['username', 'first_name', 'last_name', 'email']
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Серіалізатор для профілю Пацієнта"""
     user = UserSerializer(read_only=True) # Вкладений серіалізатор
     
@@ -17,13 +21,13 @@ class PatientSerializer(serializers.ModelSerializer):
         model = Patient
         fields = ['user', 'phone_number', 'date_of_birth']
 
-class SpecialtySerializer(serializers.ModelSerializer):
+class SpecialtySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Серіалізатор для Спеціалізацій"""
     class Meta:
         model = Specialty
         fields = ['id', 'name', 'description']
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Серіалізатор для профілю Лікаря"""
     user = UserSerializer(read_only=True)
     # Використовуємо StringRelatedField для читабельного відображення
@@ -36,13 +40,40 @@ class DoctorSerializer(serializers.ModelSerializer):
 
 # --- Serializers for Appointments ---
 
-class TimeSlotSerializer(serializers.ModelSerializer):
+class TimeSlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Серіалізатор для слотів часу"""
     class Meta:
         model = TimeSlot
         fields = ['id', 'start_time', 'end_time', 'is_available']
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AvailableSlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Компактний серіалізатор вільного слоту з коротким описом лікаря.
+    Використовується для пошуку найближчого вільного часу.
+    """
+    doctor = serializers.IntegerField(source='doctor_id')
+    doctor_name = serializers.SerializerMethodField()
+    specialty = serializers.CharField(source='doctor.specialty.name', default=None)
+
+    class Meta:
+        model = TimeSlot
+        fields = ['id', 'start_time', 'end_time', 'doctor', 'doctor_name', 'specialty']
+
+    def get_doctor_name(self, obj):
+        return f"{obj.doctor.user.first_name} {obj.doctor.user.last_name}"
+
+class DoctorSlotSerializer(serializers.ModelSerializer):
+    """
+    Мінімальний вільний слот для календаря (/doctors/{id}/slots/).
+    Лише колонки TimeSlot - без JOIN'ів на лікаря.
+    """
+    doctor = serializers.IntegerField(source='doctor_id')
+
+    class Meta:
+        model = TimeSlot
+        fields = ['id', 'doctor', 'start_time', 'end_time']
+
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Серіалізатор для Записів на прийом.
     Використовується для відображення існуючих записів.
@@ -60,9 +91,9 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
     Спрощений серіалізатор ТІЛЬКИ для СТВОРЕННЯ запису.
     Пацієнт буде автоматично взятий з request.user.
     """
-    time_slot = serializers.PrimaryKeyRelatedField(
-        queryset=TimeSlot.objects.filter(is_available=True, start_time__gte=serializers.timezone.now())
-    )
+    # Доступність слоту (вільний, утримується цим пацієнтом, не в минулому)
+    # перевіряє BookingService під час атомарного захоплення.
+    time_slot = serializers.PrimaryKeyRelatedField(queryset=TimeSlot.objects.all())
     
     class Meta:
         model = Appointment
@@ -84,4 +115,70 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             return appointment
         except BookingService.BookingError as e:
             # Перетворюємо помилку сервісу на помилку валідації DRF
-            raise serializers.ValidationError(str(e))
\ No newline at end of file
+            raise serializers.ValidationError(str(e))
+
+class AppointmentBatchCreateSerializer(serializers.Serializer):
+    """
+    Серіалізатор для ПАКЕТНОГО бронювання кількох слотів одним запитом.
+    Пацієнт буде автоматично взятий з request.user.
+    """
+    MAX_BATCH_SIZE = 20
+
+    time_slot_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+    def validate_time_slot_ids(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Слоти у пакеті не повинні повторюватися.")
+        return value
+
+    def create(self, validated_data):
+        patient = self.context['request'].user.patient
+
+        from .services import BookingService
+
+        try:
+            return BookingService.create_appointments(
+                patient=patient,
+                time_slot_ids=validated_data['time_slot_ids']
+            )
+        except BookingService.BookingError as e:
+            raise serializers.ValidationError(str(e))
+
+# --- Serializers for bulk slot management ---
+
+class SlotBulkSerializer(serializers.Serializer):
+    """
+    Базовий серіалізатор масових операцій зі слотами.
+    Лікар керує своїми слотами (поле doctor можна не вказувати),
+    адміністратор - слотами лікаря з поля doctor.
+    """
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.all(), required=False)
+
+class SlotBulkCreateSerializer(SlotBulkSerializer):
+    """Параметри генерації слотів - ті самі, що у формі кабінету лікаря."""
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False) # За замовчуванням - start_date
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    interval_min = serializers.IntegerField(min_value=1, default=30)
+
+class SlotRangeSerializer(SlotBulkSerializer):
+    """Діапазон часу початку слотів [start, end)."""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+class SlotShiftSerializer(SlotRangeSerializer):
+    """Зсув слотів діапазону на minutes хвилин (від'ємне значення - раніше)."""
+    minutes = serializers.IntegerField()
+
+    def validate_minutes(self, value):
+        limit = ScheduleService.MAX_RANGE_DAYS * 24 * 60
+        if not value or abs(value) > limit:
+            raise serializers.ValidationError(
+                f"Зсув має бути ненульовим і не перевищувати {ScheduleService.MAX_RANGE_DAYS} днів."
+            )
+        return value
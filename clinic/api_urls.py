@@ -10,12 +10,23 @@ router = DefaultRouter()
 # /specialties/<id>/
 # /doctors/
 # /doctors/<id>/
+# /doctors/<id>[,<id>...]/slots/
 # /appointments/
 # /appointments/<id>/
+# /appointments/batch/
+# /appointments/hold/
+# /slots/next/
+# /slots/bulk-create/, /slots/bulk-delete/, /slots/bulk-shift/
+# /reports/
+# /reports/<name>/
+# /exports/<appointments|slots>/
 
 router.register(r'specialties', api_viewsets.SpecialtyViewSet, basename='specialty')
 router.register(r'doctors', api_viewsets.DoctorViewSet, basename='doctor')
 router.register(r'appointments', api_viewsets.AppointmentViewSet, basename='appointment')
+router.register(r'slots', api_viewsets.TimeSlotViewSet, basename='slot')
+router.register(r'reports', api_viewsets.ReportViewSet, basename='report')
+router.register(r'exports', api_viewsets.ExportViewSet, basename='export')
 
 # urlpatterns - це те, що ми імпортуємо в головний urls.py
 urlpatterns = router.urls
\ No newline at end of file
@@ -0,0 +1,96 @@
+from rest_framework import serializers
+
+# --- Швидкий шлях для list (values() замість моделей) ---
+# ModelSerializer для кожного рядка створює екземпляри моделей і обходить
+# дерево вкладених серіалізаторів. Для списків ми читаємо пласкі рядки
+# values() (JOIN'и вже в запиті) і збираємо з них ТОЧНО ту саму вкладену
+# структуру JSON, що й серіалізатори з api_serializers.py.
+# Паритет перевіряється тестом: змінюючи поля там, змініть їх і тут.
+
+# Ті самі поля DRF, що й у ModelSerializer - формат дат/часу збігається
+_datetime = serializers.DateTimeField()
+_date = serializers.DateField()
+
+
+def _format_datetime(value):
+    return None if value is None else _datetime.to_representation(value)
+
+
+def _format_date(value):
+    return None if value is None else _date.to_representation(value)
+
+
+class DoctorValuesSerializer:
+    """Відповідник DoctorSerializer (+ UserSerializer) для рядків values()."""
+    FIELDS = (
+        'pk', 'user__username', 'user__first_name', 'user__last_name', 'user__email',
+        'specialty__name', 'bio',
+    )
+
+    @staticmethod
+    def represent(row: dict, prefix: str = '') -> dict:
+        return {
+            'pk': row[prefix + 'pk'],
+            'user': {
+                'username': row[prefix + 'user__username'],
+                'first_name': row[prefix + 'user__first_name'],
+                'last_name': row[prefix + 'user__last_name'],
+                'email': row[prefix + 'user__email'],
+            },
+            # StringRelatedField: str(specialty) - це назва спеціалізації
+            'specialty': row[prefix + 'specialty__name'],
+            'bio': row[prefix + 'bio'],
+        }
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.FIELDS)
+
+    @classmethod
+    def render(cls, rows) -> list:
+        return [cls.represent(row) for row in rows]
+
+
+class AppointmentValuesSerializer:
+    """Відповідник AppointmentSerializer (з усіма вкладеними) для рядків values()."""
+    FIELDS = (
+        'id', 'status', 'created_at',
+        # start_time потрібен курсорній пагінації (позиція сторінки), у JSON не йде
+        'start_time',
+        'patient__user__username', 'patient__user__first_name', 'patient__user__last_name',
+        'patient__user__email', 'patient__phone_number', 'patient__date_of_birth',
+        'time_slot__id', 'time_slot__start_time', 'time_slot__end_time', 'time_slot__is_available',
+    ) + tuple(f'doctor__{field}' for field in DoctorValuesSerializer.FIELDS)
+
+    @staticmethod
+    def represent(row: dict) -> dict:
+        return {
+            'id': row['id'],
+            'patient': {
+                'user': {
+                    'username': row['patient__user__username'],
+                    'first_name': row['patient__user__first_name'],
+                    'last_name': row['patient__user__last_name'],
+                    'email': row['patient__user__email'],
+                },
+                'phone_number': row['patient__phone_number'],
+                'date_of_birth': _format_date(row['patient__date_of_birth']),
+            },
+            'doctor': DoctorValuesSerializer.represent(row, prefix='doctor__'),
+            'time_slot': {
+                'id': row['time_slot__id'],
+                'start_time': _format_datetime(row['time_slot__start_time']),
+                'end_time': _format_datetime(row['time_slot__end_time']),
+                'is_available': row['time_slot__is_available'],
+            },
+            'status': row['status'],
+            'created_at': _format_datetime(row['created_at']),
+        }
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.FIELDS)
+
+    @classmethod
+    def render(cls, rows) -> list:
+        return [cls.represent(row) for row in rows]
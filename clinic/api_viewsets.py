@@ -1,12 +1,36 @@
-from rest_framework import viewsets, permissions
+import datetime
+import json
+
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Doctor, Specialty, Appointment
+from .idempotency import run_idempotent, IdempotencyError
+from .exports import ExportService
+from .api_renderers import FastJSONRenderer
+from .catalog import CatalogVersion, catalog_condition
+from .api_fields import SparseFieldset, SparseQuerysetMixin
+from .api_values import DoctorValuesSerializer, AppointmentValuesSerializer
+from .api_pagination import (
+    AppointmentCursorPagination, DoctorCursorPagination, SpecialtyCursorPagination, SlotCursorPagination
+)
+from .services import BookingService, ScheduleService, SlotSearchService, ReportGenerator, ReportStrategy
 from .api_serializers import (
     DoctorSerializer, 
     SpecialtySerializer, 
     AppointmentSerializer,
-    AppointmentCreateSerializer
+    AppointmentCreateSerializer,
+    AppointmentBatchCreateSerializer,
+    AvailableSlotSerializer,
+    DoctorSlotSerializer,
+    SlotBulkCreateSerializer,
+    SlotRangeSerializer,
+    SlotShiftSerializer
 )
 
 # --- Дозволи (Permissions) ---
@@ -25,17 +49,63 @@ class IsPatientReadOnlyOrAuthenticatedCreate(permissions.BasePermission):
         # Дозволити POST, якщо користувач - Пацієнт
         return request.user.is_authenticated and request.user.is_patient
 
+class IsClinicAdmin(permissions.BasePermission):
+    """
+    Дозвіл: лише адміністратор клініки (роль ADMIN або is_staff).
+    """
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin
+
+class IsDoctorOrClinicAdmin(permissions.BasePermission):
+    """
+    Дозвіл: лікар (керує власним розкладом) або адміністратор клініки.
+    """
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (request.user.is_doctor or request.user.is_admin)
+
+# --- Швидкий шлях для списків ---
+
+class ValuesListMixin:
+    """
+    list() без екземплярів моделей: рядки values() з уже виконаними JOIN'ами
+    перетворюються на той самий вкладений JSON, що й у серіалізатора
+    (див. api_values.py). Фільтри, права доступу та пагінація - ті самі.
+    """
+    values_serializer_class = None
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        # ?fields= / ?expand= обслуговує звичайний серіалізатор (з обрізаним запитом)
+        if self.values_serializer_class is None or SparseFieldset.from_request(request) is not None:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.values_serializer_class.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer_class.render(page))
+        return Response(self.values_serializer_class.render(rows))
+
 # --- ViewSets ---
 
-class SpecialtyViewSet(viewsets.ReadOnlyModelViewSet):
+class SpecialtyViewSet(SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint для перегляду спеціалізацій.
     Лише читання (GET).
     """
     queryset = Specialty.objects.all()
     serializer_class = SpecialtySerializer
+    pagination_class = SpecialtyCursorPagination
+
+    # Повторний запит з If-None-Match / If-Modified-Since -> 304 без запитів до БД
+    @catalog_condition(CatalogVersion.SPECIALTIES)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalog_condition(CatalogVersion.SPECIALTIES)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
+class DoctorViewSet(ValuesListMixin, SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint для перегляду лікарів.
     Лише читання (GET).
@@ -43,16 +113,173 @@ class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = Doctor.objects.select_related('user', 'specialty').all()
     serializer_class = DoctorSerializer
+    values_serializer_class = DoctorValuesSerializer # Швидкий list
+    pagination_class = DoctorCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['specialty'] # Дозволяє /api/v1/doctors/?specialty=1
+    # /doctors/1,2,3/slots/ - кілька лікарів одним запитом
+    # (retrieve для такого id поверне 404, як і для будь-якого неіснуючого)
+    lookup_value_regex = r'\d+(?:,\d+)*'
+
+    @catalog_condition(CatalogVersion.DOCTORS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalog_condition(CatalogVersion.DOCTORS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def slots(self, request, pk=None):
+        """
+        GET /api/v1/doctors/{id}/slots/?from=YYYY-MM-DD&to=YYYY-MM-DD
+        GET /api/v1/doctors/1,2,3/slots/?from=...&to=... - календар кількох лікарів
+        Вільні слоти у вікні, за часом початку, з курсорною пагінацією (?cursor=, ?page_size=).
+
+        Сторінка кешується на SlotSearchService.CACHE_TTL під версіями вільного
+        часу лікарів: бронювання чи зміна слотів лікаря інвалідують її раніше
+        (в усіх воркерах - лише зі спільним кешем 'default').
+        Прострочені утримання стають видимими не пізніше ніж через TTL.
+        """
+        try:
+            doctor_ids = SlotSearchService.parse_doctor_ids(pk)
+            start, end = SlotSearchService.parse_window(request.query_params.get('from'), request.query_params.get('to'))
+        except SlotSearchService.SearchError as e:
+            raise ValidationError(str(e))
+
+        cache_key = SlotSearchService.doctor_slots_cache_key(doctor_ids, request.build_absolute_uri())
+        data = cache.get(cache_key)
+        if data is None:
+            if Doctor.objects.filter(pk__in=doctor_ids).count() != len(doctor_ids):
+                raise NotFound("Лікаря не знайдено.")
+            paginator = SlotCursorPagination()
+            page = paginator.paginate_queryset(SlotSearchService.doctor_slots(doctor_ids, start, end), request, view=self)
+            data = paginator.get_paginated_response(DoctorSlotSerializer(page, many=True).data).data
+            cache.set(cache_key, data, SlotSearchService.CACHE_TTL)
+        return Response(data)
+
+class TimeSlotViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint для слотів.
+    - GET /api/v1/slots/next/ - пошук найближчих вільних слотів (будь-хто).
+    - POST /api/v1/slots/bulk-create|bulk-delete|bulk-shift/ - масове редагування
+      розкладу (лікар - свого, адміністратор - будь-якого лікаря).
+      Кожна операція - кілька множинних запитів в одній транзакції.
+    """
+    serializer_class = AvailableSlotSerializer
+
+    def get_serializer_class(self):
+        if self.action == 'bulk_create':
+            return SlotBulkCreateSerializer
+        if self.action == 'bulk_delete':
+            return SlotRangeSerializer
+        if self.action == 'bulk_shift':
+            return SlotShiftSerializer
+        return AvailableSlotSerializer
+
+    def _validated_bulk_request(self, request):
+        """Перевіряє тіло запиту і визначає лікаря, розкладом якого керуємо."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        doctor = data.get('doctor')
+        if request.user.is_doctor:
+            try:
+                own = request.user.doctor
+            except Doctor.DoesNotExist:
+                raise PermissionDenied("Профіль лікаря не знайдено.")
+            if doctor is not None and doctor.pk != own.pk:
+                raise PermissionDenied("Лікар може змінювати лише власний розклад.")
+            doctor = own
+        elif doctor is None:
+            raise ValidationError({'doctor': "Вкажіть лікаря."})
+        return doctor, data
+
+    @action(detail=False, methods=['get'])
+    def next(self, request):
+        """
+        GET /api/v1/slots/next/?specialty=ID&limit=N
+        N найближчих вільних слотів серед усіх лікарів (або однієї спеціалізації).
+        """
+        try:
+            specialty_id = int(request.query_params['specialty']) if request.query_params.get('specialty') else None
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise ValidationError("Параметри 'specialty' та 'limit' мають бути числами.")
+
+        time_slots = SlotSearchService.next_available(specialty_id=specialty_id, limit=limit)
+        return Response(self.get_serializer(time_slots, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-create', permission_classes=[IsDoctorOrClinicAdmin])
+    def bulk_create(self, request):
+        """
+        POST /api/v1/slots/bulk-create/
+        {"start_date": "YYYY-MM-DD", "end_date": ..., "start_time": "09:00", "end_time": "13:00", "interval_min": 30}
+        Наявні слоти пропускаються. Повертає кількість нових.
+        """
+        doctor, data = self._validated_bulk_request(request)
+        try:
+            created = ScheduleService.generate_slots(
+                doctor=doctor,
+                start_date=data['start_date'],
+                end_date=data.get('end_date') or data['start_date'],
+                start_time=data['start_time'],
+                end_time=data['end_time'],
+                interval_min=data['interval_min']
+            )
+        except ScheduleService.ScheduleError as e:
+            raise ValidationError(str(e))
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-delete', permission_classes=[IsDoctorOrClinicAdmin])
+    def bulk_delete(self, request):
+        """
+        POST /api/v1/slots/bulk-delete/  {"start": ISO datetime, "end": ISO datetime}
+        Видаляє незаброньовані слоти, що починаються в [start, end).
+        """
+        doctor, data = self._validated_bulk_request(request)
+        try:
+            deleted = ScheduleService.delete_slots(doctor, data['start'], data['end'])
+        except ScheduleService.ScheduleError as e:
+            raise ValidationError(str(e))
+        return Response({'deleted': deleted})
+
+    @action(detail=False, methods=['post'], url_path='bulk-shift', permission_classes=[IsDoctorOrClinicAdmin])
+    def bulk_shift(self, request):
+        """
+        POST /api/v1/slots/bulk-shift/  {"start": ..., "end": ..., "minutes": 30}
+        Переносить незаброньовані слоти з [start, end) на minutes хвилин.
+        Повертає зсунуті слоти (ID зберігаються).
+        """
+        doctor, data = self._validated_bulk_request(request)
+        try:
+            time_slots = ScheduleService.shift_slots(
+                doctor, data['start'], data['end'], datetime.timedelta(minutes=data['minutes'])
+            )
+        except ScheduleService.ScheduleError as e:
+            raise ValidationError(str(e))
+        return Response({'shifted': len(time_slots), 'slots': DoctorSlotSerializer(time_slots, many=True).data})
+
+class AppointmentViewSet(ValuesListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint для керування записами на прийом.
     - Пацієнти: можуть створювати (POST) та бачити СВОЇ записи (GET).
     - Інші: нічого не бачать.
     """
     permission_classes = [permissions.IsAuthenticated] # Тільки для залогінених
+    pagination_class = AppointmentCursorPagination # ?cursor=...&page_size=N
+    values_serializer_class = AppointmentValuesSerializer # Швидкий list
+
+    # Зв'язки, які читає AppointmentSerializer (patient.user, doctor.user,
+    # doctor.specialty, time_slot): усі - FK/OneToOne, тож підтягуються
+    # JOIN'ом в тому ж запиті. Без цього - кілька запитів на КОЖЕН рядок.
+    RELATED_BY_ACTION = {
+        'list': ('patient__user', 'doctor__user', 'doctor__specialty', 'time_slot'),
+        'retrieve': ('patient__user', 'doctor__user', 'doctor__specialty', 'time_slot'),
+        'update': ('patient__user', 'doctor__user', 'doctor__specialty', 'time_slot'),
+        'partial_update': ('patient__user', 'doctor__user', 'doctor__specialty', 'time_slot'),
+    }
 
     def get_queryset(self):
         """
@@ -61,25 +288,171 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_patient:
             # Пацієнти бачать лише свої записи
-            return Appointment.objects.filter(patient__user=user)
+            queryset = Appointment.objects.filter(patient__user=user)
         elif user.is_doctor:
             # Лікарі бачать лише свої записи
-            return Appointment.objects.filter(doctor__user=user)
+            queryset = Appointment.objects.filter(doctor__user=user)
         elif user.is_staff:
             # Адміни бачать всі
-            return Appointment.objects.all()
-        return Appointment.objects.none() # Інші нічого не бачать
+            queryset = Appointment.objects.all()
+        else:
+            return Appointment.objects.none() # Інші нічого не бачать
+
+        related = self.RELATED_BY_ACTION.get(self.action)
+        if related:
+            queryset = queryset.select_related(*related)
+        return self.sparse_queryset(queryset)
 
     def get_serializer_class(self):
         """
         Використовуємо різні серіалізатори для різних дій.
         - `AppointmentCreateSerializer` (простий) для 'create'.
+        - `AppointmentBatchCreateSerializer` для 'batch'.
         - `AppointmentSerializer` (детальний) для 'list', 'retrieve'.
         """
         if self.action == 'create':
             return AppointmentCreateSerializer
+        if self.action == 'batch':
+            return AppointmentBatchCreateSerializer
         return AppointmentSerializer
 
     def get_serializer_context(self):
         """Передаємо об'єкт request у серіалізатор (для 'create')"""
-        return {'request': self.request}
\ No newline at end of file
+        return {'request': self.request}
+
+    def _idempotent_response(self, request, scope, perform):
+        """
+        Обгортка для POST-дій з підтримкою заголовка Idempotency-Key.
+        Повторний запит з тим самим ключем отримує відповідь першої спроби.
+        """
+        def run():
+            response = perform()
+            return {'status': response.status_code, 'data': response.data}
+
+        try:
+            result, replayed = run_idempotent(
+                request, scope, run,
+                fingerprint=json.dumps(request.data, sort_keys=True, default=str)
+            )
+        except IdempotencyError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        response = Response(result['data'], status=result['status'])
+        if replayed:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def create(self, request, *args, **kwargs):
+        return self._idempotent_response(
+            request, 'api:appointments:create',
+            lambda: super(AppointmentViewSet, self).create(request, *args, **kwargs)
+        )
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        POST /api/v1/appointments/batch/  {"time_slot_ids": [1, 2, 3]}
+        Бронює кілька слотів в одній транзакції: або всі, або жоден.
+        """
+        if not request.user.is_patient:
+            raise PermissionDenied("Лише пацієнти можуть бронювати прийоми.")
+
+        def perform():
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            appointments = serializer.save()
+
+            output = AppointmentSerializer(appointments, many=True, context=self.get_serializer_context())
+            return Response(output.data, status=status.HTTP_201_CREATED)
+
+        return self._idempotent_response(request, 'api:appointments:batch', perform)
+
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        """
+        POST /api/v1/appointments/hold/  {"time_slot": 1}
+        Тимчасово утримує слот, поки пацієнт підтверджує запис.
+        Підтвердження - звичайний POST /api/v1/appointments/ з тим самим слотом.
+        """
+        if not request.user.is_patient:
+            raise PermissionDenied("Лише пацієнти можуть бронювати прийоми.")
+
+        serializer = AppointmentCreateSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            time_slot = BookingService.hold_slot(
+                patient=request.user.patient,
+                time_slot_id=serializer.validated_data['time_slot'].id
+            )
+        except BookingService.BookingError as e:
+            raise ValidationError(str(e))
+
+        return Response(
+            {'time_slot': time_slot.id, 'held_until': time_slot.held_until},
+            status=status.HTTP_201_CREATED
+        )
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    API endpoint для звітів ("Перегляд Звітів").
+    Лише для адміністраторів.
+    - GET /api/v1/reports/ - список доступних звітів і їх параметрів.
+    - GET /api/v1/reports/<name>/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+    - GET /api/v1/reports/dashboard/?reports=a,b&... - кілька звітів паралельно
+    """
+    permission_classes = [IsClinicAdmin]
+    lookup_value_regex = '[a-z-]+'
+
+    def list(self, request):
+        return Response([
+            {'name': name, 'params': list(strategy_class.params), 'choices': strategy_class.choices}
+            for name, strategy_class in ReportGenerator.STRATEGIES.items()
+        ])
+
+    def retrieve(self, request, pk=None):
+        try:
+            report = ReportGenerator.for_report(pk).run_with_params(request.query_params)
+        except ReportStrategy.ReportError as e:
+            if pk not in ReportGenerator.STRATEGIES:
+                raise NotFound(str(e))
+            raise ValidationError(str(e))
+        return Response(report)
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        Панель звітів: усі (або перелічені в ?reports=) звіти однією відповіддю,
+        з часом виконання кожного. Параметри спільні для всіх звітів.
+        """
+        names = request.query_params.get('reports')
+        names = names.split(',') if names else list(ReportGenerator.STRATEGIES)
+        try:
+            return Response(ReportGenerator.run_many(names, request.query_params))
+        except ReportStrategy.ReportError as e:
+            raise ValidationError(str(e))
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    API endpoint для потокового експорту (білінг, аналітика).
+    Лише для адміністраторів.
+    GET /api/v1/exports/appointments/?output=csv|ndjson&start_date=&end_date=&doctor=&status=
+    GET /api/v1/exports/slots/?output=ndjson&doctor=ID
+    """
+    permission_classes = [IsClinicAdmin]
+    lookup_value_regex = '[a-z]+'
+
+    def retrieve(self, request, pk=None):
+        output = request.query_params.get('output', 'csv')
+        try:
+            filters = ExportService.parse_filters(pk, request.query_params)
+            lines = ExportService.stream(pk, output, **filters)
+        except ExportService.ExportError as e:
+            if pk not in ExportService.DATASETS:
+                raise NotFound(str(e))
+            raise ValidationError(str(e))
+
+        # StreamingHttpResponse минає рендерери DRF: рядки йдуть клієнту одразу
+        response = StreamingHttpResponse(lines, content_type=ExportService.FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="{pk}.{output}"'
+        return response
@@ -10,4 +10,6 @@ class ClinicConfig(AppConfig):
         Ми імпортуємо сигнали тут, щоб "підключити" їх.
         """
         # Це повідомляє Django про існування файлу signals.py
-        import clinic.signals
\ No newline at end of file
+        import clinic.signals
+        # Перевірки конфігурації (manage.py check --deploy)
+        import clinic.checks
\ No newline at end of file
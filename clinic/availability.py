@@ -0,0 +1,331 @@
+import datetime
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DailyAvailability, TimeSlot
+
+# --- Індекс вільного часу (бітсети) ---
+# Замість сканування рядків TimeSlot питання "чи є у лікаря вільний час
+# у день D" та "перший вільний слот після T" вирішуються бітовими
+# операціями над одним рядком DailyAvailability на лікаря на день.
+#
+# Індекс оновлюється перерахунком уражених днів з TimeSlot:
+# - поодинокі save() та delete() слотів - сигналами (signals.py);
+# - масові UPDATE/bulk_create у сервісах - явним викликом refresh().
+#
+# Читають індекс список лікарів (найближчий вільний час кожного -
+# first_free_slots) і перевірки has_free_slot / first_free_slot.
+#
+# Кожне оновлення також змінює "версію" вільного часу лікаря в кеші -
+# за нею інвалідуються закешовані списки вільних слотів (API /doctors/{id}/slots/).
+# Версії лежать у кеші 'default': між воркерами це працює лише зі спільним
+# кешем (REDIS_URL у settings). Утримання, що минули самі собою (без UPDATE),
+# версію не змінюють - такі слоти з'являються в списках після TTL кешу.
+
+
+class AvailabilityIndex:
+    """
+    Фасад для читання та оновлення індексу DailyAvailability.
+    """
+    GRANULARITY = datetime.timedelta(minutes=DailyAvailability.GRANULARITY_MIN)
+
+    @staticmethod
+    def key_for(doctor_id, start_time: datetime.datetime):
+        """Ключ (лікар, локальна дата) для слоту."""
+        return doctor_id, timezone.localtime(start_time).date()
+
+    @staticmethod
+    def bit_for(start_time: datetime.datetime) -> int:
+        local = timezone.localtime(start_time)
+        return (local.hour * 60 + local.minute) // DailyAvailability.GRANULARITY_MIN
+
+    @staticmethod
+    def day_start(day: datetime.date) -> datetime.datetime:
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+    @staticmethod
+    def indexed_filter() -> Q:
+        """
+        Слоти, що мають біт в індексі: вільні та утримувані. Утримання
+        "протухає" без UPDATE, тож інакше слот з простроченим утриманням
+        зник би з індексу до запуску release_expired_holds. Чи слот можна
+        забрати саме зараз, перевіряє first_free_slot (claimable_filter).
+        """
+        return Q(is_available=True) | Q(held_until__isnull=False)
+
+    # Скільки неперервних діапазонів (лікар, дні) потрапляє в один запит
+    REFRESH_CHUNK = 200
+
+    @staticmethod
+    def _day_ranges(keys) -> list:
+        """Групує ключі (doctor_id, date) у неперервні діапазони днів кожного лікаря."""
+        ranges = []
+        for doctor_id, day in sorted(keys):
+            if ranges and ranges[-1][0] == doctor_id and ranges[-1][2] + datetime.timedelta(days=1) == day:
+                ranges[-1][2] = day
+            else:
+                ranges.append([doctor_id, day, day])
+        return ranges
+
+    @staticmethod
+    def refresh(keys):
+        """
+        Перераховує бітсети для набору ключів (doctor_id, date) з TimeSlot.
+
+        Рядки індексу блокуються (select_for_update) ПЕРЕД читанням слотів,
+        тож конкурентні транзакції перераховують той самий день по черзі
+        і остання бачить усі зафіксовані зміни. Читаються лише дні з keys
+        (сусідні дні лікаря - одним діапазоном), а не все між найранішим
+        і найпізнішим днем. Кількість запитів не залежить від кількості ключів
+        (до REFRESH_CHUNK діапазонів на запит).
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        ranges = AvailabilityIndex._day_ranges(keys)
+
+        with transaction.atomic():
+            rows, masks = {}, dict.fromkeys(keys, 0)
+            for i in range(0, len(ranges), AvailabilityIndex.REFRESH_CHUNK):
+                chunk = ranges[i:i + AvailabilityIndex.REFRESH_CHUNK]
+                rows_filter, slots_filter = Q(), Q()
+                for doctor_id, first_day, last_day in chunk:
+                    rows_filter |= Q(doctor_id=doctor_id, date__gte=first_day, date__lte=last_day)
+                    slots_filter |= Q(
+                        doctor_id=doctor_id,
+                        start_time__gte=AvailabilityIndex.day_start(first_day),
+                        start_time__lt=AvailabilityIndex.day_start(last_day + datetime.timedelta(days=1))
+                    )
+
+                rows.update(
+                    ((row.doctor_id, row.date), row)
+                    for row in DailyAvailability.objects.select_for_update().filter(rows_filter)
+                )
+                free_slots = TimeSlot.objects.filter(
+                    slots_filter, AvailabilityIndex.indexed_filter()
+                ).order_by().values_list('doctor_id', 'start_time')
+                for doctor_id, start_time in free_slots:
+                    key = AvailabilityIndex.key_for(doctor_id, start_time)
+                    if key in masks:
+                        masks[key] |= 1 << AvailabilityIndex.bit_for(start_time)
+
+            to_create, to_update = [], []
+            for key, mask in masks.items():
+                row = rows.get(key)
+                if row is None:
+                    # Відсутній рядок означає "вільних слотів немає"
+                    if mask:
+                        row = DailyAvailability(doctor_id=key[0], date=key[1])
+                        row.mask = mask
+                        to_create.append(row)
+                elif row.mask != mask:
+                    row.mask = mask
+                    to_update.append(row)
+
+            DailyAvailability.objects.bulk_create(to_create, ignore_conflicts=True)
+            DailyAvailability.objects.bulk_update(to_update, ['bits'])
+            AvailabilityIndex.bump_versions({doctor_id for doctor_id, _ in keys})
+
+    # --- Відкладене оновлення (видалення слотів) ---
+    # post_delete надсилається на КОЖЕН видалений слот: ключі збираються
+    # і перераховуються одним refresh() після коміту, а не по слоту.
+    _pending = threading.local()
+
+    @staticmethod
+    def refresh_on_commit(keys):
+        """Додає ключі до відкладеного оновлення, яке виконається після коміту."""
+        pending = getattr(AvailabilityIndex._pending, 'keys', None)
+        if pending is None:
+            pending = AvailabilityIndex._pending.keys = set()
+        pending.update(keys)
+        transaction.on_commit(AvailabilityIndex._refresh_pending)
+
+    @staticmethod
+    def _refresh_pending():
+        # Перший колбек забирає всі накопичені ключі, решта - нічого не роблять.
+        # Ключі з відкоченої транзакції перераховуються з наступним комітом (це безпечно)
+        keys = getattr(AvailabilityIndex._pending, 'keys', None)
+        AvailabilityIndex._pending.keys = None
+        if keys:
+            AvailabilityIndex.refresh(keys)
+
+    @staticmethod
+    def _version_key(doctor_id) -> str:
+        return f"availability-version:{doctor_id}"
+
+    @staticmethod
+    def versions(doctor_ids) -> list:
+        """
+        Токени версій вільного часу лікарів (одним запитом до кешу).
+        Відсутній токен створюється заново, тож втрата ключа кешем
+        ніколи не поверне застарілий список.
+        """
+        keys = [AvailabilityIndex._version_key(doctor_id) for doctor_id in doctor_ids]
+        versions = cache.get_many(keys)
+        missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return [versions[key] for key in keys]
+
+    @staticmethod
+    def bump_versions(doctor_ids):
+        """Інвалідує кеші вільного часу лікарів після коміту транзакції."""
+        keys = [AvailabilityIndex._version_key(doctor_id) for doctor_id in set(doctor_ids)]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def refresh_slots(time_slots):
+        """Оновлює індекс для днів, яких торкнулися слоти (потрібні doctor_id та start_time)."""
+        AvailabilityIndex.refresh(
+            AvailabilityIndex.key_for(slot.doctor_id, slot.start_time) for slot in time_slots
+        )
+
+    @staticmethod
+    def rebuild(doctor_ids=None, batch_size: int = 1000) -> int:
+        """
+        Повністю перебудовує індекс з TimeSlot (для майбутніх днів).
+        Повертає кількість створених рядків індексу.
+        """
+        today = timezone.localdate()
+        with transaction.atomic():
+            rows = DailyAvailability.objects.filter(date__gte=today)
+            slots = TimeSlot.objects.filter(
+                AvailabilityIndex.indexed_filter(),
+                start_time__gte=AvailabilityIndex.day_start(today)
+            )
+            if doctor_ids is not None:
+                rows = rows.filter(doctor_id__in=doctor_ids)
+                slots = slots.filter(doctor_id__in=doctor_ids)
+            rows.delete()
+
+            masks = {}
+            for doctor_id, start_time in slots.values_list('doctor_id', 'start_time').iterator(chunk_size=batch_size):
+                key = AvailabilityIndex.key_for(doctor_id, start_time)
+                masks[key] = masks.get(key, 0) | 1 << AvailabilityIndex.bit_for(start_time)
+
+            new_rows = []
+            for (doctor_id, day), mask in masks.items():
+                row = DailyAvailability(doctor_id=doctor_id, date=day)
+                row.mask = mask
+                new_rows.append(row)
+            DailyAvailability.objects.bulk_create(new_rows, batch_size=batch_size)
+        return len(new_rows)
+
+    # --- Запити до індексу ---
+
+    @staticmethod
+    def _mask_from(day: datetime.date, mask: int, after: datetime.datetime) -> int:
+        """Прибирає біти слотів, що починаються раніше за after."""
+        local_after = timezone.localtime(after)
+        if day < local_after.date():
+            return 0
+        if day > local_after.date():
+            return mask
+        # Слот з бітом, що дорівнює поточному, може вже початися -
+        # перевіряємо його точний час пізніше, у first_free_slot
+        return mask & ~((1 << AvailabilityIndex.bit_for(after)) - 1)
+
+    @staticmethod
+    def _lowest_bucket(day: datetime.date, mask: int):
+        """Початок інтервалу наймолодшого встановленого біта (None, якщо бітів немає)."""
+        if not mask:
+            return None
+        bit = (mask & -mask).bit_length() - 1
+        return AvailabilityIndex.day_start(day) + bit * AvailabilityIndex.GRANULARITY
+
+    @staticmethod
+    def has_free_slot(doctor_id, day: datetime.date) -> bool:
+        """
+        Чи має лікар хоча б один вільний (ще не минулий) слот у день day.
+        Біт в індексі має і слот під активним утриманням (див. indexed_filter),
+        тому знайдений біт перевіряється через first_free_slot: відповідь
+        збігається з BookingService.claimable_filter. День без бітів - один запит.
+        """
+        after = max(AvailabilityIndex.day_start(day), timezone.now())
+        if timezone.localtime(after).date() != day:
+            return False # День уже минув
+        return AvailabilityIndex.first_free_slot(doctor_id, after=after, max_days=0) is not None
+
+    @staticmethod
+    def first_free_slot(doctor_id, after: datetime.datetime = None, max_days: int = 92):
+        """
+        Перший вільний слот лікаря, що починається не раніше after.
+        Дні переглядаються по бітсетах; з TimeSlot читається лише знайдений слот.
+        """
+        from .services import BookingService # services імпортує цей модуль
+
+        after = max(after or timezone.now(), timezone.now())
+        first_day = timezone.localtime(after).date()
+        rows = DailyAvailability.objects.filter(
+            doctor_id=doctor_id,
+            date__gte=first_day,
+            date__lte=first_day + datetime.timedelta(days=max_days)
+        ).order_by('date')
+
+        for row in rows.iterator():
+            mask = AvailabilityIndex._mask_from(row.date, row.mask, after)
+            while mask:
+                bucket_start = AvailabilityIndex._lowest_bucket(row.date, mask)
+                time_slot = TimeSlot.objects.filter(
+                    BookingService.claimable_filter(),
+                    doctor_id=doctor_id,
+                    start_time__gte=max(bucket_start, after),
+                    start_time__lt=bucket_start + AvailabilityIndex.GRANULARITY
+                ).first()
+                if time_slot is not None:
+                    return time_slot
+                mask &= mask - 1 # Біт застарів або слот вже почався - наступний
+        return None
+
+    @staticmethod
+    def first_free_slots(doctor_ids, max_days: int = 31) -> dict:
+        """
+        Найближчий вільний слот кожного з лікарів: {doctor_id: TimeSlot}
+        (лікарі без вільних слотів у max_days днів відсутні).
+        Бітсети всіх лікарів читаються одним запитом, слоти перших бітів -
+        другим; лише для застарілих бітів (напр. активне утримання)
+        лікаря дошукує first_free_slot.
+        """
+        from .services import BookingService # services імпортує цей модуль
+
+        doctor_ids = set(doctor_ids)
+        if not doctor_ids:
+            return {}
+        now = timezone.now()
+        today = timezone.localdate()
+        rows = DailyAvailability.objects.filter(
+            doctor_id__in=doctor_ids,
+            date__gte=today,
+            date__lte=today + datetime.timedelta(days=max_days)
+        ).order_by('doctor_id', 'date')
+
+        buckets = {}
+        for row in rows.iterator():
+            if row.doctor_id not in buckets:
+                bucket_start = AvailabilityIndex._lowest_bucket(row.date, AvailabilityIndex._mask_from(row.date, row.mask, now))
+                if bucket_start is not None:
+                    buckets[row.doctor_id] = bucket_start
+        if not buckets:
+            return {}
+
+        in_buckets = Q()
+        for doctor_id, bucket_start in buckets.items():
+            in_buckets |= Q(
+                doctor_id=doctor_id,
+                start_time__gte=max(bucket_start, now),
+                start_time__lt=bucket_start + AvailabilityIndex.GRANULARITY
+            )
+        found = {}
+        for time_slot in TimeSlot.objects.filter(BookingService.claimable_filter(), in_buckets).order_by('start_time'):
+            found.setdefault(time_slot.doctor_id, time_slot)
+        for doctor_id in buckets.keys() - found.keys():
+            time_slot = AvailabilityIndex.first_free_slot(doctor_id, after=now, max_days=max_days)
+            if time_slot is not None:
+                found[doctor_id] = time_slot
+        return found
@@ -0,0 +1,83 @@
+import datetime
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+# --- Умовні GET (ETag / Last-Modified) для довідників ---
+# Лікарі та спеціалізації змінюються кілька разів на тиждень, а клієнти
+# опитують їх постійно. Для кожного довідника в кеші лежить "версія"
+# (токен + час зміни), яку сигнали (signals.py) оновлюють при збереженні
+# Doctor / Specialty / User лікаря. Повторний запит з If-None-Match або
+# If-Modified-Since отримує 304, не торкаючись ORM.
+#
+# Версії мають лежати у спільному для воркерів кеші 'default' (REDIS_URL у settings),
+# інакше клієнт з ETag іншого воркера отримуватиме 304 зі старими даними.
+# Масові .update() сигналів не викликають - після них викличте CatalogVersion.bump().
+
+
+class CatalogVersion:
+    """
+    Фасад для версій довідників API.
+    """
+    DOCTORS = 'doctors'
+    SPECIALTIES = 'specialties'
+
+    @staticmethod
+    def _key(resource: str) -> str:
+        return f"catalog-version:{resource}"
+
+    @staticmethod
+    def _new_version(previous: dict = None) -> dict:
+        # HTTP-дати мають точність до секунди. Нова версія завжди хоча б на
+        # секунду "новіша" за попередню - інакше зміна в ту саму секунду
+        # лишила б клієнтам з If-Modified-Since відповідь 304 зі старими даними
+        modified = timezone.now().replace(microsecond=0)
+        if previous is not None:
+            modified = max(modified, previous['modified'] + datetime.timedelta(seconds=1))
+        return {'etag': uuid.uuid4().hex, 'modified': modified}
+
+    @staticmethod
+    def get(resource: str) -> dict:
+        """
+        Поточна версія довідника. Якщо кеш її втратив - створюється нова:
+        клієнти один раз отримають повну відповідь, але ніколи - застарілу.
+        """
+        version = cache.get(CatalogVersion._key(resource))
+        if version is None:
+            cache.add(CatalogVersion._key(resource), CatalogVersion._new_version(), timeout=None)
+            version = cache.get(CatalogVersion._key(resource))
+        return version
+
+    @staticmethod
+    def bump(*resources):
+        """Нова версія довідників - після коміту, щоб не віддати старі дані з новим ETag."""
+        def update():
+            for resource in resources:
+                key = CatalogVersion._key(resource)
+                cache.set(key, CatalogVersion._new_version(cache.get(key)), timeout=None)
+        transaction.on_commit(update)
+
+
+def catalog_condition(resource: str):
+    """
+    Декоратор методів ViewSet (list/retrieve): ETag та Last-Modified з версії
+    довідника. ETag також залежить від представлення: шляху з рядком запиту
+    (фільтри, сторінка курсора, ?fields=), Accept та формату відповіді -
+    різні відповіді ніколи не ділять один валідатор.
+    """
+    def etag(request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        representation = hashlib.sha1(
+            f"{request.get_full_path()}\n{request.headers.get('Accept', '')}".encode()
+        ).hexdigest()[:16]
+        return f"{CatalogVersion.get(resource)['etag']}-{representation}-{renderer.format if renderer else ''}"
+
+    def last_modified(request, *args, **kwargs):
+        return CatalogVersion.get(resource)['modified']
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# --- Перевірки конфігурації (python manage.py check --deploy) ---
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_default_cache(app_configs, **kwargs):
+    """
+    Версії кешів (AvailabilityIndex, ReportCache, CatalogVersion) лежать
+    у кеші 'default': з локальним кешем кожен воркер має власні версії,
+    і зміни, зроблені через інший воркер, не інвалідують його кеш.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            "Кеш 'default' не спільний для процесів: інвалідація кешів API не дійде до інших воркерів.",
+            hint="Задайте REDIS_URL (спільний кеш Redis).",
+            id='clinic.W001',
+        )]
+    return []
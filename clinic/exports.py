@@ -0,0 +1,133 @@
+import csv
+import datetime
+import json
+
+from .models import Appointment, TimeSlot
+from .services import ReportStrategy
+
+# --- Потоковий експорт (CSV / NDJSON) ---
+# Рядки читаються пачками (QuerySet.iterator) з пласкої проєкції values_list
+# і відразу віддаються клієнту - у пам'яті ніколи немає всього результату,
+# скільки б рядків не було в історії.
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: повертає рядок замість запису в буфер."""
+    def write(self, value):
+        return value
+
+
+class ExportService:
+    """
+    Фасад для потокового експорту записів на прийом та слотів.
+    """
+
+    class ExportError(Exception):
+        """Невідомий набір даних, формат або некоректні фільтри."""
+        pass
+
+    CHUNK_SIZE = 2000
+    FORMATS = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    # Набір даних -> (модель, [(назва колонки, поле для values_list)])
+    DATASETS = {
+        'appointments': (Appointment, [
+            ('id', 'id'),
+            ('start_time', 'start_time'),
+            ('status', 'status'),
+            ('doctor_id', 'doctor_id'),
+            ('doctor_first_name', 'doctor__user__first_name'),
+            ('doctor_last_name', 'doctor__user__last_name'),
+            ('patient_id', 'patient_id'),
+            ('patient_first_name', 'patient__user__first_name'),
+            ('patient_last_name', 'patient__user__last_name'),
+            ('time_slot_id', 'time_slot_id'),
+            ('created_at', 'created_at'),
+        ]),
+        'slots': (TimeSlot, [
+            ('id', 'id'),
+            ('doctor_id', 'doctor_id'),
+            ('start_time', 'start_time'),
+            ('end_time', 'end_time'),
+            ('is_available', 'is_available'),
+            ('held_until', 'held_until'),
+        ]),
+    }
+
+    @staticmethod
+    def parse_filters(dataset: str, raw) -> dict:
+        """
+        Перевіряє фільтри з запиту/командного рядка (усі необов'язкові):
+        start_date, end_date (YYYY-MM-DD), doctor (ID), status (лише для записів).
+        """
+        if dataset not in ExportService.DATASETS:
+            raise ExportService.ExportError(f"Невідомий набір даних '{dataset}'.")
+
+        filters = {}
+        for param in ('start_date', 'end_date'):
+            if raw.get(param):
+                try:
+                    filters[param] = datetime.date.fromisoformat(raw[param])
+                except ValueError:
+                    raise ExportService.ExportError(f"Параметр '{param}' має бути датою у форматі YYYY-MM-DD.")
+        if raw.get('doctor'):
+            try:
+                filters['doctor'] = int(raw['doctor'])
+            except ValueError:
+                raise ExportService.ExportError("Параметр 'doctor' має бути числом.")
+        if raw.get('status'):
+            if dataset != 'appointments' or raw['status'] not in Appointment.Status.values:
+                raise ExportService.ExportError(f"Некоректний статус '{raw['status']}'.")
+            filters['status'] = raw['status']
+        return filters
+
+    @staticmethod
+    def queryset(dataset: str, start_date: datetime.date = None, end_date: datetime.date = None,
+                 doctor: int = None, status: str = None):
+        """Пласка проєкція (values_list) з фільтрами по індексованих колонках."""
+        model, columns = ExportService.DATASETS[dataset]
+        query = model.objects.all()
+        if start_date:
+            query = query.filter(start_time__gte=ReportStrategy.day_bounds(start_date, start_date)[0])
+        if end_date:
+            query = query.filter(start_time__lt=ReportStrategy.day_bounds(end_date, end_date)[1])
+        if doctor:
+            query = query.filter(doctor_id=doctor)
+        if status:
+            query = query.filter(status=status)
+        return query.order_by('start_time', 'id').values_list(*[field for _, field in columns])
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def stream(dataset: str, output: str = 'csv', **filters):
+        """
+        Повертає генератор рядків експорту (з заголовком для CSV).
+        Помилки параметрів піднімаються одразу, до початку відповіді.
+        """
+        if output not in ExportService.FORMATS:
+            raise ExportService.ExportError(f"Невідомий формат '{output}'. Доступні: csv, ndjson.")
+        return ExportService._lines(dataset, output, filters)
+
+    @staticmethod
+    def _lines(dataset: str, output: str, filters: dict):
+        """Рядки БД читаються пачками по CHUNK_SIZE і відразу форматуються."""
+        headers = [header for header, _ in ExportService.DATASETS[dataset][1]]
+        rows = ExportService.queryset(dataset, **filters).iterator(chunk_size=ExportService.CHUNK_SIZE)
+
+        if output == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow(headers)
+            for row in rows:
+                yield writer.writerow([ExportService._value(value) for value in row])
+        else:
+            for row in rows:
+                record = {header: ExportService._value(value) for header, value in zip(headers, row)}
+                yield json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.core.cache import caches
+
+# --- Ідемпотентні запити (Idempotency-Key) ---
+# Клієнт (або балансувальник) може повторити POST після таймауту.
+# Якщо запит прийшов з тим самим ключем, ми повертаємо збережений результат
+# першої спроби і НЕ викликаємо BookingService вдруге.
+#
+# Результати зберігаються у кеші 'idempotency' (див. CACHES у settings.py):
+# він обмежений за розміром (MAX_ENTRIES) і сам видаляє записи за TTL (TIMEOUT).
+# Його таблицю створює крок деплою python manage.py createcachetable.
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_FORM_FIELD = 'idempotency_key'
+
+# Скільки "живе" позначка "запит виконується" (на випадок падіння воркера)
+IN_PROGRESS_TIMEOUT = 60
+
+_IN_PROGRESS = 'IN_PROGRESS'
+_DONE = 'DONE'
+
+
+class IdempotencyError(Exception):
+    """Запит з цим ключем ще виконується або ключ використано з іншими даними."""
+    pass
+
+
+def get_idempotency_key(request):
+    """Читає ключ із заголовка (API) або з прихованого поля форми (HTML)."""
+    return request.headers.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FORM_FIELD)
+
+
+def _cache_key(user_id, scope, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{scope}:{user_id}:{digest}"
+
+
+def run_idempotent(request, scope: str, func, fingerprint: str = ''):
+    """
+    Виконує func() не більше одного разу для пари (користувач, ключ).
+
+    func має повертати серіалізований (pickle) результат - його і
+    отримає повторний запит. Зберігаються лише успішні результати: якщо
+    func піднімає виняток, ключ звільняється і запит можна повторити.
+
+    Повертає кортеж (result, replayed).
+    """
+    key = get_idempotency_key(request)
+    if not key or not request.user.is_authenticated:
+        return func(), False
+
+    cache = caches['idempotency']
+    cache_key = _cache_key(request.user.pk, scope, key)
+
+    # add() атомарний: лише один з одночасних запитів "займе" ключ
+    if cache.add(cache_key, {'state': _IN_PROGRESS, 'fingerprint': fingerprint}, IN_PROGRESS_TIMEOUT):
+        try:
+            result = func()
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        cache.set(cache_key, {'state': _DONE, 'fingerprint': fingerprint, 'result': result})
+        return result, False
+
+    stored = cache.get(cache_key)
+    if stored is None or stored['state'] == _IN_PROGRESS:
+        raise IdempotencyError("Запит з цим ключем ще обробляється. Спробуйте пізніше.")
+    if stored['fingerprint'] != fingerprint:
+        raise IdempotencyError("Цей ключ ідемпотентності вже використано для іншого запиту.")
+    return stored['result'], True
@@ -0,0 +1,178 @@
+import datetime
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from clinic.models import User, Doctor, Patient, TimeSlot, Appointment
+from clinic.services import BookingService
+
+
+class Command(BaseCommand):
+    """
+    Навантажувальний тест бронювання.
+    Багато потоків одночасно намагаються забронювати ОДИН і той самий слот.
+    Звітує про кількість бронювань за секунду, конфлікти захоплення слоту
+    (спроби, що програли умовний UPDATE - SlotTakenError), окремо - помилки
+    блокування БД, та слоти, що отримали не рівно одне бронювання.
+    SQLite блокує всю БД на запис, тож там програні спроби здебільшого
+    завершуються помилкою блокування, а не конфліктом захоплення.
+
+    За замовчуванням працює на окремій тимчасовій БД (як manage.py test;
+    на PostgreSQL - stress_<NAME>), яка знищується після запуску -
+    робоча БД не змінюється. --current-db запускає тест у поточній БД
+    (тимчасові дані видаляються).
+
+    Приклад: python manage.py booking_stress --threads 16 --rounds 20
+    """
+    help = "Перевіряє BookingService на конфлікти бронювання під конкурентним навантаженням."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Кількість потоків на один слот")
+        parser.add_argument('--rounds', type=int, default=10, help="Кількість слотів (раундів)")
+        parser.add_argument(
+            '--current-db', action='store_true',
+            help="Використати поточну БД замість тимчасової тестової"
+        )
+
+    def handle(self, *args, **options):
+        threads_count = options['threads']
+        rounds = options['rounds']
+
+        old_name = None
+        if not options['current_db']:
+            if connection.is_in_memory_db():
+                # Вже тестова БД у пам'яті (напр. з-під manage.py test): друга
+                # тестова БД з тим самим іменем затерла б її
+                raise CommandError("Поточна БД вже тимчасова - запустіть з --current-db.")
+            old_name = connection.settings_dict['NAME']
+            test_settings = connection.settings_dict['TEST']
+            old_test_name = test_settings.get('NAME')
+            if connection.vendor != 'sqlite':
+                # Не test_<NAME>: autoclobber не повинен знищити БД запущених тестів
+                test_settings['NAME'] = f'stress_{old_name}'
+            try:
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            finally:
+                test_settings['NAME'] = old_test_name
+        # Унікальний префікс: залишки перерваного запуску не заважають наступному
+        self.prefix = f'stress_{uuid.uuid4().hex[:8]}_'
+        try:
+            doctor, patients = self._create_fixtures(threads_count)
+            try:
+                stats = self._run(doctor, patients, rounds)
+            finally:
+                self._cleanup()
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        elapsed = stats['elapsed'] or 1e-9
+        self.stdout.write(f"Потоків: {threads_count}, слотів: {rounds}, спроб: {stats['attempts']}")
+        self.stdout.write(f"Успішних бронювань: {stats['booked']}")
+        self.stdout.write(
+            f"Конфліктів захоплення (слот зайнято): {stats['taken']} "
+            f"({stats['taken'] / (stats['attempts'] or 1):.0%} спроб)"
+        )
+        self.stdout.write(
+            f"Помилок блокування БД: {stats['locked']} "
+            f"({stats['locked'] / (stats['attempts'] or 1):.0%} спроб)"
+        )
+        self.stdout.write(f"Інших помилок: {stats['errors']}")
+        self.stdout.write(f"Бронювань/сек: {stats['booked'] / elapsed:.1f}")
+        self.stdout.write(f"Спроб/сек: {stats['attempts'] / elapsed:.1f}")
+
+        # Кожен слот мав отримати рівно одне бронювання: 0 - бронювання
+        # "загубилось" (усі спроби впали), >1 - слот видано двічі
+        if stats['bad_slots']:
+            self.stdout.write(self.style.ERROR(f"Слотів не з одним бронюванням: {stats['bad_slots']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Слотів не з одним бронюванням: 0"))
+
+    def _create_fixtures(self, threads_count):
+        """Створює тимчасового лікаря та по одному пацієнту на потік."""
+        with transaction.atomic():
+            doctor_user = User.objects.create(
+                username=f'{self.prefix}doctor', role=User.Role.DOCTOR
+            )
+            doctor = Doctor.objects.create(user=doctor_user)
+            patients = []
+            for i in range(threads_count):
+                user = User.objects.create(
+                    username=f'{self.prefix}patient_{i}', role=User.Role.PATIENT
+                )
+                patients.append(Patient.objects.create(user=user))
+        return doctor, patients
+
+    def _cleanup(self):
+        # Каскадно видаляє профілі, слоти та записи
+        User.objects.filter(username__startswith=self.prefix).delete()
+
+    def _run(self, doctor, patients, rounds):
+        results = {'booked': 0, 'taken': 0, 'locked': 0, 'errors': 0}
+        booked_per_slot = Counter()
+        lock = threading.Lock()
+        first_start = timezone.now() + datetime.timedelta(days=1)
+        slots = [
+            TimeSlot.objects.create(
+                doctor=doctor,
+                start_time=first_start + datetime.timedelta(minutes=30 * i),
+                end_time=first_start + datetime.timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(rounds)
+        ]
+
+        def worker(patient, slot_id, barrier):
+            outcome = 'errors'
+            try:
+                barrier.wait()
+                BookingService.create_appointment(patient=patient, time_slot_id=slot_id)
+                outcome = 'booked'
+            except BookingService.SlotTakenError:
+                outcome = 'taken'
+            except OperationalError:
+                # Блокування рядка/таблиці конкурентом (SQLite без row-level locks)
+                outcome = 'locked'
+            except Exception:
+                outcome = 'errors'
+            finally:
+                # Кожен потік має власне з'єднання з БД - закриваємо його
+                connection.close()
+            with lock:
+                results[outcome] += 1
+                if outcome == 'booked':
+                    booked_per_slot[slot_id] += 1
+
+        elapsed = 0.0
+        for slot in slots:
+            barrier = threading.Barrier(len(patients))
+            threads = [
+                threading.Thread(target=worker, args=(patient, slot.id, barrier))
+                for patient in patients
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed += time.perf_counter() - started
+
+        # Перевіряємо і звіти потоків, і те, що реально записано в БД
+        appointments_per_slot = Counter(
+            Appointment.objects.filter(time_slot__in=slots).values_list('time_slot_id', flat=True)
+        )
+        bad_slots = sum(
+            1 for slot in slots
+            if booked_per_slot[slot.id] != 1 or appointments_per_slot[slot.id] != 1
+        )
+
+        return {
+            **results,
+            'attempts': len(slots) * len(patients),
+            'bad_slots': bad_slots,
+            'elapsed': elapsed,
+        }
@@ -0,0 +1,126 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from clinic.models import TimeSlot, Appointment, DailyAvailability, AppointmentDailyStats
+from clinic.services import BookingService, DailyAppointmentsStrategy, NewPatientsStrategy
+
+
+def hot_queries():
+    """
+    "Гарячі" запити з views.py, api_viewsets.py та services.py.
+    ID - довільні: для плану запиту важлива форма запиту, а не значення.
+    Додаючи новий частий запит у код, додайте його і сюди.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    return [
+        ("views.doctor_detail_view: вільні слоти лікаря",
+         TimeSlot.objects.filter(BookingService.claimable_filter(), doctor_id=1).order_by('start_time')),
+        ("views.patient_dashboard_view: записи пацієнта",
+         Appointment.objects.filter(patient_id=1, start_time__gte=now).select_related(
+             'doctor__user'
+         ).order_by('start_time')),
+        ("views.doctor_dashboard_view: записи лікаря",
+         Appointment.objects.filter(doctor_id=1, start_time__gte=now).select_related(
+             'patient__user'
+         ).order_by('start_time')),
+        ("api_viewsets.AppointmentViewSet: записи пацієнта",
+         Appointment.objects.filter(patient__user_id=1)),
+        ("api_viewsets.AppointmentViewSet: записи лікаря",
+         Appointment.objects.filter(doctor__user_id=1)),
+        ("api_viewsets.AppointmentViewSet: сторінка курсорної пагінації (адмін)",
+         Appointment.objects.filter(start_time__gt=now).order_by('start_time', 'id')[:51]),
+        ("services.BookingService.claim_slot",
+         TimeSlot.objects.filter(BookingService.claimable_filter(), id=1)),
+        ("services.BookingService.release_expired_holds",
+         TimeSlot.objects.filter(held_until__lt=now)[:1000]),
+        ("services.SlotSearchService.next_available",
+         TimeSlot.objects.filter(is_available=True, start_time__gte=now).order_by('start_time', 'id')[:10]),
+        ("services.SlotSearchService.next_available (прострочені утримання)",
+         TimeSlot.objects.filter(held_until__lt=now, start_time__gte=now).order_by('start_time', 'id')[:10]),
+        ("services.SlotSearchService.next_available (спеціалізація)",
+         TimeSlot.objects.filter(
+             is_available=True, start_time__gte=now, doctor__specialty_id=1
+         ).order_by('start_time', 'id')[:10]),
+        ("services.SlotSearchService.doctor_slots (кілька лікарів)",
+         TimeSlot.objects.filter(
+             BookingService.claimable_filter(), doctor_id__in=[1, 2, 3],
+             start_time__gte=now, start_time__lt=now + datetime.timedelta(days=7)
+         ).order_by('start_time', 'id')[:101]),
+        ("services.DailyAppointmentsStrategy",
+         DailyAppointmentsStrategy().queryset(today)),
+        ("services.DoctorLoadStrategy (підзапит по лікарю)",
+         AppointmentDailyStats.objects.filter(
+             doctor_id=1, status=Appointment.Status.COMPLETED,
+             date__gte=today - datetime.timedelta(days=30), date__lte=today
+         )),
+        ("services.NewPatientsStrategy",
+         NewPatientsStrategy().queryset(today - datetime.timedelta(days=30), today)),
+        ("reminders.ReminderService.dispatch",
+         Appointment.objects.filter(
+             status=Appointment.Status.PLANNED,
+             start_time__gt=now,
+             start_time__lte=now + datetime.timedelta(hours=2)
+         ).order_by()),
+        ("availability.AvailabilityIndex.first_free_slot",
+         DailyAvailability.objects.filter(
+             doctor_id=1, date__gte=today, date__lte=today + datetime.timedelta(days=92)
+         ).order_by('date')),
+    ]
+
+
+def full_scans(plan: str, table: str) -> list:
+    """
+    Повертає рядки плану, у яких таблиця читається повністю.
+    Розуміє формат SQLite ("SCAN table" без індексу) та PostgreSQL ("Seq Scan on table").
+    """
+    pattern = re.compile(
+        rf'(\bSCAN {table}\b(?!.*\bINDEX\b))|(\bSeq Scan on {table}\b)'
+    )
+    return [line.strip() for line in plan.splitlines() if pattern.search(line)]
+
+
+class Command(BaseCommand):
+    """
+    Запускає EXPLAIN для кожного "гарячого" запиту і завершується з помилкою,
+    якщо основна таблиця запиту читається повним скануванням.
+    python manage.py explain_hot_queries -v 2   (з виведенням планів)
+    """
+    help = "Перевіряє, що гарячі запити використовують індекси (EXPLAIN)."
+
+    def explain(self, queryset) -> str:
+        """
+        План запиту. На малих (тестових) таблицях PostgreSQL обирає Seq Scan,
+        навіть коли індекс є, тож там послідовне сканування вимикається
+        (SET LOCAL у транзакції): Seq Scan у плані лишиться лише тоді,
+        коли придатного індексу немає взагалі.
+        """
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in hot_queries():
+            table = queryset.model._meta.db_table
+            plan = self.explain(queryset)
+            scans = full_scans(plan, table)
+
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"--- {name}\n{plan}")
+            if scans:
+                failures.append(f"{name}: {'; '.join(scans)}")
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK         {name}"))
+
+        if failures:
+            raise CommandError(
+                f"Повне сканування таблиці ({connection.vendor}):\n" + "\n".join(failures)
+            )
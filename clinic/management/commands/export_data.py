@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinic.exports import ExportService
+
+
+class Command(BaseCommand):
+    """
+    Потоковий експорт записів або слотів у CSV / NDJSON.
+    python manage.py export_data appointments --output ndjson --start-date 2025-01-01 --status COMPLETED > out.ndjson
+    python manage.py export_data slots --doctor 3 --file slots.csv
+    """
+    help = "Експортує записи на прийом або слоти у CSV/NDJSON без завантаження всього в пам'ять."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(ExportService.DATASETS))
+        parser.add_argument('--output', choices=list(ExportService.FORMATS), default='csv')
+        parser.add_argument('--start-date', help="YYYY-MM-DD (включно)")
+        parser.add_argument('--end-date', help="YYYY-MM-DD (включно)")
+        parser.add_argument('--doctor', help="ID лікаря")
+        parser.add_argument('--status', help="Статус запису (лише для appointments)")
+        parser.add_argument('--file', help="Файл для запису (за замовчуванням - stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            filters = ExportService.parse_filters(options['dataset'], options)
+            lines = ExportService.stream(options['dataset'], options['output'], **filters)
+        except ExportService.ExportError as e:
+            raise CommandError(str(e))
+
+        if options['file']:
+            with open(options['file'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,26 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from clinic.services import ScheduleService
+
+
+class Command(BaseCommand):
+    """
+    Створює слоти з шаблонів розкладу на ковзне вікно вперед.
+    Запускається щоночі (cron):
+    python manage.py materialize_schedules --days 28
+    """
+    help = "Перетворює шаблони розкладу (ScheduleTemplate) на слоти для ковзного вікна."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ScheduleService.MATERIALIZE_WINDOW_DAYS,
+            help="На скільки днів вперед створювати слоти"
+        )
+
+    def handle(self, *args, **options):
+        until = timezone.localdate() + datetime.timedelta(days=options['days'])
+        created = ScheduleService.materialize_templates(until=until)
+        self.stdout.write(self.style.SUCCESS(f"Оброблено слотів до {until}: {created}"))
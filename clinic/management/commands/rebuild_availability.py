@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from clinic.availability import AvailabilityIndex
+
+
+class Command(BaseCommand):
+    """
+    Перебудовує індекс вільного часу (DailyAvailability) з таблиці TimeSlot.
+    python manage.py rebuild_availability [--doctor ID ...]
+    """
+    help = "Перебудовує бітсети вільного часу лікарів з TimeSlot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, nargs='*', help="ID лікарів (за замовчуванням - всі)")
+
+    def handle(self, *args, **options):
+        created = AvailabilityIndex.rebuild(doctor_ids=options['doctor'])
+        self.stdout.write(self.style.SUCCESS(f"Створено рядків індексу: {created}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from clinic.stats import StatsRollup
+
+
+class Command(BaseCommand):
+    """
+    Перебудовує зведену статистику звітів з таблиць Appointment та Patient.
+    python manage.py rebuild_stats
+    """
+    help = "Перераховує AppointmentDailyStats та NewPatientsDailyStats з сирих даних."
+
+    def handle(self, *args, **options):
+        created = StatsRollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Рядків статистики записів: {created['appointments']}, "
+            f"нових пацієнтів: {created['new_patients']}"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from clinic.services import BookingService
+
+
+class Command(BaseCommand):
+    """
+    Звільняє слоти, утримання яких прострочене.
+    Запускається періодично (наприклад, cron раз на хвилину):
+    python manage.py release_expired_holds --batch-size 1000
+    """
+    help = "Звільняє слоти з простроченим тимчасовим утриманням (пачками)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Кількість слотів в одному UPDATE")
+
+    def handle(self, *args, **options):
+        released = BookingService.release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Звільнено слотів: {released}"))
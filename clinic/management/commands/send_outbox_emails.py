@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clinic.outbox import EmailOutbox
+
+
+class Command(BaseCommand):
+    """
+    Воркер черги листів (OutboxEmail).
+    Разовий запуск (cron):     python manage.py send_outbox_emails
+    Постійний процес:          python manage.py send_outbox_emails --loop --interval 5
+    """
+    help = "Відправляє листи з черги OutboxEmail пачками через одне SMTP-з'єднання."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Листів в одній пачці")
+        parser.add_argument('--loop', action='store_true', help="Працювати безперервно")
+        parser.add_argument('--interval', type=float, default=5, help="Пауза між пустими проходами (сек)")
+
+    def handle(self, *args, **options):
+        while True:
+            # Вичерпуємо чергу повністю, пачка за пачкою
+            while True:
+                stats = EmailOutbox.drain(batch_size=options['batch_size'])
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"Відправлено: {stats['sent']}, на повтор: {stats['retry']}, помилок: {stats['failed']}"
+                    )
+                if stats['sent'] + stats['retry'] + stats['failed'] < options['batch_size']:
+                    break
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from clinic.reminders import ReminderService
+
+
+class Command(BaseCommand):
+    """
+    Ставить у чергу нагадування про прийоми (за 24 год та за 2 год).
+    Запускається щохвилини (cron):
+    python manage.py send_reminders
+    Самі листи відправляє воркер send_outbox_emails.
+    """
+    help = "Ставить у чергу нагадування для записів, що увійшли у вікно нагадувань."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=list(ReminderService.WINDOWS), help="Лише один вид нагадувань"
+        )
+
+    def handle(self, *args, **options):
+        if options['kind']:
+            results = {options['kind']: ReminderService.dispatch(options['kind'])}
+        else:
+            results = ReminderService.dispatch_all()
+
+        for kind, count in results.items():
+            self.stdout.write(self.style.SUCCESS(f"Нагадування {kind}: {count}"))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='held_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_slots', to='clinic.patient'),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='held_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
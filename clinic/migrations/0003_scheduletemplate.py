@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0002_timeslot_hold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(default='0,1,2,3,4', help_text='Дні тижня через кому: 0 - понеділок ... 6 - неділя', max_length=13)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('interval_min', models.PositiveSmallIntegerField(default=30)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, editable=False, null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to='clinic.doctor')),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0003_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bits', models.BinaryField(default=b'')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availability', to='clinic.doctor')),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_start_time(apps, schema_editor):
+    """Копіює time_slot.start_time у кожен наявний запис одним UPDATE."""
+    Appointment = apps.get_model('clinic', 'Appointment')
+    TimeSlot = apps.get_model('clinic', 'TimeSlot')
+    Appointment.objects.update(
+        start_time=Subquery(
+            TimeSlot.objects.filter(pk=OuterRef('time_slot_id')).values('start_time')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='start_time',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_start_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='start_time',
+            field=models.DateTimeField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_patient_slot_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_doctor_slot_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_status_slot_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'start_time'], name='appt_patient_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'start_time'], name='appt_doctor_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'start_time'], name='appt_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0007_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10, unique=True)),
+                ('processed_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='clinic.appointment')),
+            ],
+            options={
+                'unique_together': {('appointment', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_stats(apps, schema_editor):
+    """Заповнює зведені таблиці з наявних записів і пацієнтів (як rebuild_stats)."""
+    Appointment = apps.get_model('clinic', 'Appointment')
+    Patient = apps.get_model('clinic', 'Patient')
+    AppointmentDailyStats = apps.get_model('clinic', 'AppointmentDailyStats')
+    NewPatientsDailyStats = apps.get_model('clinic', 'NewPatientsDailyStats')
+    tz = timezone.get_current_timezone()
+
+    AppointmentDailyStats.objects.bulk_create([
+        AppointmentDailyStats(date=row['date'], doctor_id=row['doctor_id'], status=row['status'], count=row['count'])
+        for row in Appointment.objects.annotate(
+            date=TruncDate('start_time', tzinfo=tz)
+        ).values('date', 'doctor_id', 'status').annotate(count=Count('pk')).order_by()
+    ], batch_size=1000)
+    NewPatientsDailyStats.objects.bulk_create([
+        NewPatientsDailyStats(date=row['date'], count=row['count'])
+        for row in Patient.objects.annotate(
+            date=TruncDate('user__date_joined', tzinfo=tz)
+        ).values('date').annotate(count=Count('pk')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0008_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewPatientsDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AppointmentDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PLANNED', 'Заплановано'), ('COMPLETED', 'Завершено'), ('CANCELLED', 'Скасовано')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='clinic.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'status', 'date'], name='stats_doctor_status_date_idx')],
+                'unique_together': {('date', 'doctor', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
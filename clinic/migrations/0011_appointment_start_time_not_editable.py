@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0010_appointment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='start_time',
+            field=models.DateTimeField(editable=False),
+        ),
+    ]
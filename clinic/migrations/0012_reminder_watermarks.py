@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0011_appointment_start_time_not_editable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='scheduled_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['scheduled_at'], name='appt_scheduled_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='remindercursor',
+            name='scheduled_until',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings # Використовується для посилання на кастомну модель User
+from django.utils import timezone
 
 # --- 1. Кастомна Модель Користувача (User) ---
 # Наслідуємо AbstractUser, щоб зберегти всі поля Django (login, password)
@@ -25,6 +26,12 @@ class User(AbstractUser):
         default=Role.PATIENT
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # NewPatientsStrategy: реєстрації за період
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
     # Допоміжні властивості для перевірки ролі (як у діаграмі)
     @property
     def is_patient(self):
@@ -110,15 +117,138 @@ class TimeSlot(models.Model):
     end_time = models.DateTimeField()
     # 'is_available' з нашої діаграми
     is_available = models.BooleanField(default=True)
+    # Тимчасове утримання слоту, поки пацієнт підтверджує запис.
+    # Під час утримання is_available = False; після held_until слот
+    # вважається вільним (див. BookingService.release_expired_holds).
+    held_by = models.ForeignKey(
+        'Patient',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='held_slots'
+    )
+    held_until = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         # Запобігаємо створенню однакових слотів для одного лікаря
         unique_together = ('doctor', 'start_time')
         ordering = ['start_time']
+        indexes = [
+            # Вільні слоти лікаря за часом (сторінка лікаря, API)
+            models.Index(fields=['doctor', 'is_available', 'start_time'], name='timeslot_doctor_free_idx'),
+            # Найближчі вільні слоти серед усіх лікарів (лише вільні рядки)
+            models.Index(
+                fields=['start_time'],
+                condition=models.Q(is_available=True),
+                name='timeslot_free_start_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.doctor} | {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
+# --- 5.1. Шаблон тижневого розкладу (ScheduleTemplate) ---
+class ScheduleTemplate(models.Model):
+    """
+    Повторюваний тижневий розклад лікаря (напр. "Пн-Пт 09:00-13:00, по 20 хв").
+    Слоти з шаблону створюються лише на ковзне вікно вперед
+    (див. ScheduleService.materialize_templates).
+    """
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='schedule_templates'
+    )
+    weekdays = models.CharField(
+        max_length=13,
+        default='0,1,2,3,4',
+        help_text="Дні тижня через кому: 0 - понеділок ... 6 - неділя"
+    )
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    interval_min = models.PositiveSmallIntegerField(default=30)
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    # До якої дати (включно) слоти з шаблону вже створено
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+
+    @property
+    def weekday_numbers(self):
+        return {int(day) for day in self.weekdays.split(',') if day.strip()}
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        try:
+            days = self.weekday_numbers
+        except ValueError:
+            raise ValidationError({'weekdays': "Вкажіть номери днів через кому."})
+        if not days or not days <= set(range(7)):
+            raise ValidationError({'weekdays': "Дні тижня мають бути числами від 0 до 6."})
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError("Час закінчення має бути пізніше часу початку.")
+
+    # Поля, зміна яких змінює набір слотів шаблону
+    SCHEDULE_FIELDS = ('weekdays', 'start_time', 'end_time', 'interval_min', 'valid_from', 'valid_until', 'is_active')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule = instance._schedule()
+        return instance
+
+    def _schedule(self):
+        return tuple(self.__dict__.get(field) for field in self.SCHEDULE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        # Розклад змінено - вікно треба "доматеріалізувати" заново
+        # (вже створені слоти не дублюються завдяки unique_together).
+        # Збереження без змін (напр. в адмінці) materialized_until не скидає
+        self.schedule_changed = self.pk is None or getattr(self, '_loaded_schedule', None) != self._schedule()
+        if self.schedule_changed:
+            self.materialized_until = None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'materialized_until'}
+        super().save(*args, **kwargs)
+        self._loaded_schedule = self._schedule()
+
+    def __str__(self):
+        return f"{self.doctor} | {self.weekdays} {self.start_time:%H:%M}-{self.end_time:%H:%M} / {self.interval_min} хв"
+
+# --- 5.2. Індекс вільного часу (DailyAvailability) ---
+class DailyAvailability(models.Model):
+    """
+    Компактний індекс вільного часу: один бітсет на лікаря на день.
+    Біт i встановлено, якщо вільний слот починається о i * GRANULARITY_MIN
+    хвилин від півночі. Це похідні дані (див. clinic/availability.py),
+    їх можна перебудувати командою rebuild_availability.
+    """
+    GRANULARITY_MIN = 5
+    BITS_PER_DAY = 24 * 60 // GRANULARITY_MIN
+
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='daily_availability'
+    )
+    date = models.DateField()
+    bits = models.BinaryField(default=b'')
+
+    class Meta:
+        unique_together = ('doctor', 'date')
+
+    @property
+    def mask(self) -> int:
+        return int.from_bytes(bytes(self.bits), 'little')
+
+    @mask.setter
+    def mask(self, value: int):
+        self.bits = value.to_bytes(self.BITS_PER_DAY // 8, 'little')
+
+    def __str__(self):
+        return f"{self.doctor} | {self.date}: {bin(self.mask).count('1')} вільних"
+
 # --- 6. Модель Запису на прийом (Appointment) ---
 # Центральний клас, що все пов'язує
 class Appointment(models.Model):
@@ -156,6 +286,27 @@ class Appointment(models.Model):
         default=Status.PLANNED
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Копія time_slot.start_time (денормалізація): кабінети, звіти та
+    # сортування працюють з однією таблицею, без JOIN до TimeSlot.
+    # Заповнюється в save() / BookingService і оновлюється при перенесенні
+    # (зміна time_slot або часу слоту). Вручну не редагується.
+    start_time = models.DateTimeField(editable=False)
+    # Коли запис отримав свій поточний час (створення або перенесення).
+    # Диспетчер нагадувань за ним знаходить записи, що з'явились "позаду" його курсора.
+    scheduled_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Кабінети пацієнта/лікаря: записи за часом
+            models.Index(fields=['patient', 'start_time'], name='appt_patient_start_idx'),
+            models.Index(fields=['doctor', 'start_time'], name='appt_doctor_start_idx'),
+            # Звіти за статусом і датою
+            models.Index(fields=['status', 'start_time'], name='appt_status_start_idx'),
+            # Курсорна пагінація API (адмін бачить усі записи)
+            models.Index(fields=['start_time', 'id'], name='appt_start_id_idx'),
+            # Нагадування: записи, створені/перенесені після останнього запуску
+            models.Index(fields=['scheduled_at'], name='appt_scheduled_at_idx'),
+        ]
 
     # Методи з діаграми класів
     def cancel(self):
@@ -170,14 +321,153 @@ class Appointment(models.Model):
         self.save()
 
     def __str__(self):
-        return f"Запис: {self.patient} до {self.doctor} на {self.time_slot.start_time.strftime('%Y-%m-%d %H:%M')}"
+        return f"Запис: {self.patient} до {self.doctor} на {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Слот, з яким запис завантажено: якщо його змінять, start_time треба перечитати
+        instance._loaded_time_slot_id = instance.__dict__.get('time_slot_id')
+        instance._loaded_start_time = instance.__dict__.get('start_time')
+        return instance
+
+    def _time_slot_changed(self) -> bool:
+        loaded = getattr(self, '_loaded_time_slot_id', None)
+        return loaded is not None and self.__dict__.get('time_slot_id', loaded) != loaded
+
+    def save(self, *args, slot_claimed=False, **kwargs):
+        # slot_claimed=True означає, що слот вже атомарно "захоплено"
+        # умовним UPDATE у BookingService, і повторно його чіпати не потрібно.
+        if self.start_time is None or self._time_slot_changed():
+            self.start_time = self.time_slot.start_time
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'start_time'}
+        loaded_start_time = getattr(self, '_loaded_start_time', None)
+        if loaded_start_time is not None and self.start_time != loaded_start_time:
+            # Перенесення: запис отримав новий час
+            self.scheduled_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'scheduled_at'}
         # Переконуємося, що слот позначено як "зайнятий" при створенні запису
-        if self.pk is None: # Тільки при створенні нового запису
+        if self.pk is None and not slot_claimed: # Тільки при створенні нового запису
             if self.time_slot.is_available:
                 self.time_slot.is_available = False
                 self.time_slot.save()
             else:
                 raise ValueError("Цей слот вже зайнятий")
         super().save(*args, **kwargs)
+        self._loaded_time_slot_id = self.time_slot_id
+        self._loaded_start_time = self.start_time
+
+# --- 6.1. Нагадування про прийом ---
+class AppointmentReminder(models.Model):
+    """
+    Позначка "нагадування такого виду вже поставлено в чергу" для запису.
+    Унікальна пара (запис, вид) не дає надіслати те саме нагадування двічі.
+    """
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    kind = models.CharField(max_length=10)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('appointment', 'kind')
+
+    def __str__(self):
+        return f"{self.appointment_id}: {self.kind}"
+
+class ReminderCursor(models.Model):
+    """
+    "Водяні знаки" диспетчера нагадувань для одного виду нагадувань:
+    processed_until - до якого start_time записи вже оброблені;
+    scheduled_until - до якого scheduled_at враховано записи, створені
+    або перенесені на час, нижчий за processed_until.
+    Наступний запуск бере лише нові записи.
+    """
+    kind = models.CharField(max_length=10, unique=True)
+    processed_until = models.DateTimeField()
+    scheduled_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.kind}: {self.processed_until}"
+
+# --- 7. Черга вихідних листів (OutboxEmail) ---
+class OutboxEmail(models.Model):
+    """
+    Лист, що очікує відправки (патерн "Transactional Outbox").
+    Рядок пишеться в тій самій транзакції, що й запис на прийом,
+    а відправляє його окремий воркер (команда send_outbox_emails).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Очікує'
+        SENDING = 'SENDING', 'Відправляється'
+        SENT = 'SENT', 'Відправлено'
+        FAILED = 'FAILED', 'Помилка'
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipient = models.EmailField()
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Коли лист можна (повторно) взяти в роботу
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Ідентифікатор воркера, який "захопив" лист
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject} ({self.status})"
+
+# --- 8. Зведена статистика для звітів ---
+# Лічильники оновлюються інкрементно (signals.py / StatsRollup), тож
+# звіти читають O(днів) рядків замість O(записів).
+# Перебудова з сирих таблиць: python manage.py rebuild_stats
+class AppointmentDailyStats(models.Model):
+    """
+    Кількість записів лікаря за день (локальна дата start_time) у певному статусі.
+    """
+    date = models.DateField()
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    status = models.CharField(max_length=20, choices=Appointment.Status.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'doctor', 'status')
+        indexes = [
+            # DoctorLoadStrategy: лічильники лікаря за період
+            models.Index(fields=['doctor', 'status', 'date'], name='stats_doctor_status_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.doctor} | {self.status}: {self.count}"
+
+class NewPatientsDailyStats(models.Model):
+    """
+    Кількість нових пацієнтів за день (локальна дата user.date_joined).
+    """
+    date = models.DateField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.count}"
@@ -0,0 +1,143 @@
+import datetime
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Case, F, PositiveSmallIntegerField, Q, When
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+# --- Transactional Outbox для email ---
+# Запит на бронювання лише додає рядок OutboxEmail (у своїй транзакції):
+# якщо транзакцію відкотять, листа не буде, а SMTP не затримує відповідь.
+# Воркер (команда send_outbox_emails) забирає листи пачками і відправляє
+# їх через ОДНЕ SMTP-з'єднання, з повторами та експоненційною паузою.
+
+
+class EmailOutbox:
+    """
+    Фасад для постановки листів у чергу та їх відправки.
+    """
+    MAX_ATTEMPTS = 5
+    # Пауза перед повтором: BASE_DELAY * 2^(спроба - 1), але не більше MAX_DELAY
+    BASE_DELAY = datetime.timedelta(minutes=1)
+    MAX_DELAY = datetime.timedelta(hours=1)
+    # Скільки воркер "тримає" пачку; після цього її може забрати інший воркер
+    LEASE = datetime.timedelta(minutes=5)
+
+    @staticmethod
+    def enqueue(subject: str, body: str, recipients) -> list:
+        """Ставить лист у чергу (по рядку на отримувача). Порожні адреси пропускаються."""
+        return EmailOutbox.enqueue_many([(subject, body, recipients)])
+
+    @staticmethod
+    def enqueue_many(messages) -> list:
+        """Ставить у чергу пачку листів [(subject, body, recipients), ...] одним INSERT."""
+        return OutboxEmail.objects.bulk_create([
+            OutboxEmail(subject=subject[:255], body=body, recipient=recipient)
+            for subject, body, recipients in messages
+            for recipient in recipients
+            if recipient
+        ])
+
+    @staticmethod
+    def retry_delay(attempts: int) -> datetime.timedelta:
+        return min(EmailOutbox.BASE_DELAY * 2 ** (attempts - 1), EmailOutbox.MAX_DELAY)
+
+    @staticmethod
+    def _claim(batch_size: int) -> list:
+        """
+        Захоплює до batch_size листів, готових до відправки.
+        Умовний UPDATE з унікальним токеном гарантує, що два воркери
+        не відправлять той самий лист.
+        """
+        now = timezone.now()
+        # Прострочена "оренда" (воркер впав посеред пачки) - теж спроба:
+        # інакше лист, на якому воркер падає щоразу, крутився б вічно
+        expired = Q(status=OutboxEmail.Status.SENDING, next_attempt_at__lte=now)
+        OutboxEmail.objects.filter(expired, attempts__gte=EmailOutbox.MAX_ATTEMPTS - 1).update(
+            status=OutboxEmail.Status.FAILED,
+            attempts=F('attempts') + 1,
+            last_error="Воркер не завершив відправку (минула оренда).",
+            claim_token=''
+        )
+
+        due = Q(status__in=[OutboxEmail.Status.PENDING, OutboxEmail.Status.SENDING], next_attempt_at__lte=now)
+        ids = list(
+            OutboxEmail.objects.filter(due).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        OutboxEmail.objects.filter(due, id__in=ids).update(
+            attempts=Case(
+                When(expired, then=F('attempts') + 1),
+                default=F('attempts'),
+                output_field=PositiveSmallIntegerField()
+            ),
+            status=OutboxEmail.Status.SENDING,
+            claim_token=token,
+            next_attempt_at=now + EmailOutbox.LEASE
+        )
+        return list(OutboxEmail.objects.filter(claim_token=token, status=OutboxEmail.Status.SENDING))
+
+    @staticmethod
+    def drain(batch_size: int = 100) -> dict:
+        """
+        Відправляє одну пачку листів через одне SMTP-з'єднання.
+        Повертає статистику {'sent': ..., 'retry': ..., 'failed': ...}.
+        """
+        stats = {'sent': 0, 'retry': 0, 'failed': 0}
+        emails = EmailOutbox._claim(batch_size)
+        if not emails:
+            return stats
+
+        sent, failed = [], []
+        connection = get_connection()
+        try:
+            connection.open()
+            for email in emails:
+                message = EmailMessage(
+                    email.subject, email.body, settings.DEFAULT_FROM_EMAIL,
+                    [email.recipient], connection=connection
+                )
+                try:
+                    connection.send_messages([message])
+                    sent.append(email.id)
+                except Exception as e:
+                    failed.append((email, str(e)))
+        except Exception as e:
+            # З'єднання не відкрилось - уся пачка піде на повтор
+            failed = [(email, str(e)) for email in emails]
+            sent = []
+        finally:
+            connection.close()
+
+        # Результати записуються лише поки лист ще "наш": якщо оренда минула
+        # і лист забрав інший воркер, його токен уже інший
+        claimed = OutboxEmail.objects.filter(claim_token=emails[0].claim_token)
+        now = timezone.now()
+        if sent:
+            stats['sent'] = claimed.filter(id__in=sent).update(
+                status=OutboxEmail.Status.SENT, sent_at=now, claim_token=''
+            )
+
+        for email, error in failed:
+            email.attempts += 1
+            email.last_error = error
+            email.claim_token = ''
+            if email.attempts >= EmailOutbox.MAX_ATTEMPTS:
+                email.status = OutboxEmail.Status.FAILED
+                stats['failed'] += 1
+            else:
+                email.status = OutboxEmail.Status.PENDING
+                email.next_attempt_at = now + EmailOutbox.retry_delay(email.attempts)
+                stats['retry'] += 1
+        if failed:
+            claimed.bulk_update(
+                [email for email, _ in failed],
+                ['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at']
+            )
+        return stats
@@ -0,0 +1,137 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Appointment, AppointmentReminder, ReminderCursor
+from .outbox import EmailOutbox
+
+# --- Диспетчер нагадувань ("Відправка нагадувань" з діаграми) ---
+# Запускається щохвилини. Кожен вид нагадування відповідає за свою частину
+# майбутнього: від випередження коротшого виду до власного (24h - записи
+# через 2..24 години, 2h - через 0..2 години). Запис, до якого лишилось
+# менше за випередження виду вже при бронюванні, отримує лише коротше нагадування.
+# Рядок ReminderCursor виду серіалізує одночасні запуски і зберігає два
+# "водяні знаки", тож кожен запуск читає лише нові записи:
+# 1. processed_until - верхня межа start_time, до якої вікно вже пройдене:
+#    наступний запуск бере лише (processed_until, зараз + випередження].
+# 2. scheduled_until - час минулого запуску: записи, створені або перенесені
+#    після нього (scheduled_at) на час нижче processed_until, дочитуються
+#    окремим запитом по індексу scheduled_at.
+# Листи не відправляються тут, а пачкою стають у чергу (EmailOutbox) -
+# воркер send_outbox_emails відправить їх через одне SMTP-з'єднання.
+
+
+class ReminderService:
+    """
+    Фасад для постановки нагадувань у чергу.
+    """
+    # Вид нагадування -> за скільки часу до прийому його надсилати
+    WINDOWS = {
+        '24h': datetime.timedelta(hours=24),
+        '2h': datetime.timedelta(hours=2),
+    }
+    CHUNK_SIZE = 500
+    # Наскільки транзакція запису може закомітитись пізніше за свій scheduled_at
+    SCHEDULED_LAG = datetime.timedelta(minutes=5)
+
+    @staticmethod
+    def _message(appointment: Appointment):
+        subject = f"Нагадування про прийом у лікаря {appointment.doctor}"
+        body = (
+            f"Шановний(а) {appointment.patient.user.first_name},\n\n"
+            f"Нагадуємо, що ви записані на прийом до лікаря {appointment.doctor} "
+            f"на {timezone.localtime(appointment.start_time).strftime('%Y-%m-%d %H:%M')}.\n\n"
+            "Якщо ви не зможете прийти, будь ласка, скасуйте запис."
+        )
+        return subject, body
+
+    @staticmethod
+    def window(kind: str, now: datetime.datetime):
+        """Межі (нижня, верхня] start_time, за які відповідає вид kind у момент now."""
+        lead = ReminderService.WINDOWS[kind]
+        shorter = max((other for other in ReminderService.WINDOWS.values() if other < lead), default=datetime.timedelta())
+        return now + shorter, now + lead
+
+    @staticmethod
+    def dispatch(kind: str) -> int:
+        """
+        Ставить у чергу нагадування виду kind для записів, що з минулого запуску
+        потрапили в його вікно. Повертає кількість нагадувань, поставлених саме цим запуском.
+        """
+        now = timezone.now()
+        lower, upper = ReminderService.window(kind, now)
+        queued = 0
+
+        with transaction.atomic():
+            # Блокування курсора: два одночасні запуски не оброблять вікно двічі
+            cursor, _ = ReminderCursor.objects.select_for_update().get_or_create(
+                kind=kind, defaults={'processed_until': now, 'scheduled_until': now}
+            )
+            planned = Appointment.objects.filter(
+                status=Appointment.Status.PLANNED
+            ).select_related('patient__user', 'doctor__user', 'doctor__specialty').order_by()
+
+            # 1. Записи, які "в'їхали" у вікно з минулого запуску
+            entered = planned.filter(
+                start_time__gt=max(lower, cursor.processed_until),
+                start_time__lte=upper
+            )
+            # 2. Записи, створені або перенесені після минулого запуску на вже
+            # пройдений час. Запас SCHEDULED_LAG - для транзакцій, що закомітились пізніше
+            late = planned.filter(
+                scheduled_at__gt=cursor.scheduled_until - ReminderService.SCHEDULED_LAG,
+                start_time__gt=lower,
+                start_time__lte=min(cursor.processed_until, upper)
+            ).exclude(
+                reminders__kind=kind
+            )
+
+            for appointments in (entered, late):
+                chunk = []
+                for appointment in appointments.iterator(chunk_size=ReminderService.CHUNK_SIZE):
+                    chunk.append(appointment)
+                    if len(chunk) >= ReminderService.CHUNK_SIZE:
+                        queued += ReminderService._flush(kind, chunk)
+                        chunk = []
+                queued += ReminderService._flush(kind, chunk)
+
+            cursor.processed_until = max(cursor.processed_until, upper)
+            cursor.scheduled_until = now
+            cursor.save(update_fields=['processed_until', 'scheduled_until'])
+
+        return queued
+
+    @staticmethod
+    def _flush(kind: str, appointments: list) -> int:
+        """
+        Масово позначає нагадування поставленими і ставить листи в чергу -
+        лише для записів, позначку яких вставив саме цей виклик
+        (ignore_conflicts мовчки пропускає вже наявні). Вставлені позначки -
+        це позначки виду з id, більшим за найбільший id до вставки: запуски
+        одного виду серіалізовані блокуванням курсора.
+        """
+        if not appointments:
+            return 0
+        last_id = AppointmentReminder.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        AppointmentReminder.objects.bulk_create(
+            [AppointmentReminder(appointment=appointment, kind=kind) for appointment in appointments],
+            ignore_conflicts=True
+        )
+        inserted = set(AppointmentReminder.objects.filter(
+            kind=kind,
+            id__gt=last_id,
+            appointment_id__in=[appointment.id for appointment in appointments]
+        ).values_list('appointment_id', flat=True))
+
+        EmailOutbox.enqueue_many(
+            (*ReminderService._message(appointment), [appointment.patient.user.email])
+            for appointment in appointments
+            if appointment.id in inserted
+        )
+        return len(inserted)
+
+    @staticmethod
+    def dispatch_all() -> dict:
+        return {kind: ReminderService.dispatch(kind) for kind in ReminderService.WINDOWS}
@@ -0,0 +1,89 @@
+import datetime
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# --- Кеш результатів звітів ---
+# Ключ результату містить "версії" КОЖНОГО дня діапазону звіту.
+# Коли лічильники дня змінюються (StatsRollup), версію цього дня видаляємо -
+# і лише звіти, діапазон яких містить цей день, перестають знаходитися в кеші.
+#
+# Версія - випадковий токен, а не лічильник: якщо кеш сам витіснить ключ
+# версії, буде згенеровано новий токен, і старий результат не "воскресне".
+# Кеш 'default' має бути спільним для всіх воркерів (REDIS_URL у settings),
+# інакше інвалідація торкнеться лише поточного процесу.
+
+
+class ReportCache:
+    """
+    Фасад для кешування результатів ReportGenerator.
+    """
+    # Діапазони, що містять сьогодні або майбутні дні, ще "живуть" - короткий TTL.
+    # Закриті історичні діапазони змінюються рідко (напр. завершення вчорашнього
+    # прийому) і кешуються довше, але не безстроково: якщо інвалідація
+    # не дійшла (кеш не спільний для воркерів), застарілий звіт проживе не більше доби.
+    OPEN_RANGE_TTL = 300
+    CLOSED_RANGE_TTL = 60 * 60 * 24
+
+    # Області інвалідації: які лічильники читає звіт
+    APPOINTMENTS = 'appointments'
+    PATIENTS = 'patients'
+
+    _ALL_KEY = 'report-version:all'
+
+    @staticmethod
+    def _version_key(scope: str, day: datetime.date) -> str:
+        return f"report-version:{scope}:{day.isoformat()}"
+
+    @staticmethod
+    def _versions(keys: list) -> list:
+        """Читає токени версій одним запитом; відсутні створює."""
+        versions = cache.get_many(keys)
+        missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return [versions[key] for key in keys]
+
+    @staticmethod
+    def get_or_compute(name: str, scope: str, start_date: datetime.date, end_date: datetime.date,
+                       arguments: dict, compute, dependencies=()):
+        """
+        Повертає результат звіту з кешу або обчислює та зберігає його.
+        arguments - усі аргументи generate(), вони входять у ключ.
+        dependencies - додаткові версії, від яких залежить результат
+        (напр. версія довідника лікарів, якщо звіт містить їхні імена).
+        """
+        days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        keys = [ReportCache._ALL_KEY] + [ReportCache._version_key(scope, day) for day in days]
+        versions = ReportCache._versions(keys) + list(dependencies)
+
+        digest = hashlib.sha256(
+            repr((sorted(arguments.items()), versions)).encode()
+        ).hexdigest()
+        cache_key = f"report:{name}:{digest}"
+
+        result = cache.get(cache_key)
+        if result is None:
+            result = compute()
+            timeout = ReportCache.CLOSED_RANGE_TTL if end_date < timezone.localdate() else ReportCache.OPEN_RANGE_TTL
+            cache.set(cache_key, result, timeout)
+        return result
+
+    @staticmethod
+    def invalidate(scope: str, days):
+        """
+        Інвалідує звіти, діапазон яких містить будь-який з днів.
+        Виконується після коміту: інакше паралельний запит міг би закешувати
+        старі дані під новою версією, поки транзакція ще не зафіксована.
+        """
+        keys = [ReportCache._version_key(scope, day) for day in set(days)]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def invalidate_all():
+        transaction.on_commit(lambda: cache.delete(ReportCache._ALL_KEY))
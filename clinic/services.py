@@ -1,7 +1,21 @@
 from django.utils import timezone
-from .models import Appointment, TimeSlot, Doctor, Patient, User
-from django.db.models import Count
+from django.db import connections, transaction, IntegrityError
+from django.core.cache import cache
+from .models import Appointment, TimeSlot, Doctor, Patient, Specialty, User, ScheduleTemplate, AppointmentDailyStats, NewPatientsDailyStats
+from .signals import appointments_batch_created
+from .availability import AvailabilityIndex
+from .report_cache import ReportCache
+from .catalog import CatalogVersion
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek
 import datetime
+import hashlib
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 # --- 1. Патерн "Фасад" (Facade) ---
 # Ми створюємо єдиний клас, який ховає за собою всю
@@ -17,99 +31,989 @@ class BookingService:
         """Спеціальний клас винятків для помилок бронювання."""
         pass
 
+    class SlotTakenError(BookingError):
+        """Слот вже зайнято іншим пацієнтом (програна "гонка" за слот)."""
+        pass
+
+    # Скільки хвилин слот утримується за пацієнтом, поки той підтверджує запис
+    HOLD_TTL = datetime.timedelta(minutes=5)
+
+    @staticmethod
+    def claimable_filter(patient: Patient = None) -> Q:
+        """
+        Умова "слот можна забрати": він вільний, або його утримання
+        вже минуло, або його утримує саме цей пацієнт.
+        """
+        now = timezone.now()
+        condition = Q(is_available=True) | Q(held_until__lt=now)
+        if patient is not None:
+            condition |= Q(held_by=patient, held_until__gte=now)
+        return condition & Q(start_time__gte=now)
+
+    @staticmethod
+    def claim_slot(time_slot_id, patient: Patient = None) -> bool:
+        """
+        Атомарно "захоплює" слот одним умовним UPDATE.
+
+        UPDATE спрацює лише поки слот вільний і ще не минув, тому з двох
+        одночасних запитів рядок змінить тільки один. Повертає True,
+        якщо слот захопив саме цей виклик.
+        """
+        claimed = TimeSlot.objects.filter(
+            BookingService.claimable_filter(patient),
+            id=time_slot_id
+        ).update(is_available=False, held_by=None, held_until=None)
+        return claimed == 1
+
+    @staticmethod
+    def hold_slot(patient: Patient, time_slot_id) -> TimeSlot:
+        """
+        Тимчасово утримує слот за пацієнтом на HOLD_TTL.
+
+        Це один умовний UPDATE: слот стає недоступним для інших, а якщо
+        пацієнт не підтвердить запис вчасно, утримання просто "протухає".
+        Підтвердження - звичайний create_appointment цього ж пацієнта.
+        """
+        held_until = timezone.now() + BookingService.HOLD_TTL
+        with transaction.atomic():
+            held = TimeSlot.objects.filter(
+                BookingService.claimable_filter(patient),
+                id=time_slot_id
+            ).update(is_available=False, held_by=patient, held_until=held_until)
+            if held != 1:
+                BookingService._raise_claim_error([time_slot_id], patient)
+            time_slot = TimeSlot.objects.get(id=time_slot_id)
+            AvailabilityIndex.refresh_slots([time_slot])
+        return time_slot
+
+    @staticmethod
+    def release_expired_holds(batch_size: int = 1000, **filters) -> int:
+        """
+        Звільняє слоти з простроченим утриманням пачками по batch_size.
+        Кожна пачка - один UPDATE, а не збереження кожного рядка окремо.
+        Повертає кількість звільнених слотів.
+        """
+        released = 0
+        while True:
+            now = timezone.now()
+            expired = list(
+                TimeSlot.objects.filter(held_until__lt=now, **filters)
+                .only('id', 'doctor_id', 'start_time')[:batch_size]
+            )
+            if not expired:
+                return released
+            with transaction.atomic():
+                released += TimeSlot.objects.filter(
+                    id__in=[slot.id for slot in expired], held_until__lt=now
+                ).update(is_available=True, held_by=None, held_until=None)
+                AvailabilityIndex.refresh_slots(expired)
+
+    @staticmethod
+    def _raise_claim_error(time_slot_ids, patient: Patient = None):
+        """
+        Визначає, чому слоти не вдалося захопити, і піднімає відповідну помилку.
+        Цей запит виконується лише на "невдалому" шляху.
+        """
+        now = timezone.now()
+        time_slots = {
+            str(slot['id']): slot
+            for slot in TimeSlot.objects.filter(id__in=time_slot_ids).values(
+                'id', 'is_available', 'start_time', 'held_by', 'held_until'
+            )
+        }
+        for time_slot_id in time_slot_ids:
+            time_slot = time_slots.get(str(time_slot_id))
+            if time_slot is None:
+                raise BookingService.BookingError("Обраний час недоступний.")
+            held_until = time_slot['held_until']
+            is_free = (
+                time_slot['is_available']
+                or (held_until is not None and held_until < now)
+                or (patient is not None and time_slot['held_by'] == patient.pk)
+            )
+            if not is_free:
+                raise BookingService.SlotTakenError("Цей слот вже зайнято.")
+            if time_slot['start_time'] < now:
+                raise BookingService.BookingError("Неможливо забронювати час у минулому.")
+        # Слот звільнився між UPDATE та перевіркою - для клієнта це все одно "зайнято"
+        raise BookingService.SlotTakenError("Цей слот вже зайнято.")
+
     @staticmethod
     def create_appointment(patient: Patient, time_slot_id: int) -> Appointment:
         """
         Головний метод для створення запису на прийом.
         
-        Викликає помилку BookingError, якщо бронювання неможливе.
+        Викликає помилку BookingError, якщо бронювання неможливе,
+        або SlotTakenError, якщо слот щойно зайняв хтось інший.
         """
-        
         try:
-            # 1. Знайти слот
-            time_slot = TimeSlot.objects.select_related('doctor').get(id=time_slot_id)
-        except TimeSlot.DoesNotExist:
-            raise BookingService.BookingError("Обраний час недоступний.")
-
-        # 2. Перевірити доступність слоту
-        if not time_slot.is_available:
-            raise BookingService.BookingError("Цей слот вже зайнято.")
-
-        # 3. Перевірити, чи не минув час
-        if time_slot.start_time < timezone.now():
-            raise BookingService.BookingError("Неможливо забронювати час у минулому.")
-            
-        # 4. (Додаткова логіка) Перевірити, чи пацієнт не має іншого запису в цей час
-        # ... (можна додати) ...
-
-        # 5. Створення запису
-        # Ми не змінюємо time_slot.is_available = False тут.
-        # Це автоматично зробить метод .save() моделі Appointment,
-        # який ми написали раніше!
-        
-        appointment = Appointment.objects.create(
-            patient=patient,
-            doctor=time_slot.doctor,
-            time_slot=time_slot
-        )
-        
-        # 6. Відправка email
+            with transaction.atomic():
+                # 1. Захопити слот (перевірка доступності + зміна стану
+                # відбуваються в одному SQL-запиті, без "вікна" для гонки)
+                if not BookingService.claim_slot(time_slot_id, patient):
+                    BookingService._raise_claim_error([time_slot_id], patient)
+
+                # 2. Створення запису
+                # Слот вже позначено зайнятим, тому кажемо моделі
+                # не перевіряти й не зберігати його вдруге.
+                time_slot = TimeSlot.objects.get(id=time_slot_id)
+                appointment = Appointment(
+                    patient=patient,
+                    doctor_id=time_slot.doctor_id,
+                    time_slot=time_slot
+                )
+                appointment.save(slot_claimed=True)
+                AvailabilityIndex.refresh_slots([time_slot])
+        except IntegrityError:
+            # На слоті вже є (скасований) запис - OneToOne не дозволить другий.
+            # Транзакцію відкочено, тож слот повернувся у попередній стан.
+            raise BookingService.SlotTakenError("Цей слот вже зайнято.")
+
+        # 3. Відправка email
         # Ми НЕ робимо цього тут. Патерн "Спостерігач" (signals.py)
         # автоматично "почує", що цей запис створено, і відправить email.
         # Це зберігає наш сервіс чистим (Single Responsibility).
         
         return appointment
+
+    @staticmethod
+    def reschedule_appointment(appointment: Appointment, time_slot_id: int) -> Appointment:
+        """
+        Переносить запланований запис на інший слот.
+
+        Новий слот захоплюється тим самим умовним UPDATE, що й при
+        бронюванні, старий звільняється, а денормалізований start_time
+        оновлюється в тій самій транзакції.
+        """
+        if appointment.status != Appointment.Status.PLANNED:
+            raise BookingService.BookingError("Перенести можна лише запланований запис.")
+
+        old_slot = appointment.time_slot
+        try:
+            with transaction.atomic():
+                if not BookingService.claim_slot(time_slot_id, appointment.patient):
+                    BookingService._raise_claim_error([time_slot_id], appointment.patient)
+
+                new_slot = TimeSlot.objects.get(id=time_slot_id)
+                appointment.time_slot = new_slot
+                appointment.doctor_id = new_slot.doctor_id
+                appointment.start_time = new_slot.start_time
+                appointment.save(update_fields=['time_slot', 'doctor', 'start_time'])
+
+                TimeSlot.objects.filter(pk=old_slot.pk).update(is_available=True)
+                AvailabilityIndex.refresh_slots([old_slot, new_slot])
+        except IntegrityError:
+            raise BookingService.SlotTakenError("Цей слот вже зайнято.")
+
+        return appointment
+
+    @staticmethod
+    def create_appointments(patient: Patient, time_slot_ids: list) -> list:
+        """
+        Пакетне бронювання кількох слотів (сімейні та повторні записи).
+
+        Всі слоти захоплюються одним умовним UPDATE в одній транзакції:
+        або бронюються всі, або жоден. Записи вставляються одним bulk_create,
+        а пацієнт отримує один спільний лист замість листа на кожен слот.
+        """
+        time_slot_ids = list(dict.fromkeys(time_slot_ids)) # Прибираємо дублікати
+        claimed_all = False
+
+        try:
+            with transaction.atomic():
+                claimed = TimeSlot.objects.filter(
+                    BookingService.claimable_filter(patient),
+                    id__in=time_slot_ids
+                ).update(is_available=False, held_by=None, held_until=None)
+
+                if claimed != len(time_slot_ids):
+                    # Частину слотів захопити не вдалося - відкочуємо всю пачку
+                    transaction.set_rollback(True)
+                else:
+                    claimed_all = True
+                    time_slots = TimeSlot.objects.select_related(
+                        'doctor__user', 'doctor__specialty'
+                    ).filter(id__in=time_slot_ids)
+                    # bulk_create не викликає Appointment.save() і post_save,
+                    # тому слоти не перевіряються вдруге і не летить лист на кожен запис.
+                    appointments = Appointment.objects.bulk_create([
+                        Appointment(patient=patient, doctor=slot.doctor, time_slot=slot, start_time=slot.start_time)
+                        for slot in time_slots
+                    ])
+                    AvailabilityIndex.refresh_slots(time_slots)
+
+                    # Патерн "Спостерігач": один сигнал на всю пачку (див. signals.py).
+                    # Надсилається в транзакції, щоб лист потрапив у чергу разом із записами.
+                    appointments_batch_created.send(
+                        sender=Appointment, patient=patient, appointments=appointments
+                    )
+        except IntegrityError:
+            raise BookingService.SlotTakenError("Цей слот вже зайнято.")
+
+        if not claimed_all:
+            BookingService._raise_claim_error(time_slot_ids, patient)
+
+        return appointments
     
+class ScheduleService:
+    """
+    Фасад для керування розкладом лікаря (генерація слотів).
+    """
+
+    class ScheduleError(Exception):
+        """Помилка у параметрах розкладу."""
+        pass
+
+    # Максимальна довжина діапазону, який можна відкрити за один раз
+    MAX_RANGE_DAYS = 92
+
+    # На скільки днів вперед шаблони розкладу перетворюються на слоти
+    MATERIALIZE_WINDOW_DAYS = 28
+
+    @staticmethod
+    def build_intervals(start_date: datetime.date, end_date: datetime.date,
+                        start_time: datetime.time, end_time: datetime.time,
+                        interval: datetime.timedelta, weekdays: set = None) -> list:
+        """
+        Обчислює в пам'яті всі пари (start, end) для кожного дня діапазону
+        (або лише для днів тижня з weekdays). "Обрізаний" останній слот дня
+        не створюється.
+        """
+        intervals = []
+        day = start_date
+        while day <= end_date:
+            if weekdays is not None and day.weekday() not in weekdays:
+                day += datetime.timedelta(days=1)
+                continue
+            current_dt = timezone.make_aware(datetime.datetime.combine(day, start_time))
+            day_end = timezone.make_aware(datetime.datetime.combine(day, end_time))
+            while current_dt + interval <= day_end:
+                intervals.append((current_dt, current_dt + interval))
+                current_dt += interval
+            day += datetime.timedelta(days=1)
+        return intervals
+
+    @staticmethod
+    def generate_slots(doctor: Doctor, start_date: datetime.date, end_date: datetime.date,
+                       start_time: datetime.time, end_time: datetime.time,
+                       interval_min: int) -> int:
+        """
+        Створює слоти для діапазону днів кількома запитами замість
+        exists() + create() на кожен інтервал:
+        1. всі інтервали обчислюються в пам'яті;
+        2. наявні start_time лікаря в діапазоні читаються ОДНИМ запитом;
+        3. решта вставляється ОДНИМ bulk_create.
+
+        Повертає кількість нових слотів.
+        """
+        if interval_min <= 0:
+            raise ScheduleService.ScheduleError("Інтервал має бути додатнім.")
+        if end_date < start_date:
+            raise ScheduleService.ScheduleError("Дата закінчення має бути не раніше дати початку.")
+        if (end_date - start_date).days >= ScheduleService.MAX_RANGE_DAYS:
+            raise ScheduleService.ScheduleError(
+                f"Діапазон не може перевищувати {ScheduleService.MAX_RANGE_DAYS} днів."
+            )
+        if end_time <= start_time:
+            raise ScheduleService.ScheduleError("Час закінчення має бути пізніше часу початку.")
+
+        intervals = ScheduleService.build_intervals(
+            start_date, end_date, start_time, end_time,
+            datetime.timedelta(minutes=interval_min)
+        )
+        if not intervals:
+            return 0
+        if intervals[0][0] < timezone.now():
+            raise ScheduleService.ScheduleError("Неможливо створити слоти у минулому.")
+
+        existing = set(
+            TimeSlot.objects.filter(
+                doctor=doctor,
+                start_time__gte=intervals[0][0],
+                start_time__lte=intervals[-1][0]
+            ).values_list('start_time', flat=True)
+        )
+        new_slots = [
+            TimeSlot(doctor=doctor, start_time=start, end_time=end, is_available=True)
+            for start, end in intervals
+            if start not in existing
+        ]
+        # ignore_conflicts + unique_together (doctor, start_time) захищають
+        # від слотів, які паралельно встиг створити інший запит
+        with transaction.atomic():
+            TimeSlot.objects.bulk_create(new_slots, ignore_conflicts=True)
+            AvailabilityIndex.refresh_slots(new_slots)
+        return len(new_slots)
+
+    # --- Масові зміни слотів (API /slots/bulk-*/) ---
+    # Змінюються лише незаброньовані майбутні слоти: без запису на прийом
+    # (навіть скасованого) і без активного утримання.
+
+    @staticmethod
+    def unbooked_filter() -> Q:
+        now = timezone.now()
+        return (
+            Q(appointment__isnull=True)
+            & (Q(held_until__isnull=True) | Q(held_until__lt=now))
+            & Q(start_time__gte=now)
+        )
+
+    @staticmethod
+    def _unbooked_in_range(doctor: Doctor, start: datetime.datetime, end: datetime.datetime):
+        if end <= start:
+            raise ScheduleService.ScheduleError("Кінець діапазону має бути пізніше за початок.")
+        if end - start > datetime.timedelta(days=ScheduleService.MAX_RANGE_DAYS):
+            raise ScheduleService.ScheduleError(
+                f"Діапазон не може перевищувати {ScheduleService.MAX_RANGE_DAYS} днів."
+            )
+        return TimeSlot.objects.filter(
+            ScheduleService.unbooked_filter(),
+            doctor=doctor,
+            start_time__gte=start,
+            start_time__lt=end
+        )
+
+    @staticmethod
+    def delete_slots(doctor: Doctor, start: datetime.datetime, end: datetime.datetime) -> int:
+        """
+        Видаляє незаброньовані слоти лікаря з діапазону [start, end) одним
+        відфільтрованим DELETE. Повертає кількість видалених слотів.
+        """
+        with transaction.atomic():
+            slots = ScheduleService._unbooked_in_range(doctor, start, end)
+            keys = {
+                AvailabilityIndex.key_for(doctor.pk, start_time)
+                for start_time in slots.select_for_update(of=('self',)).values_list('start_time', flat=True)
+            }
+            deleted = slots.delete()[1].get(TimeSlot._meta.label, 0)
+            AvailabilityIndex.refresh(keys)
+        return deleted
+
+    # Зсув масово: слоти спершу "паркуються" на стільки назад, де слотів не буває
+    SHIFT_PARKING = datetime.timedelta(days=365 * 1000)
+
+    @staticmethod
+    def _occupied_targets(doctor: Doctor, moving: list, delta: datetime.timedelta) -> set:
+        """Час початку слотів, що лишаються на місці, у цільовому діапазоні зсуву - одним запитом."""
+        moving_ids = {slot.id for slot in moving}
+        return {
+            start_time
+            for slot_id, start_time in TimeSlot.objects.filter(
+                doctor=doctor,
+                start_time__gte=moving[0].start_time + delta,
+                start_time__lte=moving[-1].start_time + delta
+            ).values_list('id', 'start_time')
+            if slot_id not in moving_ids
+        }
+
+    @staticmethod
+    def shift_slots(doctor: Doctor, start: datetime.datetime, end: datetime.datetime,
+                    delta: datetime.timedelta) -> list:
+        """
+        Зсуває незаброньовані слоти лікаря з діапазону [start, end) на delta.
+
+        Зсув - це два UPDATE в одній транзакції, ID слотів зберігаються.
+        UPDATE перевіряє унікальність (doctor, start_time) по рядку, тож
+        зсув "щільного" ряду упирався б у ще не зсунутого сусіда: спершу
+        слоти паркуються на SHIFT_PARKING назад, потім ставляться на новий час.
+        Піднімає ScheduleError, якщо новий час зайнятий іншим слотом або вже минув.
+        Повертає зсунуті слоти.
+        """
+        if not delta:
+            raise ScheduleService.ScheduleError("Зсув має бути ненульовим.")
+        if abs(delta) > datetime.timedelta(days=ScheduleService.MAX_RANGE_DAYS):
+            raise ScheduleService.ScheduleError(
+                f"Зсув не може перевищувати {ScheduleService.MAX_RANGE_DAYS} днів."
+            )
+
+        with transaction.atomic():
+            slots = ScheduleService._unbooked_in_range(doctor, start, end)
+            moving = list(
+                slots.select_for_update(of=('self',)).only('id', 'doctor_id', 'start_time').order_by('start_time')
+            )
+            if not moving:
+                return []
+            if moving[0].start_time + delta < timezone.now():
+                raise ScheduleService.ScheduleError("Неможливо перенести слоти у минуле.")
+            if ScheduleService._occupied_targets(doctor, moving, delta) & {slot.start_time + delta for slot in moving}:
+                raise ScheduleService.ScheduleError("Новий час перетинається з іншими слотами лікаря.")
+
+            ids = [slot.id for slot in moving]
+            try:
+                # Savepoint: після помилки UPDATE транзакцію ще можна коректно відкотити
+                with transaction.atomic():
+                    # Той самий фільтр, що й у SELECT: якщо між ними слот встигли
+                    # забронювати, кількість не збіжеться - відкочуємо все.
+                    # Заблокований вручну слот (is_available=False без утримання)
+                    # лишається заблокованим; прострочене утримання знімається
+                    parked = slots.filter(id__in=ids).update(
+                        start_time=F('start_time') - ScheduleService.SHIFT_PARKING,
+                        is_available=Case(
+                            When(held_until__isnull=False, then=Value(True)),
+                            default=F('is_available')
+                        ),
+                        held_until=None,
+                        held_by=None
+                    )
+                    if parked != len(moving):
+                        raise ScheduleService.ScheduleError("Слоти змінилися під час перенесення, спробуйте ще раз.")
+                    TimeSlot.objects.filter(id__in=ids).update(
+                        start_time=F('start_time') + ScheduleService.SHIFT_PARKING + delta,
+                        end_time=F('end_time') + delta
+                    )
+            except IntegrityError:
+                # Паралельний запит встиг створити слот на новий час після перевірки вище
+                raise ScheduleService.ScheduleError("Новий час перетинається з іншими слотами лікаря.")
+            shifted = list(TimeSlot.objects.filter(id__in=ids).order_by('start_time'))
+            AvailabilityIndex.refresh_slots(moving + shifted)
+        return shifted
+
+    @staticmethod
+    def materialize_templates(until: datetime.date = None, doctor: Doctor = None, doctor_ids=None) -> int:
+        """
+        Перетворює шаблони розкладу (ScheduleTemplate) на слоти до дати until
+        (усіх лікарів, лікаря doctor або лікарів з doctor_ids).
+
+        Обробляються лише шаблони, які ще не "доматеріалізовані" до until,
+        тож повторний виклик з тим самим вікном - це один легкий SELECT.
+        Усі нові слоти вставляються одним bulk_create.
+        Повертає кількість слотів, які спробували створити.
+        """
+        today = timezone.localdate()
+        if until is None:
+            until = today + datetime.timedelta(days=ScheduleService.MATERIALIZE_WINDOW_DAYS)
+
+        templates = ScheduleTemplate.objects.filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=until),
+            is_active=True,
+            valid_from__lte=until
+        )
+        if doctor is not None:
+            templates = templates.filter(doctor=doctor)
+        if doctor_ids is not None:
+            templates = templates.filter(doctor_id__in=doctor_ids)
+        templates = list(templates)
+        if not templates:
+            return 0
+
+        now = timezone.now()
+        new_slots = []
+        for template in templates:
+            first_day = max(today, template.valid_from)
+            if template.materialized_until is not None:
+                first_day = max(first_day, template.materialized_until + datetime.timedelta(days=1))
+            last_day = min(until, template.valid_until) if template.valid_until else until
+
+            intervals = ScheduleService.build_intervals(
+                first_day, last_day, template.start_time, template.end_time,
+                datetime.timedelta(minutes=template.interval_min),
+                weekdays=template.weekday_numbers
+            )
+            new_slots.extend(
+                TimeSlot(doctor_id=template.doctor_id, start_time=start, end_time=end)
+                for start, end in intervals
+                if start >= now
+            )
+
+        with transaction.atomic():
+            TimeSlot.objects.bulk_create(new_slots, ignore_conflicts=True, batch_size=1000)
+            AvailabilityIndex.refresh_slots(new_slots)
+            ScheduleTemplate.objects.filter(
+                id__in=[template.id for template in templates]
+            ).update(materialized_until=until)
+        return len(new_slots)
+
+
+class SlotSearchService:
+    """
+    Пошук найближчих вільних слотів серед усіх лікарів
+    (або лікарів однієї спеціалізації) одним запитом.
+    """
+    # Результат короткий час кешується: найпопулярніший запит
+    # ("найближчий кардіолог") не б'є в БД на кожне оновлення сторінки
+    CACHE_TTL = 30
+    MAX_LIMIT = 50
+
+    # Кешуються пласкі рядки, а не моделі: pickle моделей ламається при зміні
+    # схеми під час деплою і займає більше. Об'єкти збираються при читанні
+    ROW_FIELDS = (
+        'id', 'start_time', 'end_time', 'doctor_id', 'doctor__user__first_name',
+        'doctor__user__last_name', 'doctor__specialty_id', 'doctor__specialty__name',
+    )
+
+    @staticmethod
+    def _slot_from_row(row) -> TimeSlot:
+        """TimeSlot з лікарем, користувачем та спеціалізацією з рядка ROW_FIELDS (без запитів до БД)."""
+        slot_id, start_time, end_time, doctor_id, first_name, last_name, specialty_id, specialty_name = row
+        doctor = Doctor(
+            user=User(pk=doctor_id, first_name=first_name, last_name=last_name),
+            specialty=Specialty(pk=specialty_id, name=specialty_name) if specialty_id is not None else None
+        )
+        return TimeSlot(id=slot_id, doctor=doctor, start_time=start_time, end_time=end_time, is_available=True)
+
+    @staticmethod
+    def next_available(specialty_id: int = None, limit: int = 10) -> list:
+        """
+        Повертає до limit найближчих вільних слотів, впорядкованих за часом.
+        Лікар і спеціалізація підтягуються тим самим запитом (JOIN).
+        """
+        limit = max(1, min(int(limit), SlotSearchService.MAX_LIMIT))
+        cache_key = f"next_available:{specialty_id or 'all'}:{limit}"
+
+        rows = cache.get(cache_key)
+        if rows is None:
+            # "Вільний" - як на сторінці лікаря (claimable_filter): разом з
+            # простроченими утриманнями. Замість OR - два індексовані запити
+            # (OR не може використати частковий індекс вільних слотів),
+            # злиті за часом. Слоти з шаблонів створює команда
+            # materialize_schedules (cron), а не кожен промах кешу пошуку.
+            now = timezone.now()
+            query = TimeSlot.objects.filter(
+                start_time__gte=now
+            ).order_by('start_time', 'id').values_list(*SlotSearchService.ROW_FIELDS)
+            if specialty_id:
+                query = query.filter(doctor__specialty_id=specialty_id)
+            candidates = {
+                row[0]: row
+                for part in (query.filter(is_available=True), query.filter(held_until__lt=now))
+                for row in part[:limit]
+            }
+            rows = sorted(candidates.values(), key=lambda row: (row[1], row[0]))[:limit]
+            cache.set(cache_key, rows, SlotSearchService.CACHE_TTL)
+
+        # За час життя кешу частина слотів могла вже початися
+        now = timezone.now()
+        return [SlotSearchService._slot_from_row(row) for row in rows if row[1] >= now]
+
+    # --- Вільні слоти конкретних лікарів (API /doctors/{id}/slots/) ---
+    MAX_DOCTORS = 50
+    DEFAULT_WINDOW_DAYS = 7
+    MAX_WINDOW_DAYS = 31
+
+    class SearchError(Exception):
+        """Некоректні параметри пошуку слотів."""
+        pass
+
+    @staticmethod
+    def parse_doctor_ids(raw: str) -> list:
+        """'1,2,3' -> [1, 2, 3] (без повторів, відсортовано)."""
+        try:
+            doctor_ids = sorted({int(doctor_id) for doctor_id in raw.split(',')})
+        except ValueError:
+            raise SlotSearchService.SearchError("ID лікарів мають бути числами через кому.")
+        if len(doctor_ids) > SlotSearchService.MAX_DOCTORS:
+            raise SlotSearchService.SearchError(
+                f"За один запит можна отримати слоти не більше ніж {SlotSearchService.MAX_DOCTORS} лікарів."
+            )
+        return doctor_ids
+
+    @staticmethod
+    def _parse_moment(value: str, name: str) -> datetime.datetime:
+        """YYYY-MM-DD (початок дня) або ISO datetime; наївний час - у часовому поясі клініки."""
+        try:
+            if len(value) == 10:
+                moment = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time.min)
+            else:
+                moment = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise SlotSearchService.SearchError(
+                f"Параметр '{name}' має бути датою (YYYY-MM-DD) або датою з часом (ISO 8601)."
+            )
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+    @staticmethod
+    def parse_window(raw_from: str = None, raw_to: str = None):
+        """
+        Перетворює ?from=&to= на напіввідкрите вікно [start, end).
+        Дата в 'to' включає весь цей день. Без 'from' - від поточного моменту,
+        без 'to' - DEFAULT_WINDOW_DAYS днів від початку.
+        """
+        start = SlotSearchService._parse_moment(raw_from, 'from') if raw_from else timezone.now()
+        if raw_to:
+            end = SlotSearchService._parse_moment(raw_to, 'to')
+            if len(raw_to) == 10:
+                end += datetime.timedelta(days=1)
+        else:
+            end = start + datetime.timedelta(days=SlotSearchService.DEFAULT_WINDOW_DAYS)
+
+        if end <= start:
+            raise SlotSearchService.SearchError("Кінець вікна має бути пізніше за початок.")
+        if end - start > datetime.timedelta(days=SlotSearchService.MAX_WINDOW_DAYS):
+            raise SlotSearchService.SearchError(f"Вікно не може перевищувати {SlotSearchService.MAX_WINDOW_DAYS} днів.")
+        return start, end
+
+    @staticmethod
+    def doctor_slots(doctor_ids, start: datetime.datetime, end: datetime.datetime):
+        """
+        QuerySet вільних слотів лікарів у вікні [start, end), за (start_time, id).
+        "Вільні" - так само, як на сторінці лікаря (claimable_filter): разом
+        зі слотами, утримання яких уже минуло. Читаються лише колонки для API.
+        """
+        # Слоти з шаблонів тут не створюються: публічний GET нічого не пише
+        # (див. materialize_changed_template у signals.py та materialize_schedules)
+        return TimeSlot.objects.filter(
+            BookingService.claimable_filter(),
+            doctor_id__in=doctor_ids,
+            start_time__gte=start,
+            start_time__lt=end
+        ).only('id', 'doctor_id', 'start_time', 'end_time').order_by('start_time', 'id')
+
+    @staticmethod
+    def doctor_slots_cache_key(doctor_ids, url: str) -> str:
+        """
+        Ключ кешу сторінки слотів: URL запиту + версії вільного часу
+        кожного лікаря (AvailabilityIndex). Будь-яка зміна слотів лікаря
+        змінює версію, тож закешовані сторінки з ним більше не знаходяться.
+        """
+        versions = AvailabilityIndex.versions(doctor_ids)
+        digest = hashlib.sha256(repr((url, versions)).encode()).hexdigest()
+        return f"doctor_slots:{digest}"
+
+
 class ReportStrategy:
     """Абстрактний базовий клас для всіх стратегій звітів."""
+
+    class ReportError(Exception):
+        """Невідомий звіт або некоректні параметри."""
+        pass
+
+    # Ім'я у реєстрі звітів (ReportGenerator.STRATEGIES) та назви параметрів generate()
+    name = None
+    params = ('start_date', 'end_date')
+    # Необов'язкові параметри-перемикачі: ім'я -> допустимі значення (перше - за замовчуванням)
+    choices = {}
+    # Які лічильники читає звіт (для інвалідації кешу); None - не кешувати
+    cache_scope = None
+    # Довідники (CatalogVersion), дані яких потрапляють у результат (імена лікарів тощо)
+    catalogs = ()
+
+    # Звіти читають зведені таблиці (O(днів)), тож рік - безпечний максимум
+    MAX_RANGE_DAYS = 366
     
     def generate(self, *args, **kwargs):
         """Метод, який запускає генерацію звіту."""
         raise NotImplementedError("Subclasses must implement this method.")
 
+    def parse_params(self, raw) -> dict:
+        """
+        Перетворює параметри запиту (рядки YYYY-MM-DD та перемикачі choices)
+        на аргументи generate().
+        Піднімає ReportError, якщо параметр відсутній, некоректний
+        або діапазон задовгий.
+        """
+        kwargs = {}
+        for param in self.params:
+            value = raw.get(param)
+            if not value:
+                raise self.ReportError(f"Параметр '{param}' є обов'язковим.")
+            try:
+                kwargs[param] = datetime.date.fromisoformat(value)
+            except ValueError:
+                raise self.ReportError(f"Параметр '{param}' має бути датою у форматі YYYY-MM-DD.")
+
+        for param, allowed in self.choices.items():
+            value = raw.get(param) or allowed[0]
+            if value not in allowed:
+                raise self.ReportError(f"Параметр '{param}' має бути одним з: {', '.join(allowed)}.")
+            kwargs[param] = value
+
+        if 'start_date' in kwargs and 'end_date' in kwargs:
+            days = (kwargs['end_date'] - kwargs['start_date']).days
+            if days < 0:
+                raise self.ReportError("Дата кінця має бути не раніше дати початку.")
+            if days >= self.MAX_RANGE_DAYS:
+                raise self.ReportError(f"Діапазон не може перевищувати {self.MAX_RANGE_DAYS} днів.")
+        return kwargs
+
+    def date_range(self, arguments: dict):
+        """Діапазон днів (включно), від якого залежить результат - для кешу."""
+        if 'date' in arguments:
+            return arguments['date'], arguments['date']
+        return arguments['start_date'], arguments['end_date']
+
+    @staticmethod
+    def day_bounds(start_date: datetime.date, end_date: datetime.date):
+        """
+        Перетворює діапазон днів (включно) на напіввідкритий інтервал
+        [start, end) з timezone-aware datetime. Порівняння колонки з
+        такими межами може використати індекс, на відміну від __date.
+        """
+        start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+        return start, end
+
+
+class ReportGenerator:
+    """
+    Клас "Контекст", який використовує обрану стратегію.
+    """
+    # Реєстр звітів: ім'я -> клас стратегії (заповнює декоратор register)
+    STRATEGIES = {}
+
+    def __init__(self, strategy: ReportStrategy):
+        self._strategy = strategy
+
+    @classmethod
+    def register(cls, strategy_class):
+        """Декоратор: додає стратегію до реєстру під її ім'ям (strategy_class.name)."""
+        cls.STRATEGIES[strategy_class.name] = strategy_class
+        return strategy_class
+
+    @classmethod
+    def for_report(cls, name: str) -> 'ReportGenerator':
+        """Створює генератор для звіту з реєстру за ім'ям."""
+        try:
+            return cls(cls.STRATEGIES[name]())
+        except KeyError:
+            raise ReportStrategy.ReportError(f"Невідомий звіт '{name}'.")
+
+    @property
+    def strategy(self) -> ReportStrategy:
+        """Поточна стратегія генератора."""
+        return self._strategy
+
+    def set_strategy(self, strategy: ReportStrategy):
+        self._strategy = strategy
+
+    def run(self, *args, **kwargs):
+        """
+        Запускає генерацію звіту за допомогою обраної стратегії.
+        Результати зареєстрованих звітів беруться з кешу (ReportCache),
+        якщо дані за їхній діапазон днів не змінювалися.
+        """
+        strategy = self._strategy
+        if strategy.name is None or strategy.cache_scope is None:
+            return strategy.generate(*args, **kwargs)
+
+        bound = inspect.signature(strategy.generate).bind(*args, **kwargs)
+        bound.apply_defaults()
+        start_date, end_date = strategy.date_range(bound.arguments)
+        return ReportCache.get_or_compute(
+            strategy.name, strategy.cache_scope, start_date, end_date, dict(bound.arguments),
+            lambda: strategy.generate(*args, **kwargs),
+            dependencies=[CatalogVersion.get(catalog)['etag'] for catalog in strategy.catalogs]
+        )
+
+    def run_with_params(self, raw) -> dict:
+        """Запускає звіт з "сирими" параметрами запиту (напр. request.query_params)."""
+        return self.run(**self.strategy.parse_params(raw))
+
+    # Скільки звітів панелі рахуються одночасно (кожен - окреме з'єднання з БД)
+    MAX_WORKERS = 4
+
+    @classmethod
+    def run_many(cls, names, raw) -> dict:
+        """
+        Запускає кілька звітів паралельно в обмеженому пулі потоків.
+        Параметри всіх звітів перевіряються ДО запуску (ReportError).
+
+        Повертає {'elapsed_ms': ..., 'reports': {ім'я: {'elapsed_ms', 'result'|'error'}}}:
+        загальний час - це час найповільнішого звіту, а не сума.
+        'error' містить текст лише для ReportError; інші винятки логуються.
+        """
+        names = list(dict.fromkeys(names))
+        jobs = {}
+        for name in names:
+            generator = cls.for_report(name)
+            jobs[name] = (generator, generator.strategy.parse_params(raw))
+
+        def run_job(name):
+            generator, kwargs = jobs[name]
+            started = time.perf_counter()
+            try:
+                entry = {'result': generator.run(**kwargs)}
+            except ReportStrategy.ReportError as e:
+                entry = {'error': str(e)}
+            except Exception:
+                # Текст довільних винятків (напр. помилок БД) клієнту не віддаємо
+                logger.exception("Звіт '%s' панелі завершився з помилкою", name)
+                entry = {'error': "Не вдалося сформувати звіт."}
+            finally:
+                # Django відкриває окреме з'єднання на кожен потік - закриваємо своє
+                connections.close_all()
+            entry['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return name, entry
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(cls.MAX_WORKERS, len(names) or 1)) as pool:
+            reports = dict(pool.map(run_job, names))
+        return {'elapsed_ms': round((time.perf_counter() - started) * 1000, 1), 'reports': reports}
+
+# --- Стратегії звітів ---
+# Усі стратегії читають зведені таблиці (AppointmentDailyStats,
+# NewPatientsDailyStats), ключовані локальною датою: діапазон днів -
+# це просте порівняння індексованої колонки date, без функцій над колонкою.
+
+@ReportGenerator.register
 class DailyAppointmentsStrategy(ReportStrategy):
     """Стратегія 1: Кількість прийомів за день."""
+    name = 'daily-appointments'
+    params = ('date',)
+    cache_scope = ReportCache.APPOINTMENTS
+
+    def queryset(self, date: datetime.date):
+        # Зведена таблиця: по рядку на лікаря, а не на кожен запис
+        return AppointmentDailyStats.objects.filter(
+            date=date,
+            status=Appointment.Status.COMPLETED
+        )
     
     def generate(self, date: datetime.date):
-        count = Appointment.objects.filter(
-            time_slot__start_time__date=date,
-            status=Appointment.Status.COMPLETED
-        ).count()
+        count = self.queryset(date).aggregate(total=Coalesce(Sum('count'), 0))['total']
         return {"report_type": "Daily Appointments", "date": date, "count": count}
 
+@ReportGenerator.register
 class DoctorLoadStrategy(ReportStrategy):
     """Стратегія 2: Статистика завантаженості лікарів."""
+    name = 'doctor-load'
+    cache_scope = ReportCache.APPOINTMENTS
+    catalogs = (CatalogVersion.DOCTORS,) # Список та імена лікарів
+
+    def queryset(self, start_date: datetime.date, end_date: datetime.date):
+        # Корельований підзапит читає лічильники лікаря по індексу
+        # (doctor, status, date) - лише дні з діапазону, а не всю історію
+        completed = AppointmentDailyStats.objects.filter(
+            doctor=OuterRef('pk'),
+            status=Appointment.Status.COMPLETED,
+            date__gte=start_date,
+            date__lte=end_date
+        ).values('doctor').annotate(total=Sum('count')).values('total')
+
+        return Doctor.objects.annotate(
+            completed_appointments=Coalesce(Subquery(completed), 0)
+        ).order_by('pk').values('user__first_name', 'user__last_name', 'completed_appointments')
     
     def generate(self, start_date: datetime.date, end_date: datetime.date):
-        load = Doctor.objects.annotate(
-            completed_appointments=Count('appointments', filter=models.Q(
-                appointments__time_slot__start_time__date__range=(start_date, end_date),
-                appointments__status=Appointment.Status.COMPLETED
-            ))
-        ).values('user__first_name', 'user__last_name', 'completed_appointments')
-        
+        load = self.queryset(start_date, end_date)
         return {"report_type": "Doctor Load", "period": (start_date, end_date), "load": list(load)}
 
+@ReportGenerator.register
 class NewPatientsStrategy(ReportStrategy):
     """Стратегія 3: Динаміка нових пацієнтів."""
+    name = 'new-patients'
+    cache_scope = ReportCache.PATIENTS
     
+    def queryset(self, start_date: datetime.date, end_date: datetime.date):
+        return NewPatientsDailyStats.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        )
+
     def generate(self, start_date: datetime.date, end_date: datetime.date):
-        count = Patient.objects.filter(
-            user__date_joined__date__range=(start_date, end_date)
-        ).count()
+        count = self.queryset(start_date, end_date).aggregate(total=Coalesce(Sum('count'), 0))['total']
         return {"report_type": "New Patients", "period": (start_date, end_date), "new_patients_count": count}
 
+# --- Часові ряди для графіків ---
+# Увесь діапазон - ОДИН GROUP BY запит по зведеній таблиці (TruncDay/TruncWeek),
+# а не окремий запит на кожен день. Порожні інтервали додаються в Python.
 
-class ReportGenerator:
+class SeriesStrategy(ReportStrategy):
+    """Базовий клас для звітів-рядів з розбивкою на дні або тижні."""
+    choices = {'bucket': ('day', 'week')}
+
+    TRUNC = {'day': TruncDay, 'week': TruncWeek}
+
+    @staticmethod
+    def buckets(start_date: datetime.date, end_date: datetime.date, bucket: str) -> list:
+        """Усі інтервали діапазону (тижні починаються з понеділка, як у TruncWeek)."""
+        if bucket == 'week':
+            start_date -= datetime.timedelta(days=start_date.weekday())
+        step = datetime.timedelta(days=7 if bucket == 'week' else 1)
+        result = []
+        while start_date <= end_date:
+            result.append(start_date)
+            start_date += step
+        return result
+
+    @staticmethod
+    def as_date(value):
+        # Trunc над DateField повертає date, але деякі бекенди - datetime
+        return value.date() if isinstance(value, datetime.datetime) else value
+
+@ReportGenerator.register
+class AppointmentSeriesStrategy(SeriesStrategy):
     """
-    Клас "Контекст", який використовує обрану стратегію.
+    Стратегія 4: Ряд прийомів за датою прийому (не за датою бронювання).
+    scheduled_visits - усі записи на прийоми в інтервалі, в будь-якому
+    статусі (заплановані, завершені та скасовані); completions і
+    cancellations - їх частини зі статусом COMPLETED / CANCELLED.
     """
-    def __init__(self, strategy: ReportStrategy):
-        self._strategy = strategy
-        
-    def set_strategy(self, strategy: ReportStrategy):
-        self._strategy = strategy
-        
-    def run(self, *args, **kwargs):
-        """Запускає генерацію звіту за допомогою обраної стратегії."""
-        return self._strategy.generate(*args, **kwargs)
+    name = 'appointment-series'
+    choices = {**SeriesStrategy.choices, 'group_by': ('none', 'doctor', 'specialty')}
+    cache_scope = ReportCache.APPOINTMENTS
+    catalogs = (CatalogVersion.DOCTORS,) # Підписи груп: прізвища лікарів, назви спеціалізацій
+
+    # Розбивка -> (поле групи, поле підпису групи)
+    GROUPS = {
+        'doctor': ('doctor_id', 'doctor__user__last_name'),
+        'specialty': ('doctor__specialty_id', 'doctor__specialty__name'),
+    }
+    METRICS = ('scheduled_visits', 'completions', 'cancellations')
+
+    def queryset(self, start_date: datetime.date, end_date: datetime.date,
+                 bucket: str = 'day', group_by: str = 'none'):
+        group_fields = self.GROUPS.get(group_by, ())
+        return AppointmentDailyStats.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        ).annotate(
+            bucket=self.TRUNC[bucket]('date')
+        ).values('bucket', *group_fields).annotate(
+            scheduled_visits=Sum('count'),
+            completions=Sum('count', filter=Q(status=Appointment.Status.COMPLETED)),
+            cancellations=Sum('count', filter=Q(status=Appointment.Status.CANCELLED))
+        ).order_by('bucket')
+
+    def generate(self, start_date: datetime.date, end_date: datetime.date,
+                 bucket: str = 'day', group_by: str = 'none'):
+        empty = dict.fromkeys(self.METRICS, 0)
+        group_field, label_field = self.GROUPS.get(group_by, (None, None))
+
+        # (група, інтервал) -> лічильники; група None - без розбивки
+        rows, labels = {}, {}
+        for row in self.queryset(start_date, end_date, bucket, group_by):
+            group = row[group_field] if group_field else None
+            labels[group] = row[label_field] if label_field else None
+            rows[group, self.as_date(row['bucket'])] = {metric: row[metric] or 0 for metric in self.METRICS}
+
+        groups = sorted(labels, key=lambda group: (group is None, group)) if group_field else [None]
+        series = [
+            {
+                'group': group,
+                'label': labels.get(group),
+                'points': [
+                    {'bucket': day, **rows.get((group, day), empty)}
+                    for day in self.buckets(start_date, end_date, bucket)
+                ]
+            }
+            for group in groups
+        ]
+        return {
+            "report_type": "Appointment Series", "period": (start_date, end_date),
+            "bucket": bucket, "group_by": group_by, "series": series
+        }
+
+@ReportGenerator.register
+class NewPatientsSeriesStrategy(SeriesStrategy):
+    """Стратегія 5: Ряд нових пацієнтів по днях або тижнях."""
+    name = 'new-patients-series'
+    cache_scope = ReportCache.PATIENTS
+
+    def queryset(self, start_date: datetime.date, end_date: datetime.date, bucket: str = 'day'):
+        return NewPatientsDailyStats.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        ).annotate(
+            bucket=self.TRUNC[bucket]('date')
+        ).values('bucket').annotate(new_patients=Sum('count')).order_by('bucket')
+
+    def generate(self, start_date: datetime.date, end_date: datetime.date, bucket: str = 'day'):
+        counts = {
+            self.as_date(row['bucket']): row['new_patients']
+            for row in self.queryset(start_date, end_date, bucket)
+        }
+        points = [
+            {'bucket': day, 'new_patients': counts.get(day, 0)}
+            for day in self.buckets(start_date, end_date, bucket)
+        ]
+        return {"report_type": "New Patients Series", "period": (start_date, end_date), "bucket": bucket, "points": points}
@@ -1,8 +1,14 @@
-from django.core.mail import send_mail
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.conf import settings
-from .models import Appointment
+from collections import Counter
+
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+from .models import Appointment, AppointmentReminder, TimeSlot, Patient, Doctor, Specialty, User, ScheduleTemplate
+from .availability import AvailabilityIndex
+from .outbox import EmailOutbox
+from .stats import StatsRollup
+from .catalog import CatalogVersion
 
 # --- Патерн "Спостерігач" (Observer) ---
 # Ми використовуємо вбудовані "Сигнали" Django.
@@ -18,7 +24,7 @@ def send_appointment_confirmation(sender, instance: Appointment, created: bool,
     
     # Ми реагуємо ТІЛЬКИ на перше створення запису
     if created:
-        print(f"SIGNAL: Створено новий запис {instance.id}, відправка email...")
+        print(f"SIGNAL: Створено новий запис {instance.id}, підготовка email...")
         
         patient = instance.patient
         doctor = instance.doctor
@@ -28,29 +34,175 @@ def send_appointment_confirmation(sender, instance: Appointment, created: bool,
         message = (
             f"Шановний(а) {patient.user.first_name},\n\n"
             f"Ви успішно записані на прийом до лікаря {doctor} "
-            f"на {instance.time_slot.start_time.strftime('%Y-%m-%d %H:%M')}.\n\n"
+            f"на {instance.start_time.strftime('%Y-%m-%d %H:%M')}.\n\n"
             "Дякуємо, що обрали нашу клініку!"
         )
         
-        # Щоб це спрацювало, вам потрібно налаштувати email-бекэнд 
-        # у вашому settings.py (наприклад, Gmail або SendGrid).
-        # Для тестування можна використовувати ConsoleEmailBackend.
-        
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL, # Ваш email (з settings.py)
-                [patient.user.email],       # Email пацієнта
-                fail_silently=False,
-            )
-            print(f"SIGNAL: Email успішно відправлено на {patient.user.email}")
-        except Exception as e:
-            # У реальному проекті тут має бути логування помилок
-            print(f"SIGNAL ERROR: Не вдалося відправити email. Помилка: {e}")
+        # Лист НЕ відправляється тут: він лише стає в чергу (OutboxEmail)
+        # у тій самій транзакції, що й запис. Відкат транзакції - немає листа.
+        # Відправляє воркер: python manage.py send_outbox_emails
+        EmailOutbox.enqueue(subject, message, [patient.user.email])
+        print(f"SIGNAL: Email для {patient.user.email} додано до черги")
+
+# --- Пакетне бронювання ---
+# bulk_create не викликає post_save, тому BookingService.create_appointments
+# надсилає цей сигнал сам - один раз на всю пачку записів.
+appointments_batch_created = Signal()
+
+@receiver(appointments_batch_created)
+def send_batch_appointment_confirmation(sender, patient, appointments, **kwargs):
+    """
+    Ставить у чергу ОДИН спільний лист-підтвердження на всі записи пачки.
+    """
+    print(f"SIGNAL: Створено {len(appointments)} записів одним пакетом, підготовка email...")
+
+    lines = "\n".join(
+        f"- {appointment.doctor} на {appointment.start_time.strftime('%Y-%m-%d %H:%M')}"
+        for appointment in appointments
+    )
+    subject = f"Підтвердження записів до лікарів ({len(appointments)})"
+    message = (
+        f"Шановний(а) {patient.user.first_name},\n\n"
+        f"Ви успішно записані на такі прийоми:\n{lines}\n\n"
+        "Дякуємо, що обрали нашу клініку!"
+    )
+
+    EmailOutbox.enqueue(subject, message, [patient.user.email])
+    print(f"SIGNAL: Email для {patient.user.email} додано до черги")
+
+# --- Індекс вільного часу ---
+# Поодинокі збереження та видалення слоту (адмінка, Appointment.cancel() тощо)
+# оновлюють бітсет його дня. Масові операції в сервісах викликають
+# AvailabilityIndex.refresh() самі.
+
+@receiver(post_save, sender=TimeSlot)
+def refresh_slot_availability(sender, instance: TimeSlot, **kwargs):
+    AvailabilityIndex.refresh_slots([instance])
+
+@receiver(post_delete, sender=TimeSlot)
+def refresh_deleted_slot_availability(sender, instance: TimeSlot, **kwargs):
+    # Видалення часто масове (адмінка, каскад лікаря) - один refresh після коміту
+    AvailabilityIndex.refresh_on_commit([AvailabilityIndex.key_for(instance.doctor_id, instance.start_time)])
+
+# --- Шаблони розкладу ---
+# Слоти зміненого шаблону створюються після коміту (поза транзакцією запиту),
+# решту вікна щоночі доматеріалізовує команда materialize_schedules.
+# Сторінки та API, що читають слоти, їх не створюють.
+
+@receiver(post_save, sender=ScheduleTemplate)
+def materialize_changed_template(sender, instance: ScheduleTemplate, **kwargs):
+    if getattr(instance, 'schedule_changed', False):
+        from .services import ScheduleService # services імпортує цей модуль
+        doctor_id = instance.doctor_id
+        transaction.on_commit(lambda: ScheduleService.materialize_templates(doctor_ids=[doctor_id]))
+
+# --- Денормалізований Appointment.start_time ---
+# Якщо час слоту змінили (напр. в адмінці), запис на ньому має "переїхати" теж.
+
+@receiver(post_save, sender=TimeSlot)
+def sync_appointment_start_time(sender, instance: TimeSlot, created: bool, **kwargs):
+    if not created:
+        # save(), а не update(): запис може переїхати на інший день,
+        # і зведена статистика має це "побачити" (див. нижче)
+        appointment = Appointment.objects.filter(time_slot=instance).exclude(
+            start_time=instance.start_time
+        ).first()
+        if appointment is not None:
+            appointment.start_time = instance.start_time
+            appointment.save(update_fields=['start_time'])
+
+# --- Зведена статистика для звітів ---
+# Запам'ятовуємо стан запису при завантаженні, щоб при збереженні
+# перенести +1/-1 зі старого лічильника (дата, лікар, статус) у новий.
+
+_STATS_FIELDS = ('start_time', 'doctor_id', 'status')
+
+def _stats_state(appointment: Appointment):
+    return tuple(getattr(appointment, field) for field in _STATS_FIELDS)
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_stats_state(sender, instance: Appointment, **kwargs):
+    # Читаємо __dict__ напряму: звернення до відкладеного (only/defer)
+    # поля тут означало б окремий запит на кожен завантажений запис
+    if instance.pk and all(field in instance.__dict__ for field in _STATS_FIELDS):
+        instance._stats_state = _stats_state(instance)
+    else:
+        instance._stats_state = None
+
+@receiver(pre_save, sender=Appointment)
+def load_appointment_stats_state(sender, instance: Appointment, **kwargs):
+    # Запис завантажено з відкладеними полями - дочитуємо старий стан з БД
+    if instance._stats_state is None and instance.pk:
+        instance._stats_state = Appointment.objects.filter(pk=instance.pk).values_list(*_STATS_FIELDS).first()
+
+@receiver(post_save, sender=Appointment)
+def update_appointment_stats(sender, instance: Appointment, created: bool, **kwargs):
+    old_state, new_state = instance._stats_state, _stats_state(instance)
+    if old_state == new_state and not created:
+        return
+    deltas = Counter({StatsRollup.appointment_key(*new_state): 1})
+    if old_state is not None and not created:
+        deltas[StatsRollup.appointment_key(*old_state)] -= 1
+    StatsRollup.apply_appointments(deltas)
+    instance._stats_state = new_state
+
+@receiver(post_delete, sender=Appointment)
+def remove_appointment_stats(sender, instance: Appointment, **kwargs):
+    StatsRollup.apply_appointments(Counter({StatsRollup.appointment_key(*_stats_state(instance)): -1}))
+
+@receiver(appointments_batch_created)
+def update_batch_appointment_stats(sender, appointments, **kwargs):
+    StatsRollup.appointments_created(appointments)
+    for appointment in appointments:
+        appointment._stats_state = _stats_state(appointment)
+
+# --- Нагадування після перенесення ---
+# Нагадування, поставлені на старий час, вже не актуальні: позначки видаляються,
+# і диспетчер (reminders.py) поставить нові для нового часу.
+
+@receiver(pre_save, sender=Appointment)
+def detect_appointment_reschedule(sender, instance: Appointment, **kwargs):
+    # _stats_state вже дочитано вище (load_appointment_stats_state)
+    old_state = instance._stats_state
+    instance._rescheduled = old_state is not None and old_state[0] != instance.start_time
+
+@receiver(post_save, sender=Appointment)
+def reset_rescheduled_reminders(sender, instance: Appointment, created: bool, **kwargs):
+    if not created and instance._rescheduled:
+        AppointmentReminder.objects.filter(appointment=instance).delete()
+
+@receiver(post_save, sender=Patient)
+def count_new_patient(sender, instance: Patient, created: bool, **kwargs):
+    if created:
+        StatsRollup.apply_new_patients(Counter({timezone.localtime(instance.user.date_joined).date(): 1}))
+
+@receiver(post_delete, sender=Patient)
+def uncount_deleted_patient(sender, instance: Patient, **kwargs):
+    StatsRollup.apply_new_patients(Counter({timezone.localtime(instance.user.date_joined).date(): -1}))
+
+# --- Версії довідників для умовних GET (ETag / Last-Modified) ---
+# Список лікарів містить ім'я користувача та назву спеціалізації,
+# тому його версія змінюється і при збереженні User лікаря, і Specialty.
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def bump_doctor_catalog(sender, **kwargs):
+    CatalogVersion.bump(CatalogVersion.DOCTORS)
+
+@receiver(post_save, sender=Specialty)
+@receiver(post_delete, sender=Specialty)
+def bump_specialty_catalog(sender, **kwargs):
+    CatalogVersion.bump(CatalogVersion.SPECIALTIES, CatalogVersion.DOCTORS)
+
+@receiver(post_save, sender=User)
+def bump_doctor_catalog_on_profile_save(sender, instance: User, update_fields=None, **kwargs):
+    # Вхід у систему оновлює лише last_login - довідник від цього не змінюється
+    if instance.is_doctor and set(update_fields or ()) != {'last_login'}:
+        CatalogVersion.bump(CatalogVersion.DOCTORS)
 
 # --- Налаштування email для тестування ---
 # Щоб бачити email у вашій консолі (терміналі) без реальної відправки,
 # додайте цей рядок у ваш medical_system/settings.py:
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-# DEFAULT_FROM_EMAIL = 'admin@myclinic.com'
\ No newline at end of file
+# DEFAULT_FROM_EMAIL = 'admin@myclinic.com'
+# і запустіть воркер: python manage.py send_outbox_emails --loop
@@ -0,0 +1,104 @@
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, Patient, AppointmentDailyStats, NewPatientsDailyStats
+from .report_cache import ReportCache
+
+# --- Зведена статистика (rollup) ---
+# Лічильники в AppointmentDailyStats / NewPatientsDailyStats змінюються
+# на +1/-1 при створенні, зміні статусу/часу та видаленні записів і пацієнтів:
+# - поодинокі save()/delete() - сигналами (signals.py);
+# - bulk_create у сервісах - явним викликом (через сигнал пакетного бронювання).
+# Якщо лічильники розійшлися з даними (ручні UPDATE у БД), їх
+# перебудовує команда rebuild_stats.
+# Кожна зміна лічильників інвалідує кеш звітів для змінених днів (ReportCache).
+
+
+class StatsRollup:
+    """
+    Фасад для оновлення та перебудови зведеної статистики.
+    """
+
+    @staticmethod
+    def appointment_key(start_time: datetime.datetime, doctor_id, status: str):
+        """Ключ лічильника (локальна дата, лікар, статус)."""
+        return timezone.localtime(start_time).date(), doctor_id, status
+
+    @staticmethod
+    def apply_appointments(deltas: Counter):
+        """
+        Додає до лічильників записів зміни {(date, doctor_id, status): delta}.
+        Інкремент виконується в БД (F-вираз), тож конкурентні оновлення не губляться.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            # Спершу гарантуємо, що рядки для приростів існують, потім атомарно
+            # змінюємо лічильники. Для зменшень рядок вже є (або видаляється
+            # разом з лікарем каскадом - тоді й оновлювати нічого).
+            AppointmentDailyStats.objects.bulk_create([
+                AppointmentDailyStats(date=date, doctor_id=doctor_id, status=status)
+                for (date, doctor_id, status), delta in deltas.items()
+                if delta > 0
+            ], ignore_conflicts=True)
+            for (date, doctor_id, status), delta in deltas.items():
+                AppointmentDailyStats.objects.filter(
+                    date=date, doctor_id=doctor_id, status=status
+                ).update(count=F('count') + delta)
+            ReportCache.invalidate(ReportCache.APPOINTMENTS, [date for date, _, _ in deltas])
+
+    @staticmethod
+    def appointments_created(appointments):
+        StatsRollup.apply_appointments(Counter(
+            StatsRollup.appointment_key(appointment.start_time, appointment.doctor_id, appointment.status)
+            for appointment in appointments
+        ))
+
+    @staticmethod
+    def apply_new_patients(deltas: Counter):
+        """Додає до лічильників нових пацієнтів зміни {date: delta}."""
+        deltas = {date: delta for date, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            NewPatientsDailyStats.objects.bulk_create([
+                NewPatientsDailyStats(date=date) for date, delta in deltas.items() if delta > 0
+            ], ignore_conflicts=True)
+            for date, delta in deltas.items():
+                NewPatientsDailyStats.objects.filter(date=date).update(count=F('count') + delta)
+            ReportCache.invalidate(ReportCache.PATIENTS, deltas)
+
+    @staticmethod
+    def rebuild() -> dict:
+        """
+        Повністю перераховує обидві таблиці з Appointment та Patient
+        (групування на боці БД). Повертає кількість створених рядків.
+        """
+        tz = timezone.get_current_timezone()
+        with transaction.atomic():
+            AppointmentDailyStats.objects.all().delete()
+            appointment_rows = AppointmentDailyStats.objects.bulk_create([
+                AppointmentDailyStats(
+                    date=row['date'], doctor_id=row['doctor_id'], status=row['status'], count=row['count']
+                )
+                for row in Appointment.objects.annotate(
+                    date=TruncDate('start_time', tzinfo=tz)
+                ).values('date', 'doctor_id', 'status').annotate(count=Count('pk')).order_by()
+            ], batch_size=1000)
+
+            NewPatientsDailyStats.objects.all().delete()
+            patient_rows = NewPatientsDailyStats.objects.bulk_create([
+                NewPatientsDailyStats(date=row['date'], count=row['count'])
+                for row in Patient.objects.annotate(
+                    date=TruncDate('user__date_joined', tzinfo=tz)
+                ).values('date').annotate(count=Count('pk')).order_by()
+            ], batch_size=1000)
+            ReportCache.invalidate_all()
+
+        return {'appointments': len(appointment_rows), 'new_patients': len(patient_rows)}
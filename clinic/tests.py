@@ -1,3 +1,1531 @@
-from django.test import TestCase
+import datetime
+import json
+import re
+import subprocess
+import sys
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import CommandError, call_command
+from django.db import connection, models, transaction, IntegrityError
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from .models import User, Doctor, Patient, Specialty, TimeSlot, Appointment, ScheduleTemplate, DailyAvailability, OutboxEmail, \
+    ReminderCursor, AppointmentReminder, AppointmentDailyStats, NewPatientsDailyStats
+from .services import BookingService, ScheduleService, DailyAppointmentsStrategy, DoctorLoadStrategy, \
+    NewPatientsStrategy, ReportGenerator, ReportStrategy, AppointmentSeriesStrategy, NewPatientsSeriesStrategy, \
+    SlotSearchService
+from .availability import AvailabilityIndex
+from .outbox import EmailOutbox
+from .reminders import ReminderService
+from .exports import ExportService
+from .report_cache import ReportCache
+
+
+def make_doctor(username='doctor'):
+    user = User.objects.create(username=username, role=User.Role.DOCTOR)
+    return Doctor.objects.create(user=user)
+
+
+def make_patient(username='patient'):
+    user = User.objects.create(
+        username=username, email=f'{username}@example.com', role=User.Role.PATIENT
+    )
+    return Patient.objects.create(user=user)
+
+
+def make_slot(doctor, days=1, minutes=0, is_available=True):
+    start = timezone.now() + datetime.timedelta(days=days, minutes=minutes)
+    return TimeSlot.objects.create(
+        doctor=doctor,
+        start_time=start,
+        end_time=start + datetime.timedelta(minutes=30),
+        is_available=is_available
+    )
+
+
+class BookingServiceTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def test_create_appointment_claims_slot(self):
+        slot = make_slot(self.doctor)
+        appointment = BookingService.create_appointment(self.patient, slot.id)
+
+        slot.refresh_from_db()
+        self.assertFalse(slot.is_available)
+        self.assertEqual(appointment.doctor, self.doctor)
+
+    def test_second_booking_gets_slot_taken(self):
+        slot = make_slot(self.doctor)
+        BookingService.create_appointment(self.patient, slot.id)
+
+        with self.assertRaises(BookingService.SlotTakenError):
+            BookingService.create_appointment(make_patient('other'), slot.id)
+        self.assertEqual(Appointment.objects.filter(time_slot=slot).count(), 1)
+
+    def test_past_slot_is_rejected(self):
+        slot = make_slot(self.doctor, days=-1)
+        with self.assertRaises(BookingService.BookingError) as ctx:
+            BookingService.create_appointment(self.patient, slot.id)
+        self.assertNotIsInstance(ctx.exception, BookingService.SlotTakenError)
+
+    def test_cancelled_slot_cannot_be_rebooked_and_stays_free(self):
+        slot = make_slot(self.doctor)
+        BookingService.create_appointment(self.patient, slot.id).cancel()
+
+        with self.assertRaises(BookingService.SlotTakenError):
+            BookingService.create_appointment(make_patient('other'), slot.id)
+        slot.refresh_from_db()
+        self.assertTrue(slot.is_available)
+
+
+class AppointmentStartTimeTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def test_start_time_copied_on_create(self):
+        slot = make_slot(self.doctor)
+        appointment = BookingService.create_appointment(self.patient, slot.id)
+
+        self.assertEqual(appointment.start_time, slot.start_time)
+
+    def test_reschedule_moves_start_time_and_frees_old_slot(self):
+        old_slot, new_slot = make_slot(self.doctor), make_slot(self.doctor, days=2)
+        appointment = BookingService.create_appointment(self.patient, old_slot.id)
+
+        BookingService.reschedule_appointment(appointment, new_slot.id)
+
+        appointment.refresh_from_db()
+        old_slot.refresh_from_db()
+        self.assertEqual(appointment.time_slot, new_slot)
+        self.assertEqual(appointment.start_time, new_slot.start_time)
+        self.assertTrue(old_slot.is_available)
+
+    def test_changing_time_slot_directly_rederives_start_time(self):
+        old_slot, new_slot = make_slot(self.doctor), make_slot(self.doctor, days=2)
+        BookingService.create_appointment(self.patient, old_slot.id)
+
+        appointment = Appointment.objects.get(time_slot=old_slot)
+        appointment.time_slot = new_slot
+        appointment.save(update_fields=['time_slot'])
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.start_time, new_slot.start_time)
+
+    def test_start_time_is_not_editable_in_forms(self):
+        from django.forms import modelform_factory
+
+        self.assertNotIn('start_time', modelform_factory(Appointment, fields='__all__')().fields)
+
+
+class SlotHoldTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.other = make_patient('other')
+
+    def test_hold_blocks_others_until_holder_confirms(self):
+        slot = make_slot(self.doctor)
+        BookingService.hold_slot(self.patient, slot.id)
+
+        with self.assertRaises(BookingService.SlotTakenError):
+            BookingService.create_appointment(self.other, slot.id)
+
+        appointment = BookingService.create_appointment(self.patient, slot.id)
+        slot.refresh_from_db()
+        self.assertEqual(appointment.time_slot, slot)
+        self.assertIsNone(slot.held_until)
+
+    def test_expired_hold_can_be_booked_by_others(self):
+        slot = make_slot(self.doctor)
+        BookingService.hold_slot(self.patient, slot.id)
+        TimeSlot.objects.filter(id=slot.id).update(held_until=timezone.now() - datetime.timedelta(seconds=1))
+
+        BookingService.create_appointment(self.other, slot.id)
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        slots = [make_slot(self.doctor, minutes=30 * i) for i in range(5)]
+        for slot in slots:
+            BookingService.hold_slot(self.patient, slot.id)
+        TimeSlot.objects.filter(id__in=[slot.id for slot in slots[:3]]).update(
+            held_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        out = StringIO()
+        call_command('release_expired_holds', batch_size=2, stdout=out)
+
+        self.assertIn("Звільнено слотів: 3", out.getvalue())
+        self.assertEqual(TimeSlot.objects.filter(is_available=True).count(), 3)
+        self.assertEqual(TimeSlot.objects.filter(held_by=self.patient).count(), 2)
+
+
+class ScheduleServiceTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+
+    def generate(self, end_date):
+        return ScheduleService.generate_slots(
+            doctor=self.doctor,
+            start_date=self.tomorrow,
+            end_date=end_date,
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0),
+            interval_min=20
+        )
+
+    def test_generates_multi_day_range_in_constant_queries(self):
+        # Слоти + індекс вільного часу, незалежно від кількості днів
+        with self.assertNumQueries(9):
+            created = self.generate(self.tomorrow + datetime.timedelta(days=29))
+
+        self.assertEqual(created, 90)
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 90)
+
+    def test_skips_existing_slots(self):
+        self.generate(self.tomorrow)
+        created = self.generate(self.tomorrow + datetime.timedelta(days=1))
+
+        self.assertEqual(created, 3)
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 6)
+
+
+class ScheduleTemplateTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.today = timezone.localdate()
+        ScheduleTemplate.objects.create(
+            doctor=self.doctor,
+            weekdays='0,1,2,3,4',
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0),
+            interval_min=30,
+            valid_from=self.today + datetime.timedelta(days=1)
+        )
+
+    def test_materializes_only_window_weekdays(self):
+        until = self.today + datetime.timedelta(days=14)
+        ScheduleService.materialize_templates(until=until)
+
+        slots = TimeSlot.objects.filter(doctor=self.doctor)
+        self.assertEqual(slots.count(), 10 * 2)
+        self.assertTrue(all(slot.start_time.weekday() < 5 for slot in slots))
+        self.assertLessEqual(max(slot.start_time.date() for slot in slots), until)
+
+    def test_repeated_call_is_a_single_query(self):
+        until = self.today + datetime.timedelta(days=7)
+        ScheduleService.materialize_templates(until=until)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(ScheduleService.materialize_templates(until=until), 0)
+
+    def test_window_extends_incrementally(self):
+        ScheduleService.materialize_templates(until=self.today + datetime.timedelta(days=7))
+        ScheduleService.materialize_templates(until=self.today + datetime.timedelta(days=14))
+
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 10 * 2)
+
+    def test_saving_template_materializes_after_commit(self):
+        template = ScheduleTemplate.objects.get(doctor=self.doctor)
+        with self.captureOnCommitCallbacks(execute=True):
+            template.end_time = datetime.time(11, 0)
+            template.save()
+
+        template.refresh_from_db()
+        horizon = self.today + datetime.timedelta(days=ScheduleService.MATERIALIZE_WINDOW_DAYS)
+        self.assertEqual(template.materialized_until, horizon)
+        self.assertTrue(TimeSlot.objects.filter(doctor=self.doctor).exists())
+
+    def test_unchanged_save_keeps_materialized_window(self):
+        ScheduleService.materialize_templates()
+        template = ScheduleTemplate.objects.get(doctor=self.doctor)
+        until = template.materialized_until
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            template.save()
+
+        template.refresh_from_db()
+        self.assertEqual(template.materialized_until, until)
+        self.assertEqual(callbacks, [])
+
+    def test_read_paths_do_not_create_slots(self):
+        self.client.get(f'/doctor/{self.doctor.pk}/')
+        self.client.get(f'/api/v1/doctors/{self.doctor.pk}/slots/')
+
+        self.assertFalse(TimeSlot.objects.filter(doctor=self.doctor).exists())
+
+
+class AvailabilityIndexTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.slot = make_slot(self.doctor, days=2)
+        self.day = timezone.localtime(self.slot.start_time).date()
+
+    def test_index_follows_booking_and_cancel(self):
+        self.assertTrue(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+        appointment = BookingService.create_appointment(self.patient, self.slot.id)
+        self.assertFalse(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+        appointment.cancel()
+        self.assertTrue(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+    def test_first_free_slot_skips_booked(self):
+        later = make_slot(self.doctor, days=3)
+        BookingService.create_appointment(self.patient, self.slot.id)
+
+        self.assertEqual(AvailabilityIndex.first_free_slot(self.doctor.pk), later)
+        self.assertIsNone(AvailabilityIndex.first_free_slot(
+            self.doctor.pk, after=later.start_time + datetime.timedelta(minutes=1)
+        ))
+
+    def test_rebuild_command_restores_index(self):
+        DailyAvailability.objects.all().delete()
+
+        call_command('rebuild_availability', stdout=StringIO())
+
+        self.assertTrue(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+    def test_deleted_slot_clears_its_bit_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeSlot.objects.filter(pk=self.slot.pk).delete()
+
+        self.assertFalse(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+    def test_active_hold_keeps_bit_but_is_not_free(self):
+        # Біт лишається (утримання минає без UPDATE), але відповідь - як у claimable_filter
+        BookingService.hold_slot(self.patient, self.slot.id)
+        self.assertTrue(DailyAvailability.objects.get(doctor=self.doctor, date=self.day).mask)
+        self.assertFalse(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+        self.assertEqual(AvailabilityIndex.first_free_slots([self.doctor.pk]), {})
+
+        TimeSlot.objects.filter(pk=self.slot.pk).update(held_until=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertTrue(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+
+    def test_doctor_list_shows_next_free_slot_from_index(self):
+        busy = make_doctor('busy')
+        later = make_slot(self.doctor, days=3)
+        BookingService.create_appointment(self.patient, self.slot.id)
+
+        with self.assertNumQueries(4): # Спеціалізації, лікарі, бітсети, слоти
+            response = self.client.get('/doctors/')
+
+        next_free = {doctor.pk: doctor.next_free_slot for doctor in response.context['doctors']}
+        self.assertEqual(next_free, {self.doctor.pk: later, busy.pk: None})
+
+    def test_refresh_reads_only_requested_days(self):
+        far = self.day + datetime.timedelta(days=60)
+        self.assertEqual(
+            AvailabilityIndex._day_ranges({(1, self.day), (1, self.day + datetime.timedelta(days=1)), (1, far), (2, self.day)}),
+            [[1, self.day, self.day + datetime.timedelta(days=1)], [1, far, far], [2, self.day, self.day]]
+        )
+        middle = make_slot(self.doctor, days=30)
+        DailyAvailability.objects.filter(doctor=self.doctor).delete()
+
+        AvailabilityIndex.refresh({(self.doctor.pk, self.day), (self.doctor.pk, far)})
+
+        self.assertTrue(AvailabilityIndex.has_free_slot(self.doctor.pk, self.day))
+        self.assertFalse(DailyAvailability.objects.filter(date=timezone.localtime(middle.start_time).date()).exists())
+
+
+class NextAvailableTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        cardio = Specialty.objects.create(name='Кардіолог')
+        self.cardio_a, self.cardio_b = make_doctor('cardio_a'), make_doctor('cardio_b')
+        self.dentist = make_doctor('dentist')
+        Doctor.objects.filter(pk__in=[self.cardio_a.pk, self.cardio_b.pk]).update(specialty=cardio)
+        self.specialty = cardio
+
+    def test_returns_earliest_slots_of_specialty(self):
+        make_slot(self.dentist, days=1)
+        later = make_slot(self.cardio_a, days=3)
+        earliest = make_slot(self.cardio_b, days=2)
+        make_slot(self.cardio_b, days=4, is_available=False)
+
+        response = self.client.get('/api/v1/slots/next/', {'specialty': self.specialty.id, 'limit': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['id'] for slot in response.data], [earliest.id, later.id])
+        self.assertEqual(response.data[0]['specialty'], 'Кардіолог')
+
+    def test_result_is_cached(self):
+        make_slot(self.cardio_a)
+        first = self.client.get('/api/v1/slots/next/')
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/slots/next/')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.data[0]['specialty'], 'Кардіолог')
+
+    def test_cache_stores_plain_values(self):
+        make_slot(self.cardio_a)
+        SlotSearchService.next_available()
+
+        cached = cache.get('next_available:all:10')
+        self.assertTrue(all(isinstance(row, tuple) for row in cached))
+        self.assertFalse(any(isinstance(value, models.Model) for row in cached for value in row))
+
+    def test_expired_hold_is_listed_like_on_doctor_page(self):
+        held = make_slot(self.cardio_a, days=1)
+        BookingService.hold_slot(make_patient(), held.id)
+        TimeSlot.objects.filter(pk=held.pk).update(held_until=timezone.now() - datetime.timedelta(minutes=1))
+        later = make_slot(self.cardio_b, days=2)
+
+        response = self.client.get('/api/v1/slots/next/', {'specialty': self.specialty.id})
+
+        self.assertEqual([slot['id'] for slot in response.data], [held.id, later.id])
+        self.assertEqual(AvailabilityIndex.first_free_slot(self.cardio_a.pk), TimeSlot.objects.get(pk=held.pk))
+
+    def test_page_lists_slots(self):
+        make_slot(self.cardio_a)
+        response = self.client.get('/next-available/', {'specialty': self.specialty.id})
+
+        self.assertEqual(len(response.context['time_slots']), 1)
+
+
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        call_command('explain_hot_queries', stdout=StringIO())
+
+    def test_full_scan_is_detected(self):
+        from .management.commands.explain_hot_queries import full_scans
+
+        self.assertTrue(full_scans("2 0 0 SCAN clinic_timeslot", 'clinic_timeslot'))
+        self.assertTrue(full_scans("Seq Scan on clinic_timeslot  (cost=0.00..1.01)", 'clinic_timeslot'))
+        self.assertFalse(full_scans("SCAN clinic_timeslot USING INDEX timeslot_free_start_idx", 'clinic_timeslot'))
+        self.assertFalse(full_scans("SEARCH clinic_timeslot USING INTEGER PRIMARY KEY", 'clinic_timeslot'))
+
+
+class ConfigChecksTests(TestCase):
+
+    def test_local_default_cache_is_reported(self):
+        from .checks import check_shared_default_cache
+
+        self.assertEqual([w.id for w in check_shared_default_cache(None)], ['clinic.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_default_cache(None), [])
+
+
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def test_booking_enqueues_instead_of_sending(self):
+        BookingService.create_appointment(self.patient, make_slot(self.doctor).id)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.Status.PENDING).count(), 1)
+
+    def test_rolled_back_booking_leaves_no_email(self):
+        slot = make_slot(self.doctor)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                BookingService.create_appointment(self.patient, slot.id)
+                raise RuntimeError
+
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_worker_sends_batch_over_one_connection(self):
+        EmailOutbox.enqueue("A", "body", ['a@example.com', 'b@example.com', 'c@example.com'])
+
+        with mock.patch('clinic.outbox.get_connection', wraps=get_connection) as connection_factory:
+            call_command('send_outbox_emails', stdout=StringIO())
+
+        self.assertEqual(connection_factory.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.Status.SENT).count(), 3)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        EmailOutbox.enqueue("A", "body", ['a@example.com'])
+        broken = mock.MagicMock()
+        broken.send_messages.side_effect = OSError("SMTP down")
+
+        with mock.patch('clinic.outbox.get_connection', return_value=broken):
+            stats = EmailOutbox.drain()
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(stats['retry'], 1)
+        self.assertEqual(email.status, OutboxEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(EmailOutbox.drain(), {'sent': 0, 'retry': 0, 'failed': 0})
+
+    def test_worker_that_lost_its_lease_does_not_mark_email_sent(self):
+        EmailOutbox.enqueue("A", "body", ['a@example.com'])
+
+        def steal_lease(messages):
+            # Оренда минула, і лист забрав інший воркер
+            OutboxEmail.objects.update(claim_token='other-worker')
+
+        slow = mock.MagicMock()
+        slow.send_messages.side_effect = steal_lease
+        with mock.patch('clinic.outbox.get_connection', return_value=slow):
+            stats = EmailOutbox.drain()
+
+        self.assertEqual(stats['sent'], 0)
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.Status.SENDING)
+
+    def test_expired_leases_count_as_attempts(self):
+        EmailOutbox.enqueue("A", "body", ['a@example.com'])
+        for _ in range(EmailOutbox.MAX_ATTEMPTS):
+            # Воркер "впав" одразу після захоплення пачки
+            EmailOutbox._claim(10)
+            OutboxEmail.objects.update(next_attempt_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        self.assertEqual(EmailOutbox._claim(10), [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.Status.FAILED)
+        self.assertEqual(email.attempts, EmailOutbox.MAX_ATTEMPTS)
+
+
+class ReminderServiceTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def book(self, minutes):
+        slot = make_slot(self.doctor, days=0, minutes=minutes)
+        return BookingService.create_appointment(self.patient, slot.id)
+
+    def reminders(self):
+        return OutboxEmail.objects.filter(subject__startswith="Нагадування")
+
+    def test_reminder_enqueued_once(self):
+        soon = self.book(60)
+        tomorrow = self.book(60 * 5)
+        self.book(60 * 30) # Поза обома вікнами
+
+        self.assertEqual(ReminderService.dispatch_all(), {'24h': 1, '2h': 1})
+        self.assertEqual(ReminderService.dispatch_all(), {'24h': 0, '2h': 0})
+        self.assertEqual(self.reminders().count(), 2)
+        # Прийом через годину отримує лише 2h-нагадування, не два однакові листи
+        self.assertEqual(set(soon.reminders.values_list('kind', flat=True)), {'2h'})
+        self.assertEqual(set(tomorrow.reminders.values_list('kind', flat=True)), {'24h'})
+
+    def test_second_run_reads_only_new_appointments(self):
+        self.book(60)
+        ReminderService.dispatch('2h')
+        # Без позначок повторне сканування всього вікна надіслало б лист знову;
+        # курсор же вже пройшов цей запис, а створено його давно
+        AppointmentReminder.objects.all().delete()
+        Appointment.objects.update(scheduled_at=timezone.now() - datetime.timedelta(hours=1))
+
+        self.assertEqual(ReminderService.dispatch('2h'), 0)
+
+    def test_booking_inside_processed_window_still_gets_reminder(self):
+        ReminderService.dispatch('2h')
+        cursor = ReminderCursor.objects.get(kind='2h')
+        self.assertGreater(cursor.processed_until, timezone.now())
+        self.assertLessEqual(cursor.scheduled_until, timezone.now())
+        # Запис на час, який попередній запуск уже "пройшов"
+        self.book(30)
+        self.assertEqual(ReminderService.dispatch('2h'), 1)
+        self.assertEqual(ReminderService.dispatch('2h'), 0)
+
+    def test_rescheduled_appointment_is_reminded_again(self):
+        appointment = self.book(60)
+        ReminderService.dispatch('2h')
+
+        BookingService.reschedule_appointment(appointment, make_slot(self.doctor, days=0, minutes=90).id)
+
+        self.assertEqual(ReminderService.dispatch('2h'), 1)
+        self.assertEqual(self.reminders().count(), 2)
+
+    def test_count_excludes_marks_skipped_as_conflicts(self):
+        appointment = self.book(60)
+        # Позначку вже поставив хтось інший (напр. паралельний запуск)
+        with mock.patch('clinic.reminders.AppointmentReminder.objects.bulk_create'):
+            AppointmentReminder.objects.create(appointment=appointment, kind='2h')
+            self.assertEqual(ReminderService._flush('2h', [appointment]), 0)
+        self.assertFalse(self.reminders().exists())
+
+    def test_cancelled_appointments_are_skipped(self):
+        appointment = self.book(60)
+        appointment.status = Appointment.Status.CANCELLED
+        appointment.save()
+
+        call_command('send_reminders', '--kind', '2h', stdout=StringIO())
+        self.assertFalse(self.reminders().exists())
+
+
+class StatsRollupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def counts(self):
+        return {
+            (row.date, row.doctor_id, row.status): row.count
+            for row in AppointmentDailyStats.objects.exclude(count=0)
+        }
+
+    def test_counters_follow_appointment_lifecycle(self):
+        slot = make_slot(self.doctor)
+        day = timezone.localtime(slot.start_time).date()
+        appointment = BookingService.create_appointment(self.patient, slot.id)
+        self.assertEqual(self.counts(), {(day, self.doctor.pk, Appointment.Status.PLANNED): 1})
+
+        Appointment.objects.get(pk=appointment.pk).complete()
+        self.assertEqual(self.counts(), {(day, self.doctor.pk, Appointment.Status.COMPLETED): 1})
+
+        Appointment.objects.all().delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_batch_and_reschedule_update_counters(self):
+        slots = [make_slot(self.doctor, days=1), make_slot(self.doctor, days=1, minutes=30)]
+        appointments = BookingService.create_appointments(self.patient, [slot.id for slot in slots])
+        later = make_slot(self.doctor, days=3)
+        BookingService.reschedule_appointment(appointments[0], later.id)
+
+        day = timezone.localtime(slots[0].start_time).date()
+        later_day = timezone.localtime(later.start_time).date()
+        self.assertEqual(self.counts(), {
+            (day, self.doctor.pk, Appointment.Status.PLANNED): 1,
+            (later_day, self.doctor.pk, Appointment.Status.PLANNED): 1,
+        })
+
+    def test_rebuild_matches_incremental_counters(self):
+        for days in range(3):
+            BookingService.create_appointment(self.patient, make_slot(self.doctor, days=days + 1).id)
+        make_patient('second')
+        incremental = (self.counts(), list(NewPatientsDailyStats.objects.values_list('date', 'count')))
+
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual(
+            (self.counts(), list(NewPatientsDailyStats.objects.values_list('date', 'count'))), incremental
+        )
+
+    def test_strategies_read_rollup(self):
+        slot = make_slot(self.doctor)
+        day = timezone.localtime(slot.start_time).date()
+        BookingService.create_appointment(self.patient, slot.id).complete()
+        today = timezone.localdate()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(DailyAppointmentsStrategy().generate(day)['count'], 1)
+        load = DoctorLoadStrategy().generate(day, day)['load']
+        self.assertEqual([row['completed_appointments'] for row in load], [1])
+        self.assertEqual(NewPatientsStrategy().generate(today, today)['new_patients_count'], 1)
+
+
+class ReportTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Великий набір: 20 лікарів x 400 днів x 3 статуси в зведеній таблиці
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(20)]
+        cls.first_day = datetime.date(2025, 1, 1)
+        AppointmentDailyStats.objects.bulk_create([
+            AppointmentDailyStats(
+                date=cls.first_day + datetime.timedelta(days=day), doctor=doctor, status=status, count=2
+            )
+            for doctor in cls.doctors
+            for day in range(400)
+            for status in Appointment.Status.values
+        ], batch_size=2000)
+        cls.admin = User.objects.create(username='admin', role=User.Role.ADMIN)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reports_use_one_query_and_indexes(self):
+        from .management.commands.explain_hot_queries import full_scans
+
+        start, end = self.first_day, self.first_day + datetime.timedelta(days=9)
+        cases = [
+            (DailyAppointmentsStrategy(), {'date': start}),
+            (DoctorLoadStrategy(), {'start_date': start, 'end_date': end}),
+            (NewPatientsStrategy(), {'start_date': start, 'end_date': end}),
+        ]
+        for strategy, kwargs in cases:
+            with self.subTest(report=strategy.name):
+                with self.assertNumQueries(1):
+                    ReportGenerator(strategy).run(**kwargs)
+                plan = strategy.queryset(**kwargs).explain()
+                self.assertFalse(full_scans(plan, AppointmentDailyStats._meta.db_table), plan)
+                self.assertFalse(full_scans(plan, NewPatientsDailyStats._meta.db_table), plan)
+
+        load = DoctorLoadStrategy().generate(start, end)['load']
+        self.assertEqual({row['completed_appointments'] for row in load}, {20})
+        self.assertEqual(DailyAppointmentsStrategy().generate(start)['count'], 40)
+
+    def test_registry_and_parameter_validation(self):
+        self.assertIs(ReportGenerator.STRATEGIES['doctor-load'], DoctorLoadStrategy)
+        with self.assertRaises(ReportStrategy.ReportError):
+            ReportGenerator.for_report('unknown')
+        with self.assertRaises(ReportStrategy.ReportError):
+            ReportGenerator.for_report('doctor-load').run_with_params(
+                {'start_date': '2025-02-01', 'end_date': '2025-01-01'}
+            )
+
+    def test_report_endpoint(self):
+        url = '/api/v1/reports/daily-appointments/'
+        self.assertEqual(self.client.get(url, {'date': '2025-01-01'}).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(url, {'date': '2025-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 40)
+        self.assertEqual(self.client.get(url, {'date': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/reports/unknown/').status_code, 404)
+        self.assertIn('doctor-load', [report['name'] for report in self.client.get('/api/v1/reports/').data])
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.other_doctor = make_doctor('other_doctor')
+        self.patient = make_patient()
+        self.admin = User.objects.create(username='admin', role=User.Role.ADMIN)
+        self.appointments = [
+            BookingService.create_appointment(self.patient, make_slot(doctor, days=days).id)
+            for doctor, days in [(self.doctor, 1), (self.doctor, 2), (self.other_doctor, 1)]
+        ]
+        self.appointments[1].complete()
+
+    def test_csv_endpoint_streams_filtered_rows(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/v1/exports/appointments/', {'doctor': self.doctor.pk})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'start_time', 'status'])
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]],
+                         [self.appointments[0].pk, self.appointments[1].pk])
+        self.assertEqual(
+            self.client.get('/api/v1/exports/appointments/', {'status': 'LOST'}).status_code, 400
+        )
+
+    def test_command_writes_ndjson(self):
+        out = StringIO()
+        with mock.patch.object(ExportService, 'CHUNK_SIZE', 1):
+            call_command('export_data', 'appointments', '--output', 'ndjson', '--status', 'COMPLETED', stdout=out)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.appointments[1].pk])
+        self.assertEqual(records[0]['status'], Appointment.Status.COMPLETED)
+
+    def test_date_range_uses_half_open_bounds(self):
+        day = timezone.localtime(self.appointments[0].start_time).date()
+        rows = ExportService.queryset('slots', start_date=day, end_date=day)
+        self.assertEqual({row[0] for row in rows}, {self.appointments[0].time_slot_id, self.appointments[2].time_slot_id})
+
+
+class ReportCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.slot = make_slot(self.doctor, days=3)
+        self.day = timezone.localtime(self.slot.start_time).date()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment = BookingService.create_appointment(self.patient, self.slot.id)
+
+    def load(self, start_date, end_date):
+        report = ReportGenerator.for_report('doctor-load').run(start_date, end_date)
+        return report['load'][0]['completed_appointments']
+
+    def test_repeated_report_is_served_from_cache(self):
+        self.load(self.day, self.day)
+        with self.assertNumQueries(0):
+            ReportGenerator(DoctorLoadStrategy()).run(start_date=self.day, end_date=self.day)
+
+    def test_only_ranges_containing_changed_day_are_evicted(self):
+        week = (self.day - datetime.timedelta(days=3), self.day + datetime.timedelta(days=3))
+        earlier = (self.day - datetime.timedelta(days=10), self.day - datetime.timedelta(days=4))
+        self.assertEqual(self.load(*week), 0)
+        self.assertEqual(self.load(*earlier), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.get(pk=self.appointment.pk).complete()
+
+        self.assertEqual(self.load(*week), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.load(*earlier), 0)
+
+    def test_closed_ranges_are_cached_with_longer_ttl(self):
+        past = timezone.localdate() - datetime.timedelta(days=7)
+        with mock.patch('clinic.report_cache.cache.set') as cache_set:
+            self.load(past, past)
+            self.load(self.day, self.day)
+        timeouts = [call.args[2] for call in cache_set.call_args_list if call.args[0].startswith('report:')]
+        self.assertEqual(timeouts, [ReportCache.CLOSED_RANGE_TTL, ReportCache.OPEN_RANGE_TTL])
+
+    def test_doctor_changes_evict_reports_with_doctor_names(self):
+        def names():
+            report = ReportGenerator.for_report('doctor-load').run(self.day, self.day)
+            return [row['user__last_name'] for row in report['load']]
+
+        self.assertEqual(names(), [''])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.last_name = 'Шевченко'
+            self.doctor.user.save()
+        self.assertEqual(names(), ['Шевченко'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_doctor('second')
+        self.assertEqual(len(names()), 2)
+
+
+class SeriesReportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cardio = Specialty.objects.create(name='Кардіологія')
+        self.doctors = [make_doctor('doctor_a'), make_doctor('doctor_b')]
+        Doctor.objects.filter(pk__in=[doctor.pk for doctor in self.doctors]).update(specialty=cardio)
+        self.monday = datetime.date(2025, 1, 6)
+        for doctor in self.doctors:
+            for status, count in [(Appointment.Status.COMPLETED, 2), (Appointment.Status.CANCELLED, 1)]:
+                AppointmentDailyStats.objects.create(date=self.monday, doctor=doctor, status=status, count=count)
+        NewPatientsDailyStats.objects.create(date=self.monday + datetime.timedelta(days=8), count=4)
+
+    def test_year_of_days_is_one_query_with_empty_buckets(self):
+        end = self.monday + datetime.timedelta(days=364)
+        with self.assertNumQueries(1):
+            report = AppointmentSeriesStrategy().generate(self.monday, end)
+
+        points = report['series'][0]['points']
+        self.assertEqual(len(points), 365)
+        # scheduled_visits - усі прийоми дня за датою прийому, разом зі скасованими
+        self.assertEqual(points[0], {'bucket': self.monday, 'scheduled_visits': 6, 'completions': 4, 'cancellations': 2})
+        self.assertEqual(points[1], {'bucket': self.monday + datetime.timedelta(days=1),
+                                     'scheduled_visits': 0, 'completions': 0, 'cancellations': 0})
+
+    def test_scheduled_visits_count_by_visit_date_not_booking_date(self):
+        doctor = self.doctors[0]
+        visit = make_slot(doctor, days=10)
+        BookingService.create_appointment(make_patient(), visit.id).cancel()
+        visit_day = timezone.localtime(visit.start_time).date()
+
+        report = AppointmentSeriesStrategy().generate(timezone.localdate(), visit_day)
+        points = {point['bucket']: point for point in report['series'][0]['points']}
+        self.assertEqual(points[timezone.localdate()]['scheduled_visits'], 0)
+        self.assertEqual(points[visit_day]['scheduled_visits'], 1)
+        self.assertEqual(points[visit_day]['cancellations'], 1)
+
+    def test_weekly_breakdown_by_doctor_and_specialty(self):
+        end = self.monday + datetime.timedelta(days=13)
+        by_doctor = AppointmentSeriesStrategy().generate(self.monday, end, bucket='week', group_by='doctor')
+        self.assertEqual([series['group'] for series in by_doctor['series']], [doctor.pk for doctor in self.doctors])
+        self.assertEqual([point['completions'] for point in by_doctor['series'][0]['points']], [2, 0])
+
+        by_specialty = AppointmentSeriesStrategy().generate(self.monday, end, bucket='week', group_by='specialty')
+        self.assertEqual([series['label'] for series in by_specialty['series']], ['Кардіологія'])
+        self.assertEqual(by_specialty['series'][0]['points'][0]['scheduled_visits'], 6)
+
+    def test_new_patients_series_by_week(self):
+        # Діапазон з середини тижня: перший інтервал підписано понеділком
+        start = self.monday + datetime.timedelta(days=2)
+        report = ReportGenerator.for_report('new-patients-series').run_with_params({
+            'start_date': start.isoformat(), 'end_date': (start + datetime.timedelta(days=13)).isoformat(),
+            'bucket': 'week'
+        })
+        self.assertEqual(report['points'], [
+            {'bucket': self.monday, 'new_patients': 0},
+            {'bucket': self.monday + datetime.timedelta(days=7), 'new_patients': 4},
+            {'bucket': self.monday + datetime.timedelta(days=14), 'new_patients': 0},
+        ])
+        with self.assertRaises(ReportStrategy.ReportError):
+            NewPatientsSeriesStrategy().parse_params({'start_date': '2025-01-01', 'end_date': '2025-01-02', 'bucket': 'hour'})
+
+
+class CursorPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        # Слоти створюються не за порядком часу - сторінки мають іти за start_time
+        self.appointments = [
+            BookingService.create_appointment(self.patient, make_slot(self.doctor, days=days).id)
+            for days in [3, 1, 5, 2, 4]
+        ]
+
+    def walk(self, url, key='id'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item[key] for item in response.data['results']]
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_pages_follow_start_time_without_gaps(self):
+        self.client.force_authenticate(self.patient.user)
+        ids, pages = self.walk('/api/v1/appointments/?page_size=2')
+
+        expected = [a.pk for a in sorted(self.appointments, key=lambda a: (a.start_time, a.pk))]
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_deep_page_uses_keyset_instead_of_offset(self):
+        self.client.force_authenticate(self.patient.user)
+        second_page = self.client.get('/api/v1/appointments/?page_size=2').data['next']
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(second_page)
+        appointment_sql = [q['sql'] for q in queries.captured_queries if 'FROM "clinic_appointment"' in q['sql']]
+        self.assertTrue(appointment_sql)
+        self.assertNotIn('OFFSET', appointment_sql[0])
+        self.assertIn('"start_time" >', appointment_sql[0])
+
+    def test_catalog_endpoints_are_paginated(self):
+        for i in range(3):
+            make_doctor(f'doctor{i}')
+        ids, pages = self.walk('/api/v1/doctors/?page_size=2', key='pk')
+        self.assertEqual(ids, sorted(Doctor.objects.values_list('pk', flat=True)))
+        self.assertEqual(pages, 2)
+        self.assertIn('results', self.client.get('/api/v1/specialties/').data)
+
+
+class QueryBudgetMixin:
+    """
+    Бюджет запитів для API: кількість SQL-запитів не повинна залежати від
+    кількості рядків на сторінці. Регресія N+1 падає в CI, а не в продакшні.
+    """
+
+    def count_queries(self, url) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertQueryBudget(self, url, budget, page_sizes=(1, 5, 25)):
+        counts = [self.count_queries(f"{url}{'&' if '?' in url else '?'}page_size={size}") for size in page_sizes]
+        self.assertEqual(len(set(counts)), 1, f"Кількість запитів залежить від розміру сторінки: {counts}")
+        self.assertLessEqual(counts[0], budget)
+
+
+class ApiQueryBudgetTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        specialty = Specialty.objects.create(name='Терапія')
+        cls.patient = make_patient()
+        cls.admin = User.objects.create(username='admin', role=User.Role.ADMIN, is_staff=True)
+        for i in range(5):
+            doctor = make_doctor(f'doctor{i}')
+            Doctor.objects.filter(pk=doctor.pk).update(specialty=specialty)
+            for days in range(1, 6):
+                BookingService.create_appointment(cls.patient, make_slot(doctor, days=days, minutes=i).id)
+
+    def test_appointment_list_and_retrieve(self):
+        self.client.force_authenticate(self.patient.user)
+        self.assertQueryBudget('/api/v1/appointments/', budget=1)
+
+        appointment = Appointment.objects.first()
+        self.assertLessEqual(self.count_queries(f'/api/v1/appointments/{appointment.pk}/'), 1)
+
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget('/api/v1/appointments/', budget=1)
+
+    def test_catalog_lists(self):
+        self.assertQueryBudget('/api/v1/doctors/', budget=1)
+        self.assertQueryBudget('/api/v1/specialties/', budget=1)
+
+    # ?fields= / ?expand= та POST-відповіді обходять швидкий шлях values() -
+    # ці бюджети стережуть N+1 у ModelSerializer (RELATED_BY_ACTION)
+
+    def test_sparse_lists_use_serializer_within_budget(self):
+        self.client.force_authenticate(self.patient.user)
+        self.assertQueryBudget(
+            '/api/v1/appointments/?fields=id,time_slot.start_time,doctor.user.last_name,doctor.specialty,patient.user.first_name',
+            budget=1
+        )
+        self.assertQueryBudget('/api/v1/appointments/?fields=id,doctor,time_slot&expand=', budget=1)
+        self.assertQueryBudget('/api/v1/doctors/?fields=pk,user.last_name,specialty', budget=1)
+
+        appointment = Appointment.objects.first()
+        self.assertLessEqual(
+            self.count_queries(f'/api/v1/appointments/{appointment.pk}/?fields=id,doctor.user.last_name,time_slot.start_time'), 1
+        )
+
+    def test_batch_and_hold_responses(self):
+        self.client.force_authenticate(self.patient.user)
+        doctor = Doctor.objects.first()
+        counts = []
+        for size in (1, 3, 6):
+            slot_ids = [make_slot(doctor, days=20 + size, minutes=30 * i).id for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/v1/appointments/batch/', {'time_slot_ids': slot_ids}, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data), size)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f"Кількість запитів залежить від кількості записів: {counts}")
+        self.assertLessEqual(counts[0], 15)
+
+        slot = make_slot(doctor, days=40)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/appointments/hold/', {'time_slot': slot.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(queries), 9)
+
+
+class ValuesListParityTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        specialty = Specialty.objects.create(name='Кардіологія')
+        cls.patient = make_patient()
+        Patient.objects.filter(pk=cls.patient.pk).update(
+            phone_number='+380501234567', date_of_birth=datetime.date(1990, 5, 17)
+        )
+        cls.admin = User.objects.create(username='admin', role=User.Role.ADMIN, is_staff=True)
+        for i, name in enumerate(['Іван', 'Олена "Лор"', 'Петро\u2028']):
+            doctor = make_doctor(f'doctor{i}')
+            User.objects.filter(pk=doctor.pk).update(first_name=name, last_name='Шевченко')
+            if i:
+                Doctor.objects.filter(pk=doctor.pk).update(specialty=specialty, bio='Досвід 10 років')
+            for days in range(1, 4):
+                BookingService.create_appointment(cls.patient, make_slot(doctor, days=days).id)
+
+    def assertSameBytes(self, viewset, url):
+        fast = self.client.get(url)
+        with mock.patch.object(viewset, 'values_serializer_class', None):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_list_output_is_byte_identical(self):
+        from .api_viewsets import DoctorViewSet, AppointmentViewSet
+
+        self.assertSameBytes(DoctorViewSet, '/api/v1/doctors/')
+        self.client.force_authenticate(self.patient.user)
+        first = self.assertSameBytes(AppointmentViewSet, '/api/v1/appointments/?page_size=4')
+        self.assertSameBytes(AppointmentViewSet, first.data['next'])
+
+    def test_fast_renderer_matches_drf_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .api_renderers import FastJSONRenderer
+
+        data = {'when': timezone.now(), 'text': 'Лікар\u2028"1"', 'items': [1, None, True]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_follow_drf_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .api_renderers import FastJSONRenderer
+
+        data = {'load': [1.5, None, float('nan')]}
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+        with self.assertRaises(ValueError):
+            FastJSONRenderer().render(data)
+
+
+class DoctorSlotsApiTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, self.other = make_doctor('doctor'), make_doctor('other')
+
+    def url(self, *doctors):
+        return f"/api/v1/doctors/{','.join(str(doctor.pk) for doctor in doctors)}/slots/"
+
+    def test_returns_free_slots_in_window_ordered(self):
+        later = make_slot(self.doctor, days=2)
+        earliest = make_slot(self.doctor, days=1)
+        make_slot(self.doctor, days=1, minutes=30, is_available=False)
+        make_slot(self.doctor, days=10)
+        make_slot(self.other, days=1, minutes=15)
+
+        response = self.client.get(self.url(self.doctor), {'to': (timezone.localdate() + datetime.timedelta(days=3)).isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['id'] for slot in response.data['results']], [earliest.id, later.id])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'doctor', 'start_time', 'end_time'})
+
+    def test_several_doctors_in_one_request(self):
+        first = make_slot(self.doctor, days=1)
+        second = make_slot(self.other, days=1, minutes=30)
+        third = make_slot(self.doctor, days=2)
+
+        response = self.client.get(self.url(self.other, self.doctor))
+
+        self.assertEqual([slot['id'] for slot in response.data['results']], [first.id, second.id, third.id])
+        self.assertEqual([slot['doctor'] for slot in response.data['results']], [self.doctor.pk, self.other.pk, self.doctor.pk])
+
+    def test_cursor_pages_cover_all_slots(self):
+        slots = [make_slot(self.doctor, days=1, minutes=30 * i) for i in range(5)]
+
+        seen, url = [], self.url(self.doctor) + '?page_size=2'
+        while url:
+            page = self.client.get(url).data
+            seen += [slot['id'] for slot in page['results']]
+            url = page['next']
+        self.assertEqual(seen, [slot.id for slot in slots])
+
+    def test_page_is_cached_until_doctor_slots_change(self):
+        slot = make_slot(self.doctor)
+        self.client.get(self.url(self.doctor))
+        with self.assertNumQueries(0):
+            self.client.get(self.url(self.doctor))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BookingService.create_appointment(make_patient(), slot.id)
+        self.assertEqual(self.client.get(self.url(self.doctor)).data['results'], [])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url(self.doctor), {'from': 'завтра'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url(self.doctor), {'from': '2030-01-01', 'to': '2030-03-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/doctors/999999/slots/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/doctors/{self.doctor.pk},999999/slots/').status_code, 404)
+
+
+class BulkSlotApiTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+        self.client.force_authenticate(self.doctor.user)
+
+    def slot_range(self, days=1, hours=24, **extra):
+        start = timezone.now() + datetime.timedelta(days=days) - datetime.timedelta(minutes=1)
+        return {'start': start.isoformat(), 'end': (start + datetime.timedelta(hours=hours)).isoformat(), **extra}
+
+    def test_bulk_create_generates_slots(self):
+        day = (timezone.localdate() + datetime.timedelta(days=1)).isoformat()
+        response = self.client.post('/api/v1/slots/bulk-create/', {
+            'start_date': day, 'start_time': '09:00', 'end_time': '11:00', 'interval_min': 30
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 4)
+        self.assertTrue(DailyAvailability.objects.filter(doctor=self.doctor).exists())
+
+    def test_bulk_delete_keeps_booked_and_held_slots(self):
+        free = [make_slot(self.doctor, minutes=30 * i) for i in range(3)]
+        booked = make_slot(self.doctor, minutes=120)
+        BookingService.create_appointment(make_patient(), booked.id)
+        held = make_slot(self.doctor, minutes=150)
+        BookingService.hold_slot(make_patient('holder'), held.id)
+
+        response = self.client.post('/api/v1/slots/bulk-delete/', self.slot_range())
+
+        self.assertEqual(response.data['deleted'], len(free))
+        self.assertEqual(set(TimeSlot.objects.values_list('id', flat=True)), {booked.id, held.id})
+        self.assertEqual(AvailabilityIndex.first_free_slot(self.doctor.pk), None)
+
+    def test_bulk_delete_query_count_does_not_depend_on_slot_count(self):
+        counts = []
+        for size in (2, 10):
+            for i in range(size):
+                make_slot(self.doctor, minutes=30 * i)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/v1/slots/bulk-delete/', self.slot_range())
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_shift_moves_unbooked_slots(self):
+        # Щільний ряд: кожен слот зсувається на місце сусіда
+        first = make_slot(self.doctor)
+        slots = [first] + [
+            TimeSlot.objects.create(
+                doctor=self.doctor,
+                start_time=first.start_time + datetime.timedelta(minutes=30 * i),
+                end_time=first.end_time + datetime.timedelta(minutes=30 * i)
+            )
+            for i in (1, 2)
+        ]
+        booked = make_slot(self.doctor, days=3)
+        BookingService.create_appointment(make_patient(), booked.id)
+
+        response = self.client.post('/api/v1/slots/bulk-shift/', self.slot_range(days=1, hours=72, minutes=30))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shifted'], 3)
+        # ID зберігаються: збережені клієнтами посилання на слоти лишаються дійсними
+        self.assertEqual(
+            list(TimeSlot.objects.filter(appointment__isnull=True).order_by('start_time').values_list('id', 'start_time')),
+            [(slot.id, slot.start_time + datetime.timedelta(minutes=30)) for slot in slots]
+        )
+        self.assertEqual([slot['id'] for slot in response.data['slots']], [slot.id for slot in slots])
+        booked.refresh_from_db()
+        self.assertEqual(booked.appointment.start_time, booked.start_time)
+
+    def test_bulk_shift_onto_booked_slot_is_rejected(self):
+        slot = make_slot(self.doctor)
+        booked = TimeSlot.objects.create(
+            doctor=self.doctor,
+            start_time=slot.start_time + datetime.timedelta(minutes=30),
+            end_time=slot.end_time + datetime.timedelta(minutes=30)
+        )
+        BookingService.create_appointment(make_patient(), booked.id)
+
+        response = self.client.post('/api/v1/slots/bulk-shift/', self.slot_range(hours=1, minutes=30))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(TimeSlot.objects.filter(id=slot.id, start_time=slot.start_time).exists())
+
+    def test_bulk_shift_keeps_blocked_slots_blocked(self):
+        make_slot(self.doctor, is_available=False)
+
+        self.client.post('/api/v1/slots/bulk-shift/', self.slot_range(minutes=60))
+
+        self.assertFalse(TimeSlot.objects.get(doctor=self.doctor).is_available)
+
+    def test_bulk_shift_race_on_target_time_is_a_validation_error(self):
+        slot = make_slot(self.doctor)
+        # Слот на новий час з'явився вже після перевірки зайнятості
+        TimeSlot.objects.create(
+            doctor=self.doctor,
+            start_time=slot.start_time + datetime.timedelta(minutes=60),
+            end_time=slot.end_time + datetime.timedelta(minutes=60)
+        )
+        with mock.patch.object(ScheduleService, '_occupied_targets', return_value=set()):
+            response = self.client.post('/api/v1/slots/bulk-shift/', self.slot_range(minutes=60, hours=1))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(TimeSlot.objects.filter(id=slot.id, start_time=slot.start_time).exists())
+
+    def test_bulk_shift_delta_is_limited(self):
+        make_slot(self.doctor)
+        response = self.client.post('/api/v1/slots/bulk-shift/', self.slot_range(minutes=365 * 24 * 60))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('minutes', response.data)
+
+    def test_free_slots_api_sees_changes(self):
+        make_slot(self.doctor)
+        url = f'/api/v1/doctors/{self.doctor.pk}/slots/'
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/slots/bulk-delete/', self.slot_range())
+        self.assertEqual(self.client.get(url).data['results'], [])
+
+    def test_permissions(self):
+        other = make_doctor('other')
+        make_slot(other)
+
+        response = self.client.post('/api/v1/slots/bulk-delete/', self.slot_range(doctor=other.pk))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(make_patient().user)
+        self.assertEqual(self.client.post('/api/v1/slots/bulk-delete/', self.slot_range()).status_code, 403)
+
+        self.client.force_authenticate(User.objects.create(username='admin', role=User.Role.ADMIN))
+        self.assertEqual(self.client.post('/api/v1/slots/bulk-delete/', self.slot_range()).status_code, 400)
+        response = self.client.post('/api/v1/slots/bulk-delete/', self.slot_range(doctor=other.pk))
+        self.assertEqual(response.data['deleted'], 1)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+
+    def test_unchanged_catalog_returns_304_without_queries(self):
+        first = self.client.get('/api/v1/doctors/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/doctors/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/doctors/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_each_representation_has_its_own_etag(self):
+        other = Specialty.objects.create(name='Неврологія')
+        full = self.client.get('/api/v1/doctors/')
+        filtered = self.client.get('/api/v1/doctors/', {'specialty': other.pk})
+        sparse = self.client.get('/api/v1/doctors/', {'fields': 'id'})
+
+        self.assertEqual(len({full['ETag'], filtered['ETag'], sparse['ETag']}), 3)
+        response = self.client.get('/api/v1/doctors/', {'specialty': other.pk}, HTTP_IF_NONE_MATCH=full['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/v1/doctors/', {'specialty': other.pk}, HTTP_IF_NONE_MATCH=filtered['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_profile_and_specialty_saves_change_etag(self):
+        doctors = self.client.get('/api/v1/doctors/')['ETag']
+        specialties = self.client.get('/api/v1/specialties/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.first_name = 'Ольга'
+            self.doctor.user.save()
+        response = self.client.get('/api/v1/doctors/', HTTP_IF_NONE_MATCH=doctors)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/specialties/', HTTP_IF_NONE_MATCH=specialties).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Specialty.objects.create(name='Неврологія')
+        self.assertEqual(self.client.get('/api/v1/specialties/', HTTP_IF_NONE_MATCH=specialties).status_code, 200)
+        self.assertEqual(
+            self.client.get('/api/v1/doctors/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200
+        )
+
+    def test_last_modified_increases_within_the_same_second(self):
+        first = self.client.get('/api/v1/doctors/')['Last-Modified']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.bio = 'Кардіолог'
+            self.doctor.save()
+        response = self.client.get('/api/v1/doctors/', HTTP_IF_MODIFIED_SINCE=first)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], first)
+
+    def test_login_does_not_invalidate_catalog(self):
+        etag = self.client.get('/api/v1/doctors/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.last_login = timezone.now()
+            self.doctor.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get('/api/v1/doctors/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class SparseFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.appointment = BookingService.create_appointment(self.patient, make_slot(self.doctor).id)
+        self.client.force_authenticate(self.patient.user)
+
+    def test_fields_prune_output_and_query(self):
+        url = '/api/v1/appointments/?fields=id,time_slot.start_time,doctor.user.last_name'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.data['results'], [{
+            'id': self.appointment.pk,
+            'time_slot': {'start_time': response.data['results'][0]['time_slot']['start_time']},
+            'doctor': {'user': {'last_name': ''}},
+        }])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"bio"', sql)
+        self.assertNotIn('clinic_patient', sql)
+        self.assertNotIn('"email"', sql)
+
+    def test_unexpanded_relations_become_ids(self):
+        response = self.client.get(f'/api/v1/appointments/{self.appointment.pk}/?expand=time_slot')
+
+        self.assertEqual(response.data['doctor'], self.doctor.pk)
+        self.assertEqual(response.data['patient'], self.patient.pk)
+        self.assertEqual(response.data['time_slot']['id'], self.appointment.time_slot_id)
+
+    def test_sparse_list_keeps_constant_query_count(self):
+        for days in range(2, 6):
+            BookingService.create_appointment(self.patient, make_slot(self.doctor, days=days).id)
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/appointments/?fields=id,doctor&expand=')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/doctors/?fields=pk,specialty')
+        self.assertEqual(response.data['results'], [{'pk': self.doctor.pk, 'specialty': None}])
+
+
+class AppointmentBatchApiTests(APITestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.client.force_authenticate(self.patient.user)
+
+    def test_batch_books_all_slots_with_one_email(self):
+        slots = [make_slot(self.doctor, minutes=30 * i) for i in range(3)]
+
+        response = self.client.post(
+            '/api/v1/appointments/batch/',
+            {'time_slot_ids': [slot.id for slot in slots]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(Appointment.objects.filter(patient=self.patient).count(), 3)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_batch_is_all_or_nothing(self):
+        free = make_slot(self.doctor)
+        taken = make_slot(self.doctor, minutes=30, is_available=False)
+
+        response = self.client.post(
+            '/api/v1/appointments/batch/',
+            {'time_slot_ids': [free.id, taken.id]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        free.refresh_from_db()
+        self.assertTrue(free.is_available)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class IdempotencyTests(APITestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def test_api_retry_replays_original_response(self):
+        self.client.force_authenticate(self.patient.user)
+        slot = make_slot(self.doctor)
+
+        first = self.client.post(
+            '/api/v1/appointments/', {'time_slot': slot.id},
+            format='json', HTTP_IDEMPOTENCY_KEY='retry-1'
+        )
+        retry = self.client.post(
+            '/api/v1/appointments/', {'time_slot': slot.id},
+            format='json', HTTP_IDEMPOTENCY_KEY='retry-1'
+        )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_api_key_reused_for_other_request_conflicts(self):
+        self.client.force_authenticate(self.patient.user)
+        first, second = make_slot(self.doctor), make_slot(self.doctor, minutes=30)
+
+        self.client.post(
+            '/api/v1/appointments/', {'time_slot': first.id},
+            format='json', HTTP_IDEMPOTENCY_KEY='retry-2'
+        )
+        response = self.client.post(
+            '/api/v1/appointments/', {'time_slot': second.id},
+            format='json', HTTP_IDEMPOTENCY_KEY='retry-2'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        second.refresh_from_db()
+        self.assertTrue(second.is_available)
+
+    def test_form_resubmit_does_not_book_twice(self):
+        self.client.force_login(self.patient.user)
+        slot = make_slot(self.doctor)
+        data = {'time_slot_id': slot.id, 'idempotency_key': 'form-1'}
+
+        self.client.post(f'/doctor/{self.doctor.pk}/', data)
+        response = self.client.post(f'/doctor/{self.doctor.pk}/', data, follow=True)
+
+        self.assertContains(response, 'Ви успішно записані на прийом!')
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+class BookingStressTests(TransactionTestCase):
+
+    def test_no_double_booking_under_concurrency(self):
+        out = StringIO()
+        # Тест уже працює на тестовій БД - окрему не створюємо
+        call_command('booking_stress', threads=4, rounds=3, current_db=True, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("Успішних бронювань: 3", output)
+        # Решта 9 спроб програли: умовний UPDATE або (на SQLite) блокування БД
+        taken = int(re.search(r"Конфліктів захоплення \(слот зайнято\): (\d+)", output).group(1))
+        locked = int(re.search(r"Помилок блокування БД: (\d+)", output).group(1))
+        self.assertEqual(taken + locked, 9)
+        self.assertIn("Інших помилок: 0", output)
+        self.assertIn("Слотів не з одним бронюванням: 0", output)
+        self.assertFalse(User.objects.filter(username__startswith='stress_').exists())
+
+    def test_refuses_to_replace_in_memory_test_database(self):
+        with self.assertRaises(CommandError):
+            call_command('booking_stress', threads=2, rounds=1, stdout=StringIO())
+
+    def test_default_mode_runs_on_throwaway_database(self):
+        # Окремий процес: як і з командного рядка, команда сама створює та знищує
+        # тимчасову БД, не торкаючись робочої (db.sqlite3 не змінюється)
+        real_db = Path(settings.BASE_DIR) / 'db.sqlite3'
+        before = real_db.stat().st_mtime_ns if real_db.exists() else None
+
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'booking_stress', '--threads', '2', '--rounds', '1'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Успішних бронювань: 1", result.stdout)
+        self.assertIn("Слотів не з одним бронюванням: 0", result.stdout)
+        self.assertEqual(real_db.stat().st_mtime_ns if real_db.exists() else None, before)
+
+
+class ReportDashboardTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', role=User.Role.ADMIN)
+        self.doctor = make_doctor()
+        AppointmentDailyStats.objects.create(
+            date=datetime.date(2025, 1, 1), doctor=self.doctor, status=Appointment.Status.COMPLETED, count=3
+        )
+
+    def test_reports_run_concurrently_in_one_response(self):
+        # Бар'єр пропустить звіти лише тоді, коли всі три рахуються одночасно
+        barrier = threading.Barrier(3, timeout=5)
+        original_run = ReportGenerator.run
+
+        def run(generator, *args, **kwargs):
+            barrier.wait()
+            return original_run(generator, *args, **kwargs)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch.object(ReportGenerator, 'run', run):
+            response = client.get('/api/v1/reports/dashboard/', {
+                'reports': 'daily-appointments,doctor-load,new-patients', 'date': '2025-01-01', 'start_date': '2025-01-01', 'end_date': '2025-01-31'
+            })
+
+        self.assertEqual(response.status_code, 200)
+        reports = response.data['reports']
+        self.assertEqual(set(reports), {'daily-appointments', 'doctor-load', 'new-patients'})
+        self.assertEqual(reports['daily-appointments']['result']['count'], 3)
+        self.assertEqual(reports['doctor-load']['result']['load'][0]['completed_appointments'], 3)
+        self.assertIn('elapsed_ms', reports['new-patients'])
+
+    def test_invalid_params_fail_before_running(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/v1/reports/dashboard/', {'reports': 'doctor-load', 'start_date': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unexpected_errors_are_logged_not_returned(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch.object(DailyAppointmentsStrategy, 'generate', side_effect=RuntimeError('секретна помилка БД')), \
+                self.assertLogs('clinic.services', level='ERROR'):
+            response = client.get('/api/v1/reports/dashboard/', {
+                'reports': 'daily-appointments,new-patients', 'date': '2025-01-01',
+                'start_date': '2025-01-01', 'end_date': '2025-01-31'
+            })
+
+        self.assertEqual(response.status_code, 200)
+        reports = response.data['reports']
+        self.assertEqual(reports['daily-appointments']['error'], "Не вдалося сформувати звіт.")
+        self.assertIn('result', reports['new-patients'])
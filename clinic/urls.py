@@ -13,6 +13,9 @@ urlpatterns = [
 
     path('doctor/<int:doctor_id>/', views.doctor_detail_view, name='doctor_detail'),
 
+    # Найближчий вільний час (серед усіх лікарів або спеціалізації)
+    path('next-available/', views.next_available_view, name='next_available'),
+
     # Особистий кабінет
     path('my-appointments/', views.patient_dashboard_view, name='patient_dashboard'),
 
@@ -5,10 +5,13 @@ from django.contrib import messages
 from django.utils import timezone
 from django.db import models # Потрібно для Q
 import datetime # --- ПОТРІБНО ДЛЯ СТВОРЕННЯ СЛОТІВ ---
+import uuid
 
 from .forms import PatientRegisterForm
 from .models import Doctor, Specialty, TimeSlot, Patient, Appointment, User 
-from .services import BookingService
+from .services import BookingService, ScheduleService, SlotSearchService
+from .availability import AvailabilityIndex
+from .idempotency import run_idempotent, IdempotencyError
 
 def home_view(request):
     """
@@ -51,9 +54,16 @@ def doctor_list_view(request):
     
     if selected_specialty_id:
         doctors_query = doctors_query.filter(specialty__id=selected_specialty_id)
+
+    # Найближчий вільний час кожного лікаря - з індексу вільного часу
+    # (два запити на весь список, а не сканування слотів кожного лікаря)
+    doctors = list(doctors_query)
+    next_free = AvailabilityIndex.first_free_slots(doctor.pk for doctor in doctors)
+    for doctor in doctors:
+        doctor.next_free_slot = next_free.get(doctor.pk)
     
     context = {
-        'doctors': doctors_query,
+        'doctors': doctors,
         'specialties': specialties,
         'selected_specialty_id': selected_specialty_id,
     }
@@ -61,6 +71,26 @@ def doctor_list_view(request):
     return render(request, 'doctor_list.html', context)
 
 
+def next_available_view(request):
+    """
+    Найближчі вільні слоти серед усіх лікарів (або обраної спеціалізації).
+    Шлях: next_available.html
+    """
+    specialties = Specialty.objects.all()
+    selected_specialty_id = request.GET.get('specialty')
+
+    specialty_id = int(selected_specialty_id) if selected_specialty_id and selected_specialty_id.isdigit() else None
+    time_slots = SlotSearchService.next_available(specialty_id=specialty_id, limit=20)
+
+    context = {
+        'time_slots': time_slots,
+        'specialties': specialties,
+        'selected_specialty_id': selected_specialty_id,
+        'idempotency_key': uuid.uuid4().hex,
+    }
+    return render(request, 'next_available.html', context)
+
+
 def doctor_detail_view(request, doctor_id):
     """
     Показує детальний профіль лікаря та його доступні слоти.
@@ -81,24 +111,36 @@ def doctor_detail_view(request, doctor_id):
         
         time_slot_id = request.POST.get('time_slot_id')
         
+        def book():
+            appointment = BookingService.create_appointment(patient=patient, time_slot_id=time_slot_id)
+            return {'appointment_id': appointment.pk}
+
         try:
-            BookingService.create_appointment(patient=patient, time_slot_id=time_slot_id)
+            # Повторне відправлення тієї ж форми (подвійний клік, повтор після
+            # таймауту) несе той самий idempotency_key і не бронює слот вдруге
+            run_idempotent(request, 'web:doctor_detail', book, fingerprint=str(time_slot_id))
             messages.success(request, 'Ви успішно записані на прийом!')
             
-        except BookingService.BookingError as e:
+        except (BookingService.BookingError, IdempotencyError) as e:
             messages.error(request, f'Помилка бронювання: {e}')
         
         return redirect('doctor_detail', doctor_id=doctor.pk)
 
+    # Слоти з шаблонів розкладу GET не створює: їх створюють збереження
+    # шаблону (після коміту) та команда materialize_schedules
+
+    # "Ліниве" звільнення: слоти з простроченим утриманням показуються
+    # як вільні ще до того, як їх звільнить команда release_expired_holds
     available_slots = TimeSlot.objects.filter(
-        doctor=doctor, 
-        is_available=True,
-        start_time__gte=timezone.now()
+        BookingService.claimable_filter(),
+        doctor=doctor
     ).order_by('start_time')
     
     context = {
         'doctor': doctor,
-        'available_slots': available_slots
+        'available_slots': available_slots,
+        # Ключ ідемпотентності для форм бронювання на цій сторінці
+        'idempotency_key': uuid.uuid4().hex,
     }
     return render(request, 'doctor_detail.html', context)
 
@@ -117,11 +159,11 @@ def patient_dashboard_view(request):
     now = timezone.now()
     
     appointments = Appointment.objects.filter(patient=patient).select_related(
-        'doctor__user', 'time_slot'
-    ).order_by('time_slot__start_time')
+        'doctor__user'
+    ).order_by('start_time') # Денормалізований час - без JOIN до TimeSlot
     
-    future_appointments = appointments.filter(time_slot__start_time__gte=now)
-    past_appointments = appointments.filter(time_slot__start_time__lt=now)
+    future_appointments = appointments.filter(start_time__gte=now)
+    past_appointments = appointments.filter(start_time__lt=now)
     
     context = {
         'future_appointments': future_appointments,
@@ -147,49 +189,26 @@ def doctor_dashboard_view(request):
     if request.method == 'POST':
         try:
             date_str = request.POST.get('date')
+            end_date_str = request.POST.get('end_date') or date_str # Необов'язкове поле
             start_time_str = request.POST.get('start_time')
             end_time_str = request.POST.get('end_time')
             interval_min = int(request.POST.get('interval', 30))
 
             # 1. Парсимо дату і час
             date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+            end_date_obj = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
             start_time_obj = datetime.datetime.strptime(start_time_str, '%H:%M').time()
             end_time_obj = datetime.datetime.strptime(end_time_str, '%H:%M').time()
-            
-            # 2. Перетворюємо на timezone-aware datetime
-            current_dt = timezone.make_aware(datetime.datetime.combine(date_obj, start_time_obj))
-            end_dt = timezone.make_aware(datetime.datetime.combine(date_obj, end_time_obj))
-            interval = datetime.timedelta(minutes=interval_min)
-            
-            # 3. Перевірки
-            if current_dt < timezone.now():
-                raise ValueError("Неможливо створити слоти у минулому.")
-            if end_dt <= current_dt:
-                raise ValueError("Час закінчення має бути пізніше часу початку.")
-
-            # 4. Цикл генерації слотів
-            slots_created_count = 0
-            while current_dt < end_dt:
-                slot_end_time = current_dt + interval
-                if slot_end_time > end_dt:
-                    break # Не створюємо "обрізаний" слот
-                
-                # Перевірка на конфлікт (чи такий слот вже існує)
-                exists = TimeSlot.objects.filter(
-                    doctor=doctor,
-                    start_time=current_dt
-                ).exists()
-                
-                if not exists:
-                    TimeSlot.objects.create(
-                        doctor=doctor,
-                        start_time=current_dt,
-                        end_time=slot_end_time,
-                        is_available=True
-                    )
-                    slots_created_count += 1
-                
-                current_dt = slot_end_time # Переходимо до наступного слоту
+
+            # 2. Генерація слотів для всього діапазону днів (див. ScheduleService)
+            slots_created_count = ScheduleService.generate_slots(
+                doctor=doctor,
+                start_date=date_obj,
+                end_date=end_date_obj,
+                start_time=start_time_obj,
+                end_time=end_time_obj,
+                interval_min=interval_min
+            )
             
             if slots_created_count > 0:
                 messages.success(request, f'Успішно додано {slots_created_count} нових слотів.')
@@ -205,11 +224,11 @@ def doctor_dashboard_view(request):
     now = timezone.now()
     
     appointments = Appointment.objects.filter(doctor=doctor).select_related(
-        'patient__user', 'time_slot'
-    ).order_by('time_slot__start_time')
+        'patient__user'
+    ).order_by('start_time') # Денормалізований час - без JOIN до TimeSlot
     
-    future_appointments = appointments.filter(time_slot__start_time__gte=now)
-    past_appointments = appointments.filter(time_slot__start_time__lt=now)
+    future_appointments = appointments.filter(start_time__gte=now)
+    past_appointments = appointments.filter(start_time__lt=now)
     
     # Потрібно для 'min' атрибуту в формі
     today = timezone.localdate().strftime('%Y-%m-%d')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -83,6 +84,43 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# 'default' зберігає версії кешів (вільні слоти, звіти, довідники API)
+# і має бути СПІЛЬНИМ для всіх воркерів: інакше інвалідація в одному
+# процесі не дійде до інших. У продакшені задайте REDIS_URL
+# (напр. redis://localhost:6379/0, потрібен пакет redis).
+# Без нього - LocMemCache, придатний лише для одного процесу (розробка, тести);
+# python manage.py check --deploy про це попереджає.
+#
+# 'idempotency' зберігає результати POST-запитів з Idempotency-Key.
+# Це таблиця в БД, тож її бачать усі воркери за балансувальником.
+# Таблиця створюється окремим кроком деплою, після migrate:
+#   python manage.py migrate && python manage.py createcachetable
+# (команда створює таблиці всіх кешів на DatabaseCache, наявні пропускає;
+# тестова БД отримує їх автоматично).
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'clinic_idempotency_cache',
+        'TIMEOUT': 60 * 60 * 24, # Ключі "живуть" добу
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000, # Обмеження розміру, старі записи витісняються
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 